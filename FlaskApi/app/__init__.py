@@ -7,11 +7,13 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
+from flask_sock import Sock
 
 # Initialize extensions
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
+sock = Sock()
 
 def create_app(config_class=None):
     """Application factory"""
@@ -29,11 +31,25 @@ def create_app(config_class=None):
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    sock.init_app(app)
+    
+    # Background job queue (liveness jobs run on inference workers)
+    from app.celery_app import init_celery
+    init_celery(app)
+    
+    # Request/commit timing and the Prometheus /metrics endpoint
+    from app.metrics import init_metrics
+    init_metrics(app, db)
     
     # Register blueprints
     from app.api.v1 import api_v1_bp
     app.register_blueprint(api_v1_bp)
     
+    # Warm the process-wide model registry
+    if app.config.get('PRELOAD_MODELS'):
+        from app.services.liveness_service import LivenessDetectionService
+        LivenessDetectionService()
+    
     # Add basic routes
     @app.route('/')
     def root():
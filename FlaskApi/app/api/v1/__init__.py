@@ -25,6 +25,8 @@ from .sessions import sessions_ns
 from .face_detection import face_detection_ns
 from .kyc import kyc_ns
 from .liveness import liveness_ns
+# WebSocket route, registered directly on the blueprint (not a RESTx resource)
+from . import liveness_stream
 
 # Register namespaces
 api.add_namespace(auth_ns)
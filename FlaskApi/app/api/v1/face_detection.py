@@ -2,11 +2,12 @@
 Face Detection API endpoints
 """
 
-from flask import request
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import FaceDetection, Session
 from app.services.face_detection_service import FaceDetectionService
+from app.utils.uploads import request_fields, request_image
+from app.utils.validators import validate_image_data
 
 face_detection_ns = Namespace('face-detection', description='Face detection operations')
 
@@ -22,7 +23,7 @@ face_detection_model = face_detection_ns.model('FaceDetection', {
 
 detect_face_model = face_detection_ns.model('DetectFace', {
     'session_id': fields.Integer(required=True, description='Session ID'),
-    'image_data': fields.String(required=True, description='Base64 encoded image data'),
+    'image_data': fields.String(required=True, description='Base64 encoded image data (or a multipart file part / octet-stream body)'),
     'detection_type': fields.String(description='Type of detection (liveness, emotion, etc.)')
 })
 
@@ -35,14 +36,16 @@ class DetectFace(Resource):
         """Perform face detection on uploaded image"""
         try:
             current_user_id = get_jwt_identity()
-            data = request.get_json()
+            data = request_fields()
             
             session_id = data.get('session_id')
-            image_data = data.get('image_data')
+            image_data = request_image('image_data', data)
             detection_type = data.get('detection_type', 'general')
             
-            if not session_id or not image_data:
+            if not session_id or image_data is None:
                 return {'message': 'Session ID and image data are required'}, 400
+            if not validate_image_data(image_data):
+                return {'message': 'image_data is not a JPEG, PNG, BMP or WebP image'}, 400
             
             # Verify session belongs to user
             session = Session.query.filter_by(id=session_id, user_id=current_user_id).first()
@@ -108,13 +111,15 @@ class LivenessCheck(Resource):
         """Perform liveness detection for KYC"""
         try:
             current_user_id = get_jwt_identity()
-            data = request.get_json()
+            data = request_fields()
             
             session_id = data.get('session_id')
-            image_data = data.get('image_data')
+            image_data = request_image('image_data', data)
             
-            if not session_id or not image_data:
+            if not session_id or image_data is None:
                 return {'message': 'Session ID and image data are required'}, 400
+            if not validate_image_data(image_data):
+                return {'message': 'image_data is not a JPEG, PNG, BMP or WebP image'}, 400
             
             # Verify session belongs to user
             session = Session.query.filter_by(id=session_id, user_id=current_user_id).first()
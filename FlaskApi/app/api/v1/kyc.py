@@ -7,6 +7,8 @@ from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import KYCSubmission, User
 from app.services.kyc_service import KYCService
+from app.utils.uploads import request_fields, request_image, request_images
+from app.utils.validators import validate_image_data
 
 kyc_ns = Namespace('kyc', description='KYC operations')
 
@@ -136,13 +138,14 @@ kyc_submission_model = kyc_ns.model('KYCSubmission', {
     'status': fields.String(description='KYC status'),
     'submitted_at': fields.String(description='Submission date'),
     'reviewed_at': fields.String(description='Review date'),
-    'notes': fields.String(description='Review notes')
+    'notes': fields.String(description='Review notes'),
+    'duplicate_check': fields.Raw(description='Top-k enrolled identities most similar to the selfie (on submission)')
 })
 
 submit_kyc_model = kyc_ns.model('SubmitKYC', {
     'session_id': fields.Integer(required=True, description='Session ID'),
-    'document_images': fields.List(fields.String, description='Base64 encoded document images'),
-    'selfie_image': fields.String(required=True, description='Base64 encoded selfie image')
+    'document_images': fields.List(fields.String, description='Base64 encoded document images (or repeated multipart file parts)'),
+    'selfie_image': fields.String(required=True, description='Base64 encoded selfie image (or a multipart file part / octet-stream body)')
 })
 
 @kyc_ns.route('/status')
@@ -173,14 +176,16 @@ class SubmitKYC(Resource):
         """Submit KYC documents for verification"""
         try:
             current_user_id = get_jwt_identity()
-            data = request.get_json()
+            data = request_fields()
             
             session_id = data.get('session_id')
-            document_images = data.get('document_images', [])
-            selfie_image = data.get('selfie_image')
+            document_images = request_images('document_images', data)
+            selfie_image = request_image('selfie_image', data)
             
-            if not session_id or not selfie_image:
+            if not session_id or selfie_image is None:
                 return {'message': 'Session ID and selfie image are required'}, 400
+            if not validate_image_data(selfie_image):
+                return {'message': 'selfie_image is not a JPEG, PNG, BMP or WebP image'}, 400
             
             kyc_service = KYCService()
             result = kyc_service.submit_kyc(current_user_id, session_id, document_images, selfie_image)
@@ -2,45 +2,96 @@
 Liveness Detection API endpoints
 """
 
+import base64
+import os
 import time
-from flask import request
+import uuid
+from flask import request, current_app
 from flask_restx import Namespace, Resource, fields
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.celery_app import celery
+from app.tasks import run_liveness_job
+from app.services.enrollment_service import EnrollmentService
 from app.services.liveness_service import LivenessDetectionService
 from app.services.mouth_captcha_service import MouthCaptchaService
 from app.models import Session
+from app.utils.uploads import OCTET_STREAM, as_bool, request_fields, request_image, save_upload
+from app.utils.validators import validate_image_data
 from app import db
 
 liveness_ns = Namespace('liveness', description='Liveness detection operations')
 
 # Request/Response models
 complete_liveness_model = liveness_ns.model('CompleteLiveness', {
-    'reference_image': fields.String(description='Base64 encoded reference image (optional)'),
-    'enable_display': fields.Boolean(description='Enable visual display (default: false)')
+    'reference_image': fields.String(description='Base64 encoded reference image (optional; or a multipart file part / octet-stream body)'),
+    'enable_display': fields.Boolean(description='Enable visual display (default: false)'),
+    'mode': fields.String(description='sequential (default) or fused: one capture window shared by all steps'),
+    'use_enrolled_template': fields.Boolean(description='Verify against the enrolled face template instead of reference_image')
 })
 
 individual_step_model = liveness_ns.model('IndividualStep', {
     'step_name': fields.String(required=True, description='Step name: person_verification, midas_liveness, blink_detection, mouth_captcha'),
     'reference_image': fields.String(description='Base64 encoded reference image (for person_verification)'),
     'duration': fields.Integer(description='Duration in seconds (optional)'),
-    'enable_display': fields.Boolean(description='Enable visual display (default: false)')
+    'enable_display': fields.Boolean(description='Enable visual display (default: false)'),
+    'use_enrolled_template': fields.Boolean(description='Verify against the enrolled face template (for person_verification)')
+})
+
+enrollment_model = liveness_ns.model('FaceEnrollment', {
+    'reference_image': fields.String(required=True, description='Base64 encoded image with exactly one face (or a multipart file part / octet-stream body)'),
+    'encoding': fields.String(description='Template storage: float16 (default) or int8')
 })
 
 liveness_result_model = liveness_ns.model('LivenessResult', {
     'success': fields.Boolean(description='Overall success status'),
     'is_live': fields.Boolean(description='Whether person is detected as live'),
+    'liveness_proof': fields.String(description='live (voice captcha answered) or recorded (media that cannot answer it)'),
     'confidence': fields.Float(description='Overall confidence score'),
     'steps': fields.Raw(description='Individual step results'),
     'passed_steps': fields.Integer(description='Number of steps that passed'),
-    'total_steps': fields.Integer(description='Total number of steps'),
+    'total_steps': fields.Integer(description='Number of steps applicable to the input'),
     'message': fields.String(description='Result message'),
+    'mode': fields.String(description='Pipeline mode used'),
     'timestamp': fields.String(description='Detection timestamp'),
-    'error': fields.String(description='Error message if any')
+    'error': fields.String(description='Error message if any'),
+    'video': fields.Raw(description='Frames decoded, skipped and seeks (uploaded videos only)')
+})
+
+video_liveness_parser = liveness_ns.parser()
+video_liveness_parser.add_argument('video', location='files', type='file', required=True,
+                                   help='Recorded clip (multipart file part, or the octet-stream body)')
+video_liveness_parser.add_argument('reference_image', location='files', type='file',
+                                   help='Reference image file (or base64 text in the same field)')
+video_liveness_parser.add_argument('mode', location='form', help='fused (default) or sequential')
+video_liveness_parser.add_argument('use_enrolled_template', location='form', type=bool,
+                                   help='Verify against the enrolled face template instead of reference_image')
+video_liveness_parser.add_argument('async', location='form', type=bool,
+                                   help='Queue a job on the inference workers and return its id (default: false)')
+
+liveness_job_model = liveness_ns.model('LivenessJob', {
+    'reference_image': fields.String(description='Base64 encoded reference image (optional)'),
+    'mode': fields.String(description='sequential (default) or fused'),
+    'frames': fields.List(fields.String, description='Base64 encoded frames to analyse (optional; defaults to the worker camera)'),
+    'fps': fields.Float(description='Frame rate of the uploaded frames (default: 30)'),
+    'use_enrolled_template': fields.Boolean(description='Verify against the enrolled face template instead of reference_image')
+})
+
+liveness_job_status_model = liveness_ns.model('LivenessJobStatus', {
+    'job_id': fields.String(description='Job ID'),
+    'state': fields.String(description='PENDING, STARTED, PROGRESS, SUCCESS, FAILURE or REVOKED'),
+    'completed_steps': fields.Integer(description='Number of steps finished so far'),
+    'total_steps': fields.Integer(description='Number of steps applicable to the input'),
+    'steps': fields.Raw(description='Per-step results finished so far'),
+    'result': fields.Raw(description='Final liveness result once the job succeeded'),
+    'error': fields.String(description='Error message if the job failed')
 })
 
 system_status_model = liveness_ns.model('SystemStatus', {
     'camera_available': fields.Boolean(description='Camera availability'),
     'models_loaded': fields.Raw(description='Model loading status'),
+    'model_registry': fields.Raw(description='Per-model load time (ms) and memory (MB)'),
+    'inference_batching': fields.Raw(description='Batches run and average batch size per batched model'),
+    'reference_cache': fields.Raw(description='Reference embedding cache entries and hit/miss counters'),
     'configuration': fields.Raw(description='System configuration'),
     'timestamp': fields.String(description='Status timestamp')
 })
@@ -54,10 +105,25 @@ class CompleteLivenessDetection(Resource):
         """Run complete liveness detection sequence with all verification steps"""
         try:
             current_user_id = get_jwt_identity()
-            data = request.get_json() or {}
-            
-            reference_image = data.get('reference_image')
-            enable_display = data.get('enable_display', False)
+            data = request_fields()
+            
+            reference_image = request_image('reference_image', data)
+            enable_display = as_bool(data.get('enable_display', False))
+            mode = data.get('mode', 'sequential')
+            
+            if mode not in ('sequential', 'fused'):
+                return {'success': False, 'is_live': False, 'confidence': 0.0,
+                        'error': "mode must be 'sequential' or 'fused'"}, 400
+            if reference_image is not None and not validate_image_data(reference_image):
+                return {'success': False, 'is_live': False, 'confidence': 0.0,
+                        'error': 'reference_image is not a JPEG, PNG, BMP or WebP image'}, 400
+            
+            reference_embedding = None
+            if as_bool(data.get('use_enrolled_template')):
+                try:
+                    reference_embedding = EnrollmentService.load_embedding(current_user_id)
+                except ValueError as e:
+                    return {'success': False, 'is_live': False, 'confidence': 0.0, 'error': str(e)}, 400
             
             # Create a session for this liveness check
             session = Session(
@@ -77,7 +143,9 @@ class CompleteLivenessDetection(Resource):
                 liveness_service.config['enable_display'] = True
             
             # Run complete liveness detection
-            result = liveness_service.run_complete_liveness_detection(reference_image)
+            result = liveness_service.run_complete_liveness_detection(
+                reference_image, mode=mode, reference_embedding=reference_embedding
+            )
             
             # Update session with results
             session.is_active = False
@@ -94,6 +162,215 @@ class CompleteLivenessDetection(Resource):
                 'message': 'Internal server error'
             }, 500
 
+@liveness_ns.route('/video')
+class VideoLivenessDetection(Resource):
+    @jwt_required()
+    @liveness_ns.expect(video_liveness_parser)
+    def post(self):
+        """Run complete liveness detection on an uploaded video clip"""
+        video_path = None
+        try:
+            current_user_id = get_jwt_identity()
+            data = request_fields()
+            
+            mode = data.get('mode')
+            if mode not in (None, 'sequential', 'fused'):
+                return {'error': "mode must be 'sequential' or 'fused'"}, 400
+            
+            # An octet-stream body is the video itself; the reference must come from a template
+            reference_image = request_image('reference_image', data) if request.mimetype != OCTET_STREAM else None
+            if reference_image is not None and not validate_image_data(reference_image):
+                return {'error': 'reference_image is not a JPEG, PNG, BMP or WebP image'}, 400
+            
+            video_path = save_upload('video')
+            if video_path is None:
+                return {'error': 'video is required (multipart file part or octet-stream body)'}, 400
+            extension = os.path.splitext(video_path)[1].lstrip('.').lower()
+            if extension not in current_app.config.get('ALLOWED_EXTENSIONS', {extension}):
+                return {'error': f'Unsupported video type: {extension}'}, 400
+            
+            use_template = as_bool(data.get('use_enrolled_template'))
+            reference_embedding = None
+            if use_template:
+                try:
+                    reference_embedding = EnrollmentService.load_embedding(current_user_id)
+                except ValueError as e:
+                    return {'success': False, 'is_live': False, 'confidence': 0.0, 'error': str(e)}, 400
+            
+            queue_job = as_bool(data.get('async'))
+            job_id = str(uuid.uuid4()) if queue_job else None
+            session = Session(
+                user_id=current_user_id,
+                session_name='Video Liveness Detection',
+                room_id=_job_room_id(job_id) if queue_job else f'liveness_video_{current_user_id}_{int(time.time() * 1000)}',
+                is_active=True
+            )
+            db.session.add(session)
+            db.session.commit()
+            
+            if queue_job:
+                # The worker reads the clip from UPLOAD_FOLDER (shared storage) and deletes it
+                if reference_image is not None and not isinstance(reference_image, str):
+                    reference_image = base64.b64encode(reference_image).decode('ascii')
+                job = run_liveness_job.apply_async(args=[{
+                    'user_id': current_user_id,
+                    'session_id': session.id,
+                    'reference_image': reference_image,
+                    'mode': mode,
+                    'video_path': video_path,
+                    'use_enrolled_template': use_template
+                }], task_id=job_id)
+                video_path = None
+                return {
+                    'job_id': job.id,
+                    'state': job.state,
+                    'status_url': f"{request.path.rsplit('/', 1)[0]}/jobs/{job.id}"
+                }, 202
+            
+            liveness_service = LivenessDetectionService()
+            result = liveness_service.run_video_liveness_detection(
+                video_path, reference_image, mode=mode, reference_embedding=reference_embedding
+            )
+            
+            session.is_active = False
+            db.session.commit()
+            
+            return liveness_ns.marshal(result, liveness_result_model), 200 if result['success'] else 400
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'is_live': False,
+                'confidence': 0.0,
+                'error': f'Video liveness detection failed: {str(e)}',
+                'message': 'Internal server error'
+            }, 500
+        
+        finally:
+            if video_path is not None:
+                try:
+                    os.remove(video_path)
+                except OSError:
+                    pass
+
+TERMINAL_JOB_STATES = ('SUCCESS', 'FAILURE', 'REVOKED')
+
+
+def _job_status(job_id: str, async_result) -> dict:
+    """Shape a Celery task state for the job API"""
+    state = async_result.state
+    info = async_result.info
+    status = {
+        'job_id': job_id,
+        'state': state,
+        'completed_steps': 0,
+        'total_steps': len(LivenessDetectionService.STEPS),
+        'steps': {},
+        'result': None,
+        'error': None
+    }
+    if state == 'SUCCESS' and isinstance(info, dict):
+        result = info.get('result') or {}
+        status['result'] = result
+        status['steps'] = result.get('steps', {})
+        status['completed_steps'] = len(status['steps'])
+    elif state == 'PROGRESS' and isinstance(info, dict):
+        status['steps'] = info.get('steps', {})
+        status['completed_steps'] = info.get('completed_steps', 0)
+        status['total_steps'] = info.get('total_steps', status['total_steps'])
+    elif state in ('FAILURE', 'REVOKED'):
+        status['error'] = str(info) if info else state.lower()
+    return status
+
+
+def _job_room_id(job_id: str) -> str:
+    """Room id of the session created with a job; it records who submitted it"""
+    return f'liveness_job_{job_id}'
+
+
+def _owns_job(job_id: str, user_id) -> bool:
+    """Whether the job was submitted by this user (unknown jobs are not owned)"""
+    return Session.query.filter_by(room_id=_job_room_id(job_id), user_id=user_id).first() is not None
+
+
+@liveness_ns.route('/jobs')
+class LivenessJobs(Resource):
+    @jwt_required()
+    @liveness_ns.expect(liveness_job_model)
+    def post(self):
+        """Queue a complete liveness detection job on the inference workers"""
+        try:
+            current_user_id = get_jwt_identity()
+            data = request.get_json() or {}
+            
+            mode = data.get('mode', 'sequential')
+            if mode not in ('sequential', 'fused'):
+                return {'error': "mode must be 'sequential' or 'fused'"}, 400
+            
+            frames = data.get('frames') or []
+            if not isinstance(frames, list) or not all(isinstance(f, str) for f in frames):
+                return {'error': 'frames must be a list of base64 encoded images'}, 400
+            
+            # Create a session for this job; it records the owner and the worker closes it when done
+            job_id = str(uuid.uuid4())
+            session = Session(
+                user_id=current_user_id,
+                session_name='Liveness Detection Job',
+                room_id=_job_room_id(job_id),
+                is_active=True
+            )
+            db.session.add(session)
+            db.session.commit()
+            
+            job = run_liveness_job.apply_async(args=[{
+                'user_id': current_user_id,
+                'session_id': session.id,
+                'reference_image': data.get('reference_image'),
+                'mode': mode,
+                'frames': frames,
+                'fps': data.get('fps'),
+                'use_enrolled_template': bool(data.get('use_enrolled_template'))
+            }], task_id=job_id)
+            
+            return {
+                'job_id': job.id,
+                'state': job.state,
+                'status_url': f"{request.path.rstrip('/')}/{job.id}"
+            }, 202
+            
+        except Exception as e:
+            return {
+                'error': f'Failed to queue liveness job: {str(e)}',
+                'message': 'Internal server error'
+            }, 500
+
+@liveness_ns.route('/jobs/<string:job_id>')
+class LivenessJob(Resource):
+    @jwt_required()
+    @liveness_ns.response(404, 'Job not found')
+    @liveness_ns.marshal_with(liveness_job_status_model)
+    def get(self, job_id):
+        """Get job progress, per-step partial results and the final result"""
+        current_user_id = get_jwt_identity()
+        if not _owns_job(job_id, current_user_id):
+            return {'job_id': job_id, 'state': 'UNKNOWN', 'error': 'Job not found'}, 404
+        
+        status = _job_status(job_id, celery.AsyncResult(job_id))
+        if status['state'] in TERMINAL_JOB_STATES:
+            return status, 200
+        # Returns immediately; Retry-After tells the client when to poll again
+        return status, 200, {'Retry-After': str(current_app.config['LIVENESS_JOB_POLL_INTERVAL'])}
+    
+    @jwt_required()
+    def delete(self, job_id):
+        """Cancel a queued or running job"""
+        current_user_id = get_jwt_identity()
+        if not _owns_job(job_id, current_user_id):
+            return {'error': 'Job not found'}, 404
+        
+        celery.AsyncResult(job_id).revoke(terminate=True)
+        return {'job_id': job_id, 'state': 'REVOKED'}, 200
+
 @liveness_ns.route('/step')
 class IndividualLivenessStep(Resource):
     @jwt_required()
@@ -112,6 +389,13 @@ class IndividualLivenessStep(Resource):
             if not step_name:
                 return {'error': 'step_name is required'}, 400
             
+            reference_embedding = None
+            if step_name == 'person_verification' and data.get('use_enrolled_template'):
+                try:
+                    reference_embedding = EnrollmentService.load_embedding(current_user_id)
+                except ValueError as e:
+                    return {'success': False, 'confidence': 0.0, 'error': str(e)}, 400
+            
             valid_steps = ['person_verification', 'midas_liveness', 'blink_detection', 'mouth_captcha']
             if step_name not in valid_steps:
                 return {'error': f'Invalid step_name. Must be one of: {valid_steps}'}, 400
@@ -134,7 +418,8 @@ class IndividualLivenessStep(Resource):
                 step_name=step_name,
                 image_data=reference_image,
                 duration=duration,
-                display=enable_display
+                display=enable_display,
+                reference_embedding=reference_embedding
             )
             
             # Update session with results
@@ -161,8 +446,14 @@ class PersonVerification(Resource):
             data = request.get_json()
             
             reference_image = data.get('reference_image')
-            if not reference_image:
-                return {'error': 'reference_image is required'}, 400
+            reference_embedding = None
+            if data.get('use_enrolled_template'):
+                try:
+                    reference_embedding = EnrollmentService.load_embedding(current_user_id)
+                except ValueError as e:
+                    return {'error': str(e)}, 400
+            elif not reference_image:
+                return {'error': 'reference_image or use_enrolled_template is required'}, 400
             
             # Create a session for this verification
             session = Session(
@@ -181,7 +472,8 @@ class PersonVerification(Resource):
             result = liveness_service.run_individual_step(
                 step_name='person_verification',
                 image_data=reference_image,
-                display=data.get('enable_display', False)
+                display=data.get('enable_display', False),
+                reference_embedding=reference_embedding
             )
             
             # Update session with results
@@ -198,6 +490,40 @@ class PersonVerification(Resource):
                 'message': 'Internal server error'
             }, 500
 
+@liveness_ns.route('/enrollment')
+class FaceEnrollment(Resource):
+    @jwt_required()
+    def get(self):
+        """Get the current user's enrolled face template metadata"""
+        result = EnrollmentService().get_template(get_jwt_identity())
+        return (result['data'], 200) if result['success'] else ({'message': result['message']}, 404)
+    
+    @jwt_required()
+    @liveness_ns.expect(enrollment_model)
+    def post(self):
+        """Enroll the current user's first face template from a reference image (replacements go through KYC)"""
+        try:
+            data = request_fields()
+            reference_image = request_image('reference_image', data)
+            if reference_image is None:
+                return {'message': 'reference_image is required'}, 400
+            if not validate_image_data(reference_image):
+                return {'message': 'reference_image is not a JPEG, PNG, BMP or WebP image'}, 400
+            
+            result = EnrollmentService().enroll(get_jwt_identity(), reference_image, data.get('encoding'))
+            if result['success']:
+                return result['data'], 201
+            return {'message': result['message']}, 409 if result.get('conflict') else 400
+            
+        except Exception as e:
+            return {'message': f'Enrollment failed: {str(e)}'}, 500
+    
+    @jwt_required()
+    def delete(self):
+        """Delete the current user's face template"""
+        result = EnrollmentService().delete_template(get_jwt_identity())
+        return (result['data'], 200) if result['success'] else ({'message': result['message']}, 404)
+
 @liveness_ns.route('/2d-3d-check')
 class Liveness2D3DCheck(Resource):
     @jwt_required()
@@ -0,0 +1,139 @@
+"""
+Liveness streaming WebSocket endpoint
+
+    ws://<host>/api/v1/liveness/stream?token=<access token>
+
+Browsers cannot set an Authorization header on a WebSocket, so the JWT is
+taken from the ``token`` query parameter (or the header, for other
+clients). See app/services/liveness_stream.py for the message protocol.
+"""
+
+import json
+import logging
+import time
+
+from flask import current_app, request
+from flask_jwt_extended import decode_token
+
+from app import db, sock
+from app.models import Session
+from app.services.enrollment_service import EnrollmentService
+from app.services.liveness_service import LivenessDetectionService
+from app.services.liveness_stream import LivenessStreamSession, parse_message
+from app.utils.uploads import as_bool
+from app.utils.validators import validate_image_data
+from . import api_v1_bp
+
+logger = logging.getLogger(__name__)
+
+# Seconds a receive waits before checking whether the verdict is out
+RECEIVE_POLL_SECONDS = 0.5
+
+
+def _stream_identity():
+    """User id from the token query parameter or Authorization header, or None"""
+    token = request.args.get('token')
+    if not token:
+        header = request.headers.get('Authorization', '')
+        token = header[7:] if header.startswith('Bearer ') else None
+    if not token:
+        return None
+    try:
+        claims = decode_token(token)
+    except Exception:
+        return None
+    if claims.get('type', 'access') != 'access':
+        return None
+    return claims.get(current_app.config.get('JWT_IDENTITY_CLAIM', 'sub'))
+
+
+def _json_default(value):
+    """numpy scalars and other non-JSON values in step results"""
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+@sock.route('/api/v1/liveness/stream', bp=api_v1_bp)
+def liveness_stream(ws):
+    """Bidirectional liveness session: frames in, running step states and verdict out"""
+    def send(message):
+        ws.send(json.dumps(message, default=_json_default))
+
+    user_id = _stream_identity()
+    if user_id is None:
+        send({'type': 'error', 'message': 'Missing or invalid access token'})
+        return
+
+    service = LivenessDetectionService()
+    session = LivenessStreamSession(service, send, config=service.config['streaming'])
+    # Session row of this stream, created when the window starts (like the REST checks)
+    record = None
+
+    def start(options):
+        nonlocal record
+        reference_image = options.get('reference_image') or None
+        if reference_image is not None and not validate_image_data(reference_image):
+            send({'type': 'error', 'message': 'reference_image is not a JPEG, PNG, BMP or WebP image'})
+            return False
+        reference_embedding = None
+        if as_bool(options.get('use_enrolled_template')):
+            try:
+                reference_embedding = EnrollmentService.load_embedding(user_id)
+            except ValueError as e:
+                send({'type': 'error', 'message': str(e)})
+                return False
+        record = Session(
+            user_id=user_id,
+            session_name='Streaming Liveness Detection',
+            room_id=f'liveness_stream_{user_id}_{int(time.time() * 1000)}',
+            is_active=True
+        )
+        db.session.add(record)
+        db.session.commit()
+        session.start(reference_image, reference_embedding, options.get('audio_samplerate'))
+        send({
+            'type': 'started',
+            'session_id': record.id,
+            'window_seconds': max(service.config[f'{step}_duration'] for step, _, _ in service.STEPS),
+            'buffer_size': session.config['buffer_size']
+        })
+        return True
+
+    try:
+        while not session.finished:
+            message = ws.receive(timeout=RECEIVE_POLL_SECONDS)
+            if message is None:
+                continue
+            if isinstance(message, (bytes, bytearray)):
+                if not session.started and not start({}):
+                    return
+                session.handle_binary(message)
+                continue
+
+            data = parse_message(message)
+            if data is None:
+                send({'type': 'error', 'message': 'Text messages must be JSON objects'})
+            elif data.get('type') == 'start':
+                if session.started:
+                    send({'type': 'error', 'message': 'Session already started'})
+                elif not start(data):
+                    return
+            elif data.get('type') == 'stop':
+                session.stop()
+                if not session.started:
+                    return
+            else:
+                send({'type': 'error', 'message': f"Unknown message type: {data.get('type')}"})
+    except Exception as e:
+        # Client went away (or the socket failed): end the window early
+        logger.info(f"Liveness stream for user {user_id} closed: {e}")
+    finally:
+        session.stop()
+        # The verdict is sent by the session thread; wait for it before closing
+        session.wait()
+        if record is not None:
+            try:
+                record.is_active = False
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Could not close liveness stream session {record.id}: {e}")
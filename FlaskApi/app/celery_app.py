@@ -0,0 +1,34 @@
+"""
+Celery application - Worker queue for long-running liveness jobs
+
+Web workers only enqueue jobs; the multi-second capture and inference run on
+dedicated inference workers:
+
+    celery -A celery_worker.celery worker -Q inference --concurrency 2
+
+For local runs and tests set ``CELERY_TASK_ALWAYS_EAGER=True`` (or use
+``TestingConfig``) to execute jobs in-process against the in-memory broker.
+"""
+
+from celery import Celery
+
+celery = Celery('facelive', include=['app.tasks'])
+
+
+def init_celery(app) -> Celery:
+    """Configure the shared Celery app from the Flask config"""
+    celery.conf.update(
+        broker_url=app.config['CELERY_BROKER_URL'],
+        result_backend=app.config['CELERY_RESULT_BACKEND'],
+        task_always_eager=app.config.get('CELERY_TASK_ALWAYS_EAGER', False),
+        # Keep eager results in the backend so the job API can poll them
+        task_store_eager_result=True,
+        task_track_started=True,
+        task_routes={'liveness.*': {'queue': app.config['LIVENESS_JOB_QUEUE']}},
+        # A liveness job holds a worker for seconds; don't prefetch more
+        worker_prefetch_multiplier=1,
+        task_acks_late=True,
+        result_expires=app.config['LIVENESS_JOB_RESULT_TTL'],
+    )
+    celery.flask_app = app
+    return celery
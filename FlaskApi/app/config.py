@@ -36,7 +36,7 @@ class Config:
     CORS_ORIGINS = ["*"]
     
     # File upload settings
-    MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
+    MAX_CONTENT_LENGTH = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))  # 16MB max upload (videos included)
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'uploads')
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'mp4', 'avi', 'mov'}
     
@@ -46,6 +46,17 @@ class Config:
     # Celery settings (for background tasks)
     CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or 'redis://localhost:6379/0'
     CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND') or 'redis://localhost:6379/0'
+    # Run jobs in-process instead of on a worker (local development)
+    CELERY_TASK_ALWAYS_EAGER = os.environ.get('CELERY_TASK_ALWAYS_EAGER', 'False').lower() == 'true'
+    LIVENESS_JOB_QUEUE = os.environ.get('LIVENESS_JOB_QUEUE', 'inference')
+    LIVENESS_JOB_RESULT_TTL = int(os.environ.get('LIVENESS_JOB_RESULT_TTL', 3600))
+    # Seconds clients are told (Retry-After) to wait between job status polls
+    LIVENESS_JOB_POLL_INTERVAL = int(os.environ.get('LIVENESS_JOB_POLL_INTERVAL', 1))
+    
+    # Model settings
+    # Load all liveness models when the app is created (use with gunicorn --preload
+    # so workers share the loaded weights copy-on-write)
+    PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS', 'False').lower() == 'true'
     
     # API settings
     API_TITLE = 'FaceLive API'
@@ -71,6 +82,10 @@ class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    # In-process broker and result store
+    CELERY_BROKER_URL = 'memory://'
+    CELERY_RESULT_BACKEND = 'cache+memory://'
+    CELERY_TASK_ALWAYS_EAGER = True
 
 # Configuration mapping
 config = {
@@ -0,0 +1,75 @@
+"""
+Metrics endpoint - Request timing hooks and the Prometheus ``/metrics`` route
+
+    GET /metrics    (text/plain; version=0.0.4)
+
+Per-endpoint latency is recorded by request hooks and labelled with the URL
+rule (``/api/v1/liveness/jobs/<job_id>``), not the raw path, so series stay
+bounded. Database commit time is measured with SQLAlchemy session events.
+Hot-path stage timings are recorded by the services themselves (see
+app/services/metrics.py).
+"""
+
+import time
+
+from flask import Response, g, request
+from sqlalchemy import event
+
+from app.services.metrics import MODEL_LOAD_SECONDS, REQUEST_SECONDS, metrics, observe_stage
+from app.services.model_registry import model_registry
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_COMMIT_STARTED = '_metrics_commit_started'
+
+
+def _before_request():
+    g._metrics_started = time.perf_counter()
+
+
+def _after_request(response):
+    started = g.pop('_metrics_started', None)
+    # A WebSocket route returns when the connection closes; its duration is not a latency
+    if started is not None and request.environ.get('HTTP_UPGRADE', '').lower() != 'websocket':
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        REQUEST_SECONDS.labels(endpoint, request.method, response.status_code).observe(
+            time.perf_counter() - started
+        )
+    return response
+
+
+def _before_commit(session):
+    session.info[_COMMIT_STARTED] = time.perf_counter()
+
+
+def _after_commit(session):
+    started = session.info.pop(_COMMIT_STARTED, None)
+    if started is not None:
+        observe_stage('db_commit', time.perf_counter() - started)
+
+
+def _after_rollback(session):
+    session.info.pop(_COMMIT_STARTED, None)
+
+
+def metrics_view():
+    """Prometheus scrape target"""
+    # Models load lazily (or at startup with PRELOAD_MODELS); report the current set
+    for name, stats in model_registry.stats().items():
+        if stats['load_time_ms'] is not None:
+            MODEL_LOAD_SECONDS.labels(name).set(stats['load_time_ms'] / 1000.0)
+    return Response(metrics.render(), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app, db):
+    """Install the request and commit timing hooks and the /metrics route"""
+    if not metrics.enabled:
+        return
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    # Session events are global; don't stack them when several apps are created
+    if not event.contains(db.session, 'before_commit', _before_commit):
+        event.listen(db.session, 'before_commit', _before_commit)
+        event.listen(db.session, 'after_commit', _after_commit)
+        event.listen(db.session, 'after_rollback', _after_rollback)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -26,6 +26,7 @@ class User(db.Model):
     sessions = db.relationship('Session', backref='user', lazy=True, cascade='all, delete-orphan')
     face_detections = db.relationship('FaceDetection', backref='user', lazy=True, cascade='all, delete-orphan')
     kyc_submissions = db.relationship('KYCSubmission', backref='user', lazy=True, cascade='all, delete-orphan')
+    face_template = db.relationship('FaceTemplate', backref='user', uselist=False, cascade='all, delete-orphan')
     # otp_verifications = db.relationship('OTPVerification', backref='user', lazy=True, cascade='all, delete-orphan')  # No foreign key relationship
     
     def to_dict(self):
@@ -104,6 +105,9 @@ class KYCSubmission(db.Model):
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     reviewed_at = db.Column(db.DateTime)
     notes = db.Column(db.Text)
+    # float16 ArcFace embedding of the selfie, enrolled as the user's template on approval
+    selfie_embedding = db.Column(db.LargeBinary)
+    selfie_det_score = db.Column(db.Float)
     
     def to_dict(self):
         return {
@@ -116,6 +120,39 @@ class KYCSubmission(db.Model):
             'notes': self.notes
         }
 
+class FaceTemplate(db.Model):
+    """Enrolled ArcFace embedding of a user, stored in compact form"""
+    __tablename__ = 'face_templates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), unique=True, nullable=False)
+    embedding = db.Column(db.LargeBinary, nullable=False)
+    encoding = db.Column(db.String(10), nullable=False)  # float16 or int8
+    scale = db.Column(db.Float)  # int8 dequantization scale
+    dim = db.Column(db.Integer, nullable=False)
+    model_name = db.Column(db.String(50), nullable=False)
+    model_version = db.Column(db.String(100))
+    det_score = db.Column(db.Float)
+    # 'self' (uploaded photo, unverified) or 'kyc' (selfie of an approved KYC submission)
+    source = db.Column(db.String(10), nullable=False, default='self')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'source': self.source,
+            'encoding': self.encoding,
+            'dim': self.dim,
+            'size_bytes': len(self.embedding) if self.embedding else 0,
+            'model_name': self.model_name,
+            'model_version': self.model_version,
+            'det_score': self.det_score,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
 class OTPVerification(db.Model):
     """OTP verification model"""
     __tablename__ = 'otp_verifications'
@@ -0,0 +1,118 @@
+"""
+Batch Scheduler - Cross-request micro-batching for model inference
+
+Concurrent sessions each submit one input at a time. A MicroBatcher collects
+pending inputs from all callers until it has ``max_batch_size`` of them or
+the oldest has waited ``max_wait_ms``, runs one batched forward pass on its
+worker thread and hands every caller its own result.
+"""
+
+import os
+import threading
+import time
+import logging
+from concurrent.futures import Future
+from queue import Queue, Empty
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCHING_CONFIG = {
+    # Worth it when several sessions run in one process (threaded workers)
+    'enabled': os.environ.get('INFERENCE_BATCHING', 'False').lower() == 'true',
+    'max_batch_size': 8,
+    # Longest the first input of a batch waits for company
+    'max_wait_ms': 10,
+}
+
+
+class MicroBatcher:
+    """Collect single inputs from many threads into batched model calls"""
+
+    def __init__(self, batch_fn: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_wait_ms: float = 10, name: str = 'batcher'):
+        """
+        Args:
+            batch_fn: Runs the model on a list of inputs and returns one result per input
+            max_batch_size: Largest batch handed to ``batch_fn``
+            max_wait_ms: Longest an input waits for the batch to fill
+            name: Name of the worker thread (for logs and stats)
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.name = name
+
+        self.batches = 0
+        self.items = 0
+        self.max_batch_seen = 0
+        self._queue: Queue = Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"batcher-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one input; the future resolves to its result"""
+        if self._closed:
+            raise RuntimeError(f"Batcher '{self.name}' is closed")
+        future = Future()
+        self._queue.put((item, future))
+        return future
+
+    def __call__(self, item: Any) -> Any:
+        """Run one input through the next batch and wait for its result"""
+        return self.submit(item).result()
+
+    def _collect(self) -> list:
+        first = self._queue.get()
+        if first is None:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except Empty:
+                break
+            if entry is None:
+                self._queue.put(None)
+                break
+            batch.append(entry)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if not batch:
+                return
+            items = [item for item, _ in batch]
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"Batch function returned {len(results)} results for {len(items)} inputs")
+            except Exception as e:
+                logger.error(f"Batched inference '{self.name}' failed: {e}")
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(items)
+            self.max_batch_seen = max(self.max_batch_seen, len(items))
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+
+    def close(self):
+        """Stop the worker once the queued inputs are served"""
+        if not self._closed:
+            self._closed = True
+            self._queue.put(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch_seen
+        }
@@ -0,0 +1,567 @@
+"""
+Benchmarking - Camera-free, reproducible performance runs of the liveness services
+
+Fixtures are short video files: synthetic clips (a drawn face that moves,
+blinks and talks, and the photos in reference_images/ animated with head
+motion), generated deterministically from a seed, plus any recorded clips
+copied in from a directory. Each service is driven through a
+VideoFileFrameSource in its own process, so peak RSS and model load time
+are per service, and every frame's analysis latency is timed individually.
+
+See benchmark_liveness.py for the command line.
+"""
+
+import glob
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+SCHEMA_VERSION = 1
+
+SERVICES = ('face_detection', 'person_verification', 'midas_liveness', 'blink_detection', 'mouth_captcha')
+
+DEFAULT_BENCHMARK_CONFIG = {
+    'seed': 1234,
+    'fps': 30.0,
+    'seconds': 6.0,
+    'width': 640,
+    'height': 480,
+    # Frames analysed before timing starts (lazy model init, caches)
+    'warmup_frames': 5,
+    # Relative change beyond which compare() reports a regression
+    'tolerance': 0.10,
+    'rss_tolerance': 0.10,
+}
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+MANIFEST_NAME = 'fixtures.json'
+
+
+# --------------------------------------------------------------------------
+# Fixtures
+# --------------------------------------------------------------------------
+
+def _background(rng: np.random.Generator, width: int, height: int) -> np.ndarray:
+    """Smooth textured background so detectors see realistic gradients"""
+    noise = rng.integers(40, 200, size=(height // 16, width // 16, 3), dtype=np.uint8)
+    return cv2.GaussianBlur(cv2.resize(noise, (width, height), interpolation=cv2.INTER_CUBIC), (0, 0), 5)
+
+
+def _eye_openness(t: float) -> float:
+    """Open eyes with a 150 ms blink every 1.5 s"""
+    phase = t % 1.5
+    return 0.1 if 0.6 <= phase < 0.75 else 1.0
+
+
+def _mouth_openness(t: float) -> float:
+    """Closed mouth, then speech-like opening between 2 s and 4.5 s"""
+    if 2.0 <= t < 4.5:
+        return 0.5 + 0.5 * math.sin(2 * math.pi * 4.0 * t)
+    return 0.05
+
+
+def _draw_face(frame: np.ndarray, center: Tuple[int, int], size: int, eye_open: float, mouth_open: float):
+    cx, cy = center
+    skin, dark = (150, 180, 220), (40, 40, 60)
+    cv2.ellipse(frame, (cx, cy), (int(size * 0.75), size), 0, 0, 360, skin, -1)
+    for side in (-1, 1):
+        ex, ey = cx + side * int(size * 0.32), cy - int(size * 0.2)
+        cv2.ellipse(frame, (ex, ey - int(size * 0.2)), (int(size * 0.18), int(size * 0.04)), 0, 180, 360, dark, 3)
+        eye_h = max(1, int(size * 0.09 * eye_open))
+        cv2.ellipse(frame, (ex, ey), (int(size * 0.15), eye_h), 0, 0, 360, (245, 245, 245), -1)
+        if eye_open > 0.3:
+            cv2.circle(frame, (ex, ey), max(1, int(size * 0.06)), dark, -1)
+    cv2.line(frame, (cx, cy - int(size * 0.1)), (cx - int(size * 0.06), cy + int(size * 0.2)), (110, 140, 180), 3)
+    mouth_h = max(2, int(size * 0.18 * mouth_open))
+    cv2.ellipse(frame, (cx, cy + int(size * 0.5)), (int(size * 0.28), mouth_h), 0, 0, 360, (60, 50, 140), -1)
+
+
+def _synthetic_face_frames(rng, width, height, fps, seconds):
+    background = _background(rng, width, height)
+    for i in range(int(round(seconds * fps))):
+        t = i / fps
+        frame = background.copy()
+        center = (int(width / 2 + 40 * math.sin(2 * math.pi * 0.3 * t)),
+                  int(height / 2 + 20 * math.sin(2 * math.pi * 0.45 * t)))
+        size = int(height * 0.28 * (1.0 + 0.05 * math.sin(2 * math.pi * 0.2 * t)))
+        _draw_face(frame, center, size, _eye_openness(t), _mouth_openness(t))
+        yield frame
+
+
+def _animated_photo_frames(photo, width, height, fps, seconds):
+    """A still photo moved like a hand-held head: small pan, roll and zoom"""
+    scale = min(width / photo.shape[1], height / photo.shape[0])
+    photo = cv2.resize(photo, (int(photo.shape[1] * scale), int(photo.shape[0] * scale)), interpolation=cv2.INTER_AREA)
+    canvas = np.zeros((height, width, 3), dtype=np.uint8)
+    y0, x0 = (height - photo.shape[0]) // 2, (width - photo.shape[1]) // 2
+    canvas[y0:y0 + photo.shape[0], x0:x0 + photo.shape[1]] = photo
+    for i in range(int(round(seconds * fps))):
+        t = i / fps
+        matrix = cv2.getRotationMatrix2D((width / 2, height / 2), 4.0 * math.sin(2 * math.pi * 0.25 * t),
+                                         1.0 + 0.04 * math.sin(2 * math.pi * 0.15 * t))
+        matrix[0, 2] += 20 * math.sin(2 * math.pi * 0.3 * t)
+        matrix[1, 2] += 10 * math.sin(2 * math.pi * 0.4 * t)
+        yield cv2.warpAffine(canvas, matrix, (width, height), borderMode=cv2.BORDER_REFLECT)
+
+
+def _write_video(path: str, frames, fps: float, width: int, height: int,
+                 rng: np.random.Generator, noise_sigma: float = 2.0) -> int:
+    """Encode frames as Motion-JPEG (available in every OpenCV build), with seeded sensor noise"""
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        raise RuntimeError(f"OpenCV cannot write {path}")
+    count = 0
+    try:
+        for frame in frames:
+            noise = rng.normal(0.0, noise_sigma, frame.shape)
+            writer.write(np.clip(frame + noise, 0, 255).astype(np.uint8))
+            count += 1
+    finally:
+        writer.release()
+    return count
+
+
+def file_sha256(path: str, chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _files(directory: Optional[str], extensions: Tuple[str, ...]) -> List[str]:
+    if not directory or not os.path.isdir(directory):
+        return []
+    return sorted(p for p in glob.glob(os.path.join(directory, '*')) if p.lower().endswith(extensions))
+
+
+def generate_fixtures(output_dir: str, reference_dir: Optional[str] = None,
+                      recorded_dir: Optional[str] = None,
+                      config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Write the fixture videos and their manifest
+
+    Args:
+        output_dir: Directory for the clips and fixtures.json
+        reference_dir: Photos to animate into clips (each also serves as the
+            person verification reference for its clip)
+        recorded_dir: Recorded clips to copy in; ``<clip>.jpg`` next to a clip
+            is used as its reference photo
+        config: Overrides of DEFAULT_BENCHMARK_CONFIG (seed, fps, seconds, size)
+
+    Returns:
+        The manifest
+    """
+    config = dict(DEFAULT_BENCHMARK_CONFIG, **(config or {}))
+    width, height, fps, seconds = config['width'], config['height'], config['fps'], config['seconds']
+    os.makedirs(output_dir, exist_ok=True)
+    fixtures = []
+
+    def add(name, kind, path, frames, reference=None):
+        entry = {'name': name, 'kind': kind, 'path': os.path.relpath(path, output_dir),
+                 'frames': frames, 'sha256': file_sha256(path)}
+        if reference:
+            entry['reference'] = os.path.relpath(reference, output_dir)
+        fixtures.append(entry)
+
+    # Every clip gets its own generator so adding photos never changes the others
+    path = os.path.join(output_dir, 'synthetic_face.avi')
+    rng = np.random.default_rng(config['seed'])
+    frames = _write_video(path, _synthetic_face_frames(rng, width, height, fps, seconds), fps, width, height, rng)
+    add('synthetic_face', 'synthetic', path, frames)
+
+    for index, photo_path in enumerate(_files(reference_dir, IMAGE_EXTENSIONS)):
+        photo = cv2.imread(photo_path, cv2.IMREAD_COLOR)
+        if photo is None:
+            continue
+        stem = os.path.splitext(os.path.basename(photo_path))[0]
+        name = f"photo_{''.join(c if c.isalnum() else '_' for c in stem)}"
+        reference = os.path.join(output_dir, f'{name}_reference.jpg')
+        shutil.copyfile(photo_path, reference)
+        path = os.path.join(output_dir, f'{name}.avi')
+        rng = np.random.default_rng(config['seed'] + 1 + index)
+        frames = _write_video(path, _animated_photo_frames(photo, width, height, fps, seconds),
+                              fps, width, height, rng)
+        add(name, 'animated_photo', path, frames, reference)
+
+    recorded_out = os.path.join(output_dir, 'recorded')
+    for clip in _files(recorded_dir, VIDEO_EXTENSIONS):
+        os.makedirs(recorded_out, exist_ok=True)
+        target = os.path.join(recorded_out, os.path.basename(clip))
+        shutil.copyfile(clip, target)
+        reference = None
+        for ext in IMAGE_EXTENSIONS:
+            candidate = os.path.splitext(clip)[0] + ext
+            if os.path.exists(candidate):
+                reference = os.path.join(recorded_out, os.path.basename(candidate))
+                shutil.copyfile(candidate, reference)
+                break
+        capture = cv2.VideoCapture(target)
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        capture.release()
+        add(f"recorded_{os.path.splitext(os.path.basename(clip))[0]}", 'recorded', target, frames, reference)
+
+    manifest = {
+        'schema': SCHEMA_VERSION,
+        'generated_at': datetime.utcnow().isoformat(),
+        'opencv': cv2.__version__,
+        'config': {k: config[k] for k in ('seed', 'fps', 'seconds', 'width', 'height')},
+        'fixtures': fixtures
+    }
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_fixtures(fixture_dir: str, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Fixtures from a manifest with absolute paths, checked against their hashes"""
+    with open(os.path.join(fixture_dir, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+    fixtures = []
+    for entry in manifest['fixtures']:
+        if names and entry['name'] not in names:
+            continue
+        entry = dict(entry, path=os.path.join(fixture_dir, entry['path']))
+        if entry.get('reference'):
+            entry['reference'] = os.path.join(fixture_dir, entry['reference'])
+        if file_sha256(entry['path']) != entry['sha256']:
+            raise ValueError(f"Fixture {entry['name']} does not match its manifest hash; regenerate the fixtures")
+        fixtures.append(entry)
+    return fixtures
+
+
+# --------------------------------------------------------------------------
+# Running
+# --------------------------------------------------------------------------
+
+def peak_rss_bytes() -> Optional[int]:
+    """Peak resident set size of this process"""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Kilobytes on Linux, bytes on macOS
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except Exception:
+        pass
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().peak_wset
+    except Exception:
+        return None
+
+
+def _percentiles(values_ms: List[float]) -> Dict[str, float]:
+    if not values_ms:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = np.asarray(values_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {'mean': round(float(values.mean()), 3), 'p50': round(float(p50), 3), 'p95': round(float(p95), 3),
+            'p99': round(float(p99), 3), 'max': round(float(values.max()), 3)}
+
+
+def _reference_embedding(service, fixture: Dict[str, Any], reference_dir: Optional[str]) -> np.ndarray:
+    """The clip's reference photo embedding, any reference photo, or a fixed random template"""
+    candidates = [fixture.get('reference')] + _files(reference_dir, IMAGE_EXTENSIONS)
+    for path in candidates:
+        if not path:
+            continue
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            continue
+        try:
+            return service.get_reference_embedding(image)
+        except ValueError:
+            continue
+    embedding = np.random.default_rng(0).standard_normal(512).astype(np.float32)
+    return embedding / np.linalg.norm(embedding)
+
+
+def _load_service(name: str):
+    if name == 'face_detection':
+        from .face_detection_service import FaceDetectionService
+        return FaceDetectionService()
+    if name == 'person_verification':
+        from .person_verification_service import PersonVerificationService
+        return PersonVerificationService()
+    if name == 'midas_liveness':
+        from .midas_liveness_service import MidasLivenessService
+        return MidasLivenessService()
+    if name == 'blink_detection':
+        from .blink_detection_service import BlinkDetectionService
+        return BlinkDetectionService()
+    if name == 'mouth_captcha':
+        from .mouth_captcha_service import MouthCaptchaService
+        return MouthCaptchaService()
+    raise ValueError(f"Unknown service: {name}")
+
+
+def _frame_runner(name: str, service, fixture: Dict[str, Any], fps: float,
+                  reference_dir: Optional[str]) -> Tuple[Callable[[np.ndarray, float], None], Callable[[], Dict]]:
+    """(analyse one frame, finish and return the step result) for a service"""
+    if name == 'face_detection':
+        detections = []
+        return (lambda frame, t: detections.append(len(service.detect_faces(frame)) > 0),
+                lambda: {'success': any(detections), 'face_rate': round(float(np.mean(detections or [0])), 4)})
+
+    if name == 'person_verification':
+        analyzer = service.create_analyzer(_reference_embedding(service, fixture, reference_dir))
+    elif name == 'mouth_captcha':
+        # Seeded low-level noise stands in for the microphone so ASR runs every frame
+        from .mouth_captcha_service import AudioFeed
+        feed = AudioFeed()
+        rng = np.random.default_rng(0)
+        samples = int(feed.samplerate / fps)
+        analyzer = service.create_analyzer(audio_feed=feed)
+
+        def feed_frame(frame, t):
+            feed.push(rng.normal(0, 30, samples).astype(np.int16).tobytes())
+            analyzer.feed_frame(frame, t)
+    else:
+        analyzer = service.create_analyzer()
+
+    analyzer.start()
+
+    def finish():
+        analyzer.stop()
+        result = analyzer.final_result()
+        return {'success': bool(result.get('success')), 'confidence': round(float(result.get('confidence', 0.0)), 4)}
+
+    return (feed_frame if name == 'mouth_captcha' else analyzer.feed_frame), finish
+
+
+def _run_fixture(name: str, service, fixture: Dict[str, Any], options: Dict[str, Any]) -> Dict[str, Any]:
+    from .frame_sources import VideoFileFrameSource
+    from .metrics import STAGE_SECONDS, metrics
+
+    source = VideoFileFrameSource(fixture['path'])
+    if not source.is_opened():
+        return {'error': f"Cannot open {fixture['path']}"}
+    analyse, finish = _frame_runner(name, service, fixture, source.fps, options.get('reference_dir'))
+    warmup = options['warmup_frames']
+    max_frames = options.get('max_frames')
+    decode_ms, latency_ms = [], []
+    started = None
+    if warmup == 0:
+        metrics.reset()
+        started = time.perf_counter()
+    try:
+        while max_frames is None or len(latency_ms) < max_frames:
+            t0 = time.perf_counter()
+            frame = source.get_frame()
+            t1 = time.perf_counter()
+            if frame is None:
+                break
+            analyse(frame, source.timestamp)
+            t2 = time.perf_counter()
+            if source.frames_read <= warmup:
+                if source.frames_read == warmup:
+                    metrics.reset()
+                    started = time.perf_counter()
+                continue
+            decode_ms.append((t1 - t0) * 1000)
+            latency_ms.append((t2 - t1) * 1000)
+        elapsed = time.perf_counter() - started if started is not None else 0.0
+        result = finish()
+    finally:
+        source.release()
+
+    stages = {stage: {'count': s['count'], 'mean_ms': round(s['mean'] * 1000, 3)}
+              for stage, s in sorted(STAGE_SECONDS.summary().items()) if s['count']}
+    return {
+        'frames': len(latency_ms),
+        'warmup_frames': min(warmup, source.frames_read),
+        # End-to-end rate (decode + analysis) over the timed frames
+        'throughput_fps': round(len(latency_ms) / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': _percentiles(latency_ms),
+        'decode_ms': _percentiles(decode_ms),
+        'stages': stages,
+        'result': result
+    }
+
+
+def benchmark_service(name: str, fixtures: List[Dict[str, Any]], options: Dict[str, Any]) -> Dict[str, Any]:
+    """Load one service and run it over every fixture (call in a fresh process)"""
+    if options.get('threads'):
+        cv2.setNumThreads(options['threads'])
+    report: Dict[str, Any] = {}
+    start = time.perf_counter()
+    try:
+        service = _load_service(name)
+    except Exception as e:
+        return {'error': f"Failed to load {name}: {e}"}
+    report['load_seconds'] = round(time.perf_counter() - start, 3)
+    if hasattr(service, 'is_model_loaded') and not service.is_model_loaded():
+        return dict(report, error=f"{name} models not loaded")
+
+    report['fixtures'] = {}
+    for fixture in fixtures:
+        try:
+            report['fixtures'][fixture['name']] = _run_fixture(name, service, fixture, options)
+        except Exception as e:
+            report['fixtures'][fixture['name']] = {'error': str(e)}
+    peak = peak_rss_bytes()
+    report['peak_rss_mb'] = round(peak / (1024 * 1024), 1) if peak is not None else None
+    return report
+
+
+def environment() -> Dict[str, Any]:
+    """Host and library details that make two runs comparable (or not)"""
+    env = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'threads': {k: os.environ.get(k) for k in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'ORT_INTRA_OP_THREADS')
+                    if os.environ.get(k)}
+    }
+    try:
+        env['git_commit'] = subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        pass
+    return env
+
+
+def run_benchmarks(fixtures: List[Dict[str, Any]], services: Optional[List[str]] = None,
+                   options: Optional[Dict[str, Any]] = None,
+                   on_service: Optional[Callable[[str, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Benchmark each service in its own spawned process
+
+    Args:
+        fixtures: Entries from load_fixtures()
+        services: Service names (default: all of SERVICES)
+        options: ``warmup_frames``, ``max_frames``, ``threads``, ``reference_dir``
+        on_service: Called with (service, report) as each service finishes
+
+    Returns:
+        The JSON-serialisable report
+    """
+    options = dict({'warmup_frames': DEFAULT_BENCHMARK_CONFIG['warmup_frames']}, **(options or {}))
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for name in services or SERVICES:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            try:
+                results[name] = pool.submit(benchmark_service, name, fixtures, options).result()
+            except Exception as e:
+                results[name] = {'error': str(e)}
+        if on_service is not None:
+            on_service(name, results[name])
+    return {
+        'schema': SCHEMA_VERSION,
+        'created_at': datetime.utcnow().isoformat(),
+        'environment': environment(),
+        'options': options,
+        'fixtures': {f['name']: f['sha256'] for f in fixtures},
+        'results': results
+    }
+
+
+# --------------------------------------------------------------------------
+# Comparison
+# --------------------------------------------------------------------------
+
+# (path into a fixture or service report, True if larger is worse)
+_COMPARED = [
+    (('latency_ms', 'p50'), True),
+    (('latency_ms', 'p95'), True),
+    (('throughput_fps',), False),
+]
+
+
+def _lookup(report: Dict[str, Any], path: Tuple[str, ...]) -> Optional[float]:
+    for key in path:
+        if not isinstance(report, dict) or key not in report:
+            return None
+        report = report[key]
+    return report if isinstance(report, (int, float)) else None
+
+
+def _change(metric: str, base: Optional[float], current: Optional[float], larger_is_worse: bool,
+            tolerance: float) -> Optional[Dict[str, Any]]:
+    if base is None or current is None or base == 0:
+        return None
+    relative = (current - base) / base
+    worse = relative > tolerance if larger_is_worse else relative < -tolerance
+    better = relative < -tolerance if larger_is_worse else relative > tolerance
+    return {'metric': metric, 'baseline': base, 'current': current, 'change': round(relative, 4),
+            'status': 'regression' if worse else 'improvement' if better else 'unchanged'}
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any],
+                    tolerance: Optional[float] = None, rss_tolerance: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Per-metric relative changes of ``current`` against ``baseline``
+
+    Latency p50/p95 and throughput are compared per service and fixture,
+    peak RSS per service. A change beyond the tolerance in the bad direction
+    is a regression. A service or fixture measured in the baseline that
+    errored or is absent now is ``missing``; one that already errored in the
+    baseline cannot be compared and is only ``skipped``.
+    """
+    tolerance = DEFAULT_BENCHMARK_CONFIG['tolerance'] if tolerance is None else tolerance
+    rss_tolerance = DEFAULT_BENCHMARK_CONFIG['rss_tolerance'] if rss_tolerance is None else rss_tolerance
+    changes, missing, skipped = [], [], []
+
+    for service, base_report in baseline.get('results', {}).items():
+        report = current.get('results', {}).get(service)
+        if 'error' in base_report:
+            skipped.append(service)
+            continue
+        if report is None or 'error' in report:
+            missing.append(service)
+            continue
+        change = _change('peak_rss_mb', base_report.get('peak_rss_mb'), report.get('peak_rss_mb'), True, rss_tolerance)
+        if change:
+            changes.append(dict(change, service=service, fixture=None))
+        for fixture, base_fixture in base_report.get('fixtures', {}).items():
+            if 'error' in base_fixture:
+                skipped.append(f'{service}/{fixture}')
+                continue
+            fixture_report = report.get('fixtures', {}).get(fixture)
+            if fixture_report is None or 'error' in fixture_report:
+                missing.append(f'{service}/{fixture}')
+                continue
+            for path, larger_is_worse in _COMPARED:
+                change = _change('.'.join(path), _lookup(base_fixture, path), _lookup(fixture_report, path),
+                                 larger_is_worse, tolerance)
+                if change:
+                    changes.append(dict(change, service=service, fixture=fixture))
+
+    base_env, env = baseline.get('environment', {}), current.get('environment', {})
+    mismatched = [key for key in ('platform', 'cpu_count', 'opencv', 'numpy', 'python', 'threads')
+                  if base_env.get(key) != env.get(key)]
+    fixture_drift = [name for name, digest in baseline.get('fixtures', {}).items()
+                     if current.get('fixtures', {}).get(name) not in (None, digest)]
+    return {
+        'tolerance': tolerance,
+        'rss_tolerance': rss_tolerance,
+        'regressions': [c for c in changes if c['status'] == 'regression'],
+        'improvements': [c for c in changes if c['status'] == 'improvement'],
+        'compared': len(changes),
+        # Measured in the baseline but failed or not run now
+        'missing': missing,
+        'skipped': skipped,
+        # Differences that make the numbers not comparable
+        'environment_mismatch': mismatched,
+        'fixture_mismatch': fixture_drift
+    }
@@ -7,8 +7,12 @@ import numpy as np
 import logging
 import os
 import sys
-import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+from .face_tracker import DEFAULT_TRACKING_CONFIG, FaceTracker
+from .frame_context import FrameContext, FrameContextCache
+from .liveness_pipeline import FrameAnalyzer
+from .model_registry import model_registry
 
 # Add the flask-api directory to the path to import existing modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -24,6 +28,8 @@ class BlinkDetectionService:
         self.model_loaded = False
         self.detector = None
         self.predictor = None
+        # Detect-then-track settings for the dlib face detector
+        self.tracking_config = dict(DEFAULT_TRACKING_CONFIG)
         self._load_model()
     
     def _load_model(self):
@@ -47,8 +53,11 @@ class BlinkDetectionService:
                 logger.info("Facial landmark predictor downloaded")
             
             # Load models
-            self.detector = dlib.get_frontal_face_detector()
-            self.predictor = dlib.shape_predictor(predictor_path)
+            self.detector = model_registry.get("dlib_frontal_face_detector", dlib.get_frontal_face_detector)
+            self.predictor = model_registry.get(
+                f"dlib_shape_predictor:{predictor_path}",
+                lambda: dlib.shape_predictor(predictor_path)
+            )
             self.face_utils = face_utils
             self.dist = dist
             
@@ -101,12 +110,30 @@ class BlinkDetectionService:
             gaze_ratio = left_white / right_white
         return gaze_ratio
     
-    def detect_blinks(self, camera, duration: int = 4, display: bool = False) -> Dict[str, Any]:
+    def create_face_tracker(self) -> Optional[FaceTracker]:
+        """Detect-then-track wrapper for the dlib detector, if tracking is enabled"""
+        return FaceTracker.from_config(self.detector, self.tracking_config)
+    
+    def create_context_cache(self) -> FrameContextCache:
+        """Per-frame artifact cache backed by this service's dlib models"""
+        return FrameContextCache(face_detector=self.detector, shape_predictor=self.predictor,
+                                 face_tracker=self.create_face_tracker())
+    
+    def create_analyzer(self, duration: Optional[float] = None, max_fps: Optional[float] = None,
+                        display: bool = False, context_cache: Optional[FrameContextCache] = None,
+                        early_stop: Optional[Dict[str, Any]] = None) -> 'BlinkAnalyzer':
+        """Create an incremental blink/gaze analyzer for the fused pipeline"""
+        return BlinkAnalyzer(self, duration=duration, max_fps=max_fps, display=display,
+                             context_cache=context_cache or self.create_context_cache(),
+                             early_stop=early_stop)
+    
+    def detect_blinks(self, camera, duration: int = 4, display: bool = False,
+                      early_stop: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Detect natural blinks and gaze movements for liveness
         
         Args:
-            camera: Camera object with get_frame() method
+            camera: FrameSource (device, video file, image sequence or ring buffer)
             duration: Duration to run detection in seconds
             display: Whether to show visual feedback
             
@@ -122,69 +149,17 @@ class BlinkDetectionService:
             }
         
         try:
-            # Thresholds
-            EYE_AR_THRESH = 0.22
-            EYE_AR_CONSEC_FRAMES = 2
+            analyzer = self.create_analyzer(duration=duration, display=display, early_stop=early_stop)
+            start_time = camera.clock()
             
-            counter = 0
-            total_blinks = 0
-            gaze_movements = 0
-            ear_values = []
-            gaze_values = []
-            
-            start_time = time.time()
-            frame_count = 0
-            
-            while time.time() - start_time < duration:
+            while not analyzer.is_done(camera.clock() - start_time):
                 frame = camera.get_frame()
                 if frame is None:
+                    if camera.exhausted:
+                        break
                     continue
                 
-                frame_count += 1
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                rects = self.detector(gray, 0)
-
-                for rect in rects:
-                    shape = self.predictor(gray, rect)
-                    shape_np = self.face_utils.shape_to_np(shape)
-
-                    left_eye = shape_np[self.lStart:self.lEnd]
-                    right_eye = shape_np[self.rStart:self.rEnd]
-                    left_ear = self.eye_aspect_ratio(left_eye)
-                    right_ear = self.eye_aspect_ratio(right_eye)
-                    ear = (left_ear + right_ear) / 2.0
-                    ear_values.append(ear)
-
-                    # Blink detection
-                    if ear < EYE_AR_THRESH:
-                        counter += 1
-                    else:
-                        if counter >= EYE_AR_CONSEC_FRAMES:
-                            total_blinks += 1
-                        counter = 0
-
-                    # Draw eyes
-                    if display:
-                        cv2.drawContours(frame, [cv2.convexHull(left_eye)], -1, (0, 255, 0), 1)
-                        cv2.drawContours(frame, [cv2.convexHull(right_eye)], -1, (0, 255, 0), 1)
-
-                    # Gaze movement detection
-                    gaze_left = self.get_gaze_ratio([36, 37, 38, 39, 40, 41], shape, gray)
-                    gaze_right = self.get_gaze_ratio([42, 43, 44, 45, 46, 47], shape, gray)
-                    gaze_avg = (gaze_left + gaze_right) / 2
-                    gaze_values.append(gaze_avg)
-
-                    if gaze_avg <= 0.8 or gaze_avg >= 1.5:
-                        gaze_movements += 1
-
-                    # Overlay info
-                    if display:
-                        cv2.putText(frame, f"Blinks: {total_blinks}", (10, 30),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-                        cv2.putText(frame, f"Gaze Movements: {gaze_movements}", (10, 60),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
-                        cv2.putText(frame, f"EAR: {ear:.2f}", (10, 90),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                analyzer.feed_frame(frame, camera.clock() - start_time)
 
                 # Display
                 if display:
@@ -195,24 +170,7 @@ class BlinkDetectionService:
             if display:
                 cv2.destroyAllWindows()
             
-            # Calculate confidence based on blinks and gaze movements
-            blink_score = min(1.0, total_blinks / 2.0)  # Normalize to 0-1
-            gaze_score = min(1.0, gaze_movements / 3.0)  # Normalize to 0-1
-            confidence = (blink_score + gaze_score) / 2.0
-            
-            # Success criteria
-            success = total_blinks >= 1 and gaze_movements >= 2
-            
-            return {
-                'success': success,
-                'confidence': float(confidence),
-                'blinks_detected': total_blinks,
-                'gaze_movements': gaze_movements,
-                'frames_processed': frame_count,
-                'avg_ear': float(np.mean(ear_values)) if ear_values else 0.0,
-                'avg_gaze': float(np.mean(gaze_values)) if gaze_values else 0.0,
-                'message': 'Blink detection completed successfully' if success else 'Insufficient blink/gaze activity detected'
-            }
+            return analyzer.final_result()
             
         except Exception as e:
             logger.error(f"Blink detection failed: {e}")
@@ -222,3 +180,104 @@ class BlinkDetectionService:
                 'message': f'Blink detection failed: {str(e)}',
                 'error': str(e)
             }
+
+
+class BlinkAnalyzer(FrameAnalyzer):
+    """Per-frame blink and gaze movement analysis"""
+    
+    name = 'blink_detection'
+    
+    # Thresholds
+    EYE_AR_THRESH = 0.22
+    EYE_AR_CONSEC_FRAMES = 2
+    
+    def __init__(self, service: BlinkDetectionService, duration: Optional[float] = None,
+                 max_fps: Optional[float] = None, display: bool = False,
+                 context_cache: Optional[FrameContextCache] = None,
+                 early_stop: Optional[Dict[str, Any]] = None):
+        super().__init__(duration=duration, max_fps=max_fps, context_cache=context_cache,
+                         early_stop=early_stop)
+        self.service = service
+        self.display = display
+        self.counter = 0
+        self.total_blinks = 0
+        self.gaze_movements = 0
+        self.ear_values = []
+        self.gaze_values = []
+    
+    def process(self, ctx: FrameContext):
+        """Update blink and gaze counters from one frame"""
+        service = self.service
+        frame = ctx.frame
+        gray = ctx.gray
+
+        for rect, shape, shape_np in ctx.get('landmarks68'):
+
+            left_eye = shape_np[service.lStart:service.lEnd]
+            right_eye = shape_np[service.rStart:service.rEnd]
+            left_ear = service.eye_aspect_ratio(left_eye)
+            right_ear = service.eye_aspect_ratio(right_eye)
+            ear = (left_ear + right_ear) / 2.0
+            self.ear_values.append(ear)
+
+            # Blink detection
+            if ear < self.EYE_AR_THRESH:
+                self.counter += 1
+            else:
+                if self.counter >= self.EYE_AR_CONSEC_FRAMES:
+                    self.total_blinks += 1
+                self.counter = 0
+
+            # Draw eyes
+            if self.display:
+                cv2.drawContours(frame, [cv2.convexHull(left_eye)], -1, (0, 255, 0), 1)
+                cv2.drawContours(frame, [cv2.convexHull(right_eye)], -1, (0, 255, 0), 1)
+
+            # Gaze movement detection
+            gaze_left = service.get_gaze_ratio([36, 37, 38, 39, 40, 41], shape, gray)
+            gaze_right = service.get_gaze_ratio([42, 43, 44, 45, 46, 47], shape, gray)
+            gaze_avg = (gaze_left + gaze_right) / 2
+            self.gaze_values.append(gaze_avg)
+
+            if gaze_avg <= 0.8 or gaze_avg >= 1.5:
+                self.gaze_movements += 1
+
+            # Overlay info
+            if self.display:
+                cv2.putText(frame, f"Blinks: {self.total_blinks}", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+                cv2.putText(frame, f"Gaze Movements: {self.gaze_movements}", (10, 60),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+                cv2.putText(frame, f"EAR: {ear:.2f}", (10, 90),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+    
+    def _score(self) -> Tuple[bool, float]:
+        blink_score = min(1.0, self.total_blinks / 2.0)  # Normalize to 0-1
+        gaze_score = min(1.0, self.gaze_movements / 3.0)  # Normalize to 0-1
+        success = self.total_blinks >= 1 and self.gaze_movements >= 2
+        return success, (blink_score + gaze_score) / 2.0
+    
+    def evidence(self) -> Optional[Tuple[bool, float]]:
+        """Blink/gaze criteria met so far, and the running confidence"""
+        return self._score()
+    
+    def progress(self) -> Dict[str, Any]:
+        state = super().progress()
+        state.update(blinks_detected=self.total_blinks, gaze_movements=self.gaze_movements)
+        return state
+    
+    def result(self) -> Dict[str, Any]:
+        """Score the blinks and gaze movements seen so far"""
+        # Confidence from blinks and gaze movements; success needs 1 blink and 2 gaze shifts
+        success, confidence = self._score()
+        
+        return {
+            'success': success,
+            'confidence': float(confidence),
+            'blinks_detected': self.total_blinks,
+            'gaze_movements': self.gaze_movements,
+            'frames_processed': self.frames_processed,
+            'avg_ear': float(np.mean(self.ear_values)) if self.ear_values else 0.0,
+            'avg_gaze': float(np.mean(self.gaze_values)) if self.gaze_values else 0.0,
+            'message': 'Blink detection completed successfully' if success else 'Insufficient blink/gaze activity detected'
+        }
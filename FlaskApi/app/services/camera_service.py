@@ -2,9 +2,10 @@
 Camera Service - Wrapper for camera functionality
 """
 
-import cv2
 import logging
-from typing import Optional
+from typing import Any, Dict, Optional
+
+from .frame_sources import DEFAULT_CAPTURE_CONFIG, DeviceFrameSource, ThreadedDeviceFrameSource
 
 logger = logging.getLogger(__name__)
 
@@ -14,16 +15,28 @@ class CameraService:
     def __init__(self):
         self.camera = None
         self.camera_source = 0
+        # Background grabber settings (shared with LivenessDetectionService.config)
+        self.capture_config = dict(DEFAULT_CAPTURE_CONFIG)
+    
+    def _open(self, source: int) -> DeviceFrameSource:
+        config = self.capture_config
+        if not config.get('threaded'):
+            return DeviceFrameSource(source)
+        return ThreadedDeviceFrameSource(source,
+                                         buffer_size=config.get('buffer_size', 4),
+                                         policy=config.get('policy', 'latest'),
+                                         read_timeout=config.get('read_timeout', 0.1))
     
-    def get_camera(self, source: int = 0) -> Optional[cv2.VideoCapture]:
-        """Get camera instance"""
+    def get_camera(self, source: int = 0) -> Optional[DeviceFrameSource]:
+        """Get camera instance as a frame source"""
         try:
-            if self.camera is None or not self.camera.isOpened():
-                self.camera = cv2.VideoCapture(source, cv2.CAP_DSHOW)
+            if self.camera is None or not self.camera.is_opened():
+                self.camera = self._open(source)
                 self.camera_source = source
                 
-                if not self.camera.isOpened():
+                if not self.camera.is_opened():
                     logger.error("Failed to open camera")
+                    self.camera = None
                     return None
                 
                 logger.info(f"Camera opened successfully (source: {source})")
@@ -36,36 +49,37 @@ class CameraService:
     def is_camera_available(self) -> bool:
         """Check if camera is available"""
         try:
-            test_camera = cv2.VideoCapture(0, cv2.CAP_DSHOW)
-            if test_camera.isOpened():
-                test_camera.release()
-                return True
-            return False
+            test_camera = DeviceFrameSource(0)
+            available = test_camera.is_opened()
+            test_camera.release()
+            return available
         except:
             return False
     
+    def capture_stats(self) -> Dict[str, Any]:
+        """Grabber counters of the open camera (empty when capture is not threaded)"""
+        camera = self.camera
+        if camera is None or not hasattr(camera, 'stats'):
+            return {}
+        return camera.stats()
+    
     def release_camera(self):
         """Release camera resources"""
         try:
             if self.camera is not None:
+                stats = self.capture_stats()
                 self.camera.release()
                 self.camera = None
-                logger.info("Camera released")
+                if stats:
+                    logger.info(f"Camera released (captured {stats['frames_captured']}, "
+                                f"dropped {stats['frames_dropped']}, duplicated {stats['frames_duplicated']})")
+                else:
+                    logger.info("Camera released")
         except Exception as e:
             logger.error(f"Error releasing camera: {e}")
     
     def get_frame(self) -> Optional[object]:
         """Get frame from camera"""
-        try:
-            if self.camera is None:
-                return None
-            
-            ret, frame = self.camera.read()
-            if not ret:
-                logger.warning("Failed to read frame from camera")
-                return None
-            
-            return frame
-        except Exception as e:
-            logger.error(f"Error getting frame: {e}")
+        if self.camera is None:
             return None
+        return self.camera.get_frame()
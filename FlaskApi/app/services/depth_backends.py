@@ -0,0 +1,305 @@
+"""
+Depth Backends - Interchangeable MiDaS_small inference engines
+
+``torch`` runs the torch.hub model in eager PyTorch. ``onnx`` runs a locally
+stored ONNX export with ONNX Runtime, so workers start without torch.hub or
+network access once the model has been exported. ``onnx_int8`` runs an INT8
+quantized copy of that export (see quantize_midas_onnx.py).
+
+Every backend turns an RGB frame into a model input with ``prepare()`` and
+runs a list of prepared inputs with ``infer()``, batching inputs of equal
+shape into one forward pass.
+"""
+
+import os
+import logging
+import tempfile
+from typing import Any, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEPTH_MODEL_NAME = "MiDaS_small"
+
+# MiDaS_small input: longest side fitted to 256, both sides multiples of 32
+MIDAS_SMALL_INPUT_SIZE = 256
+MIDAS_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+MIDAS_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+DEFAULT_ONNX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'models', 'midas_small.onnx'
+)
+DEFAULT_INT8_ONNX_PATH = os.path.join(os.path.dirname(DEFAULT_ONNX_PATH), 'midas_small_int8.onnx')
+
+
+def _constrain_to_multiple_of(x: float, multiple: int = 32, max_val: Optional[int] = None) -> int:
+    y = int(np.round(x / multiple) * multiple)
+    if max_val is not None and y > max_val:
+        y = int(np.floor(x / multiple) * multiple)
+    if y < multiple:
+        y = int(np.ceil(x / multiple) * multiple)
+    return y
+
+
+def midas_small_preprocess(rgb: np.ndarray, size: int = MIDAS_SMALL_INPUT_SIZE) -> np.ndarray:
+    """
+    NumPy equivalent of the torch.hub ``small_transform``
+
+    Returns a (1, 3, H, W) float32 array.
+    """
+    h, w = rgb.shape[:2]
+    # "upper_bound" resize keeping the aspect ratio
+    scale = min(size / h, size / w)
+    new_h = _constrain_to_multiple_of(scale * h, max_val=size)
+    new_w = _constrain_to_multiple_of(scale * w, max_val=size)
+
+    image = cv2.resize(rgb, (new_w, new_h), interpolation=cv2.INTER_CUBIC).astype(np.float32) / 255.0
+    image = (image - MIDAS_MEAN) / MIDAS_STD
+    return np.ascontiguousarray(image.transpose(2, 0, 1)[np.newaxis], dtype=np.float32)
+
+
+def _group_by_shape(inputs: List[Any]) -> Dict[tuple, List[int]]:
+    groups: Dict[tuple, List[int]] = {}
+    for i, inp in enumerate(inputs):
+        groups.setdefault(tuple(inp.shape), []).append(i)
+    return groups
+
+
+class DepthBackend:
+    """Base class for MiDaS inference engines"""
+
+    name = 'depth'
+
+    def prepare(self, rgb: np.ndarray) -> Any:
+        """Model input (batch of one) for an RGB frame"""
+        raise NotImplementedError
+
+    def _forward(self, batch: Any) -> np.ndarray:
+        """(N, H, W) depth for a batch of equally shaped inputs"""
+        raise NotImplementedError
+
+    def _concat(self, inputs: List[Any]) -> Any:
+        raise NotImplementedError
+
+    def infer(self, inputs: List[Any]) -> List[np.ndarray]:
+        """Depth map per prepared input, batching inputs of equal shape"""
+        outputs: List[Optional[np.ndarray]] = [None] * len(inputs)
+        for indices in _group_by_shape(inputs).values():
+            depth = self._forward(self._concat([inputs[i] for i in indices]))
+            for j, i in enumerate(indices):
+                outputs[i] = depth[j]
+        return outputs
+
+    def predict(self, rgb: np.ndarray) -> np.ndarray:
+        """Depth map (model resolution) for one RGB frame"""
+        return self.infer([self.prepare(rgb)])[0]
+
+
+class TorchDepthBackend(DepthBackend):
+    """MiDaS_small from torch.hub in eager PyTorch"""
+
+    name = 'torch'
+
+    def __init__(self, model, transform, device: str):
+        import torch
+
+        self.torch = torch
+        self.model = model
+        self.transform = transform
+        self.device = device
+
+    def prepare(self, rgb: np.ndarray):
+        return self.transform(rgb).to(self.device)
+
+    def _concat(self, inputs):
+        return self.torch.cat(inputs, dim=0)
+
+    def _forward(self, batch) -> np.ndarray:
+        with self.torch.no_grad():
+            return self.model(batch).cpu().numpy()
+
+
+class OnnxDepthBackend(DepthBackend):
+    """MiDaS_small exported to ONNX, run with ONNX Runtime on CPU"""
+
+    name = 'onnx'
+
+    def __init__(self, onnx_path: str, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 providers: Optional[List[str]] = None):
+        """
+        Args:
+            onnx_path: Exported model file
+            intra_op_threads: Threads used inside one operator (0 = ONNX Runtime default)
+            inter_op_threads: Threads used across independent operators (0 = default)
+            providers: Execution providers (default: CPU)
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = int(intra_op_threads)
+        options.inter_op_num_threads = int(inter_op_threads)
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        self.onnx_path = onnx_path
+        self.session = ort.InferenceSession(onnx_path, sess_options=options,
+                                            providers=providers or ['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def prepare(self, rgb: np.ndarray) -> np.ndarray:
+        return midas_small_preprocess(rgb)
+
+    def _concat(self, inputs):
+        return np.concatenate(inputs, axis=0)
+
+    def _forward(self, batch: np.ndarray) -> np.ndarray:
+        depth = self.session.run(None, {self.input_name: batch})[0]
+        return depth.reshape(depth.shape[0], depth.shape[-2], depth.shape[-1])
+
+
+def load_torch_midas(device: str):
+    """MiDaS_small and its transforms from torch.hub"""
+    import torch
+
+    model = torch.hub.load("intel-isl/MiDaS", DEPTH_MODEL_NAME).to(device).eval()
+    transforms = torch.hub.load("intel-isl/MiDaS", "transforms")
+    return model, transforms.small_transform
+
+
+def export_midas_onnx(onnx_path: str = DEFAULT_ONNX_PATH, opset: int = 12) -> str:
+    """
+    Export MiDaS_small to ONNX (one-time, needs torch.hub)
+
+    Batch size and input height/width are dynamic so the batching scheduler
+    and face-ROI crops can reuse the same file.
+    """
+    import torch
+
+    model, _ = load_torch_midas('cpu')
+    dummy = torch.randn(1, 3, MIDAS_SMALL_INPUT_SIZE, MIDAS_SMALL_INPUT_SIZE)
+
+    out_dir = os.path.dirname(os.path.abspath(onnx_path))
+    os.makedirs(out_dir, exist_ok=True)
+    # A unique file in the target directory: workers exporting at the same time
+    # each write their own copy, and the rename publishes a complete file
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(onnx_path) + '.', suffix='.tmp', dir=out_dir)
+    os.close(fd)
+    try:
+        torch.onnx.export(
+            model, dummy, tmp_path,
+            input_names=['image'], output_names=['depth'],
+            dynamic_axes={'image': {0: 'batch', 2: 'height', 3: 'width'},
+                          'depth': {0: 'batch', 1: 'height', 2: 'width'}},
+            opset_version=opset,
+            do_constant_folding=True
+        )
+        os.replace(tmp_path, onnx_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    logger.info(f"Exported {DEPTH_MODEL_NAME} to {onnx_path}")
+    return onnx_path
+
+
+class _FrameCalibrationReader:
+    """Feeds preprocessed frames to ONNX Runtime static quantization"""
+
+    def __init__(self, input_name: str, frames: List[np.ndarray]):
+        self._inputs = iter([
+            {input_name: midas_small_preprocess(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))}
+            for frame in frames
+        ])
+
+    def get_next(self):
+        return next(self._inputs, None)
+
+
+def quantize_midas_onnx(float_path: str = DEFAULT_ONNX_PATH, int8_path: str = DEFAULT_INT8_ONNX_PATH,
+                        mode: str = 'dynamic', calibration_frames: Optional[List[np.ndarray]] = None) -> str:
+    """
+    Write an INT8 copy of the exported MiDaS_small
+
+    Args:
+        float_path: Float ONNX export
+        int8_path: Output file
+        mode: 'dynamic' (weights only, no calibration data) or 'static'
+            (weights and activations, calibrated on ``calibration_frames``)
+        calibration_frames: BGR frames representative of production input
+    """
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_dynamic, quantize_static
+
+    os.makedirs(os.path.dirname(os.path.abspath(int8_path)), exist_ok=True)
+    if mode == 'dynamic':
+        quantize_dynamic(float_path, int8_path, weight_type=QuantType.QUInt8)
+    elif mode == 'static':
+        if not calibration_frames:
+            raise ValueError("Static quantization needs calibration frames")
+        import onnxruntime as ort
+        input_name = ort.InferenceSession(float_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+        quantize_static(
+            float_path, int8_path, _FrameCalibrationReader(input_name, calibration_frames),
+            quant_format=QuantFormat.QDQ, per_channel=True,
+            activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8
+        )
+    else:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    logger.info(f"Wrote {mode} INT8 {DEPTH_MODEL_NAME} to {int8_path}")
+    return int8_path
+
+
+def synthetic_parity_frames(count: int = 4, seed: int = 0) -> List[np.ndarray]:
+    """
+    BGR frames with depth structure for a parity check when no photos are at hand
+
+    A lit ellipse over a gradient background at a few positions and sizes, plus
+    mild noise. Unlike pure noise these give the network edges and smooth
+    regions to resolve, as real faces do.
+    """
+    rng = np.random.default_rng(seed)
+    height, width = 480, 640
+    ys, xs = np.mgrid[0:height, 0:width].astype(np.float32)
+    frames = []
+    for i in range(count):
+        background = 60 + 120 * (xs / width) * (0.5 + 0.5 * (i % 2)) + 40 * (ys / height)
+        cx, cy = width * (0.35 + 0.1 * i), height * (0.45 + 0.05 * (i % 3))
+        ax, ay = width * (0.12 + 0.02 * i), height * (0.22 + 0.02 * i)
+        r2 = ((xs - cx) / ax) ** 2 + ((ys - cy) / ay) ** 2
+        shading = np.clip(1.0 - r2, 0.0, 1.0)
+        gray = np.where(r2 < 1.0, 110 + 130 * np.sqrt(shading), background)
+        gray = gray + rng.normal(0, 6, gray.shape)
+        frame = np.clip(np.stack([gray * 0.8, gray * 0.9, gray], axis=-1), 0, 255).astype(np.uint8)
+        frames.append(frame)
+    return frames
+
+
+def check_parity(reference: DepthBackend, candidate: DepthBackend,
+                 frames: List[np.ndarray], rtol: float = 1e-2) -> Dict[str, Any]:
+    """
+    Compare two backends on the same frames
+
+    Each backend preprocesses the frame its own way, so the comparison covers
+    preprocessing as well as the network. Errors are relative to the
+    reference depth range.
+    """
+    max_abs, rel_errors = 0.0, []
+    for frame in frames:
+        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        ref = reference.predict(rgb)
+        out = candidate.predict(rgb)
+        if out.shape != ref.shape:
+            out = cv2.resize(out, (ref.shape[1], ref.shape[0]), interpolation=cv2.INTER_LINEAR)
+        diff = np.abs(out - ref)
+        scale = float(ref.max() - ref.min()) or 1.0
+        max_abs = max(max_abs, float(diff.max()))
+        rel_errors.append(float(diff.mean()) / scale)
+
+    mean_rel = float(np.mean(rel_errors)) if rel_errors else 0.0
+    return {
+        'frames': len(frames),
+        'max_abs_diff': max_abs,
+        'mean_rel_error': mean_rel,
+        'within_tolerance': mean_rel <= rtol
+    }
@@ -0,0 +1,84 @@
+"""
+Embedding Cache - Bounded LRU with TTL for reference face embeddings
+
+Clients resend the same reference photo on every retry and step. The cache
+maps a hash of the encoded reference payload to its normalized embedding
+and face metadata, so a repeat verification skips decoding, detection and
+recognition on the reference image entirely.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+DEFAULT_REFERENCE_CACHE_CONFIG = {
+    'enabled': os.environ.get('REFERENCE_EMBEDDING_CACHE', 'True').lower() == 'true',
+    'max_entries': int(os.environ.get('REFERENCE_EMBEDDING_CACHE_SIZE', 1024)),
+    # Entries older than this are recomputed (biometric data should not linger)
+    'ttl_seconds': int(os.environ.get('REFERENCE_EMBEDDING_CACHE_TTL', 900)),
+}
+
+
+def content_hash(data: Union[str, bytes, memoryview, np.ndarray]) -> str:
+    """Stable digest of an (encoded) image payload: base64 text or raw bytes"""
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class EmbeddingCache:
+    """Thread-safe LRU of key -> value with a per-entry time to live"""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 900):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Cached value, or None if missing or expired (counts a hit or miss)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl > 0 and now - entry[0] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            'expired': self.expired,
+            'evictions': self.evictions
+        }
@@ -0,0 +1,380 @@
+"""
+Enrollment service - Persisted face templates for person verification
+
+A user's ArcFace embedding is computed once at enrollment and stored as a
+compact template (float16, or int8 with a per-template scale) next to the
+model it came from. Verification then loads the template instead of
+decoding and embedding a reference image on every request.
+
+Users may enroll a template from a photo themselves only once, and never
+after a KYC submission was approved; replacing a template goes through KYC
+review. Only KYC-approved templates of the current model feed the
+process-wide identity index used for 1:N duplicate searches, so an
+unverified upload cannot plant someone else's face in it.
+
+The index records the newest template timestamp it reflects. On load and
+every ``refresh_interval`` seconds it is compared with the template table:
+templates added or replaced since then (by any worker) are added, and a
+count that still differs (deletions elsewhere) triggers a rebuild. Synced
+indexes are saved back, so a restart starts from a current file.
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import func
+
+from app import db
+from app.models import FaceTemplate, KYCSubmission, User
+from app.services.frame_sources import decode_image_data
+from app.services.identity_index import DEFAULT_IDENTITY_INDEX_CONFIG, IdentityIndex
+from app.services.model_registry import model_registry
+from app.services.person_verification_service import FACE_MODEL_NAME, PersonVerificationService
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_ENCODINGS = ('float16', 'int8')
+# Template sources; only verified (KYC) templates are searched for duplicates
+SELF_ENROLLED = 'self'
+KYC_ENROLLED = 'kyc'
+
+# Last freshness check of each identity index (monotonic seconds), per process
+_index_checked_at: Dict[str, float] = {}
+_index_refresh_lock = threading.Lock()
+DEFAULT_TEMPLATE_ENCODING = os.environ.get('FACE_TEMPLATE_ENCODING', 'float16')
+
+
+def encode_embedding(embedding: np.ndarray, encoding: str = 'float16') -> Tuple[bytes, Optional[float]]:
+    """Compact bytes (and int8 scale) for a normalized embedding"""
+    embedding = np.asarray(embedding, dtype=np.float32).ravel()
+    if encoding == 'float16':
+        return embedding.astype('<f2').tobytes(), None
+    if encoding == 'int8':
+        # Symmetric per-template scale: the largest component maps to +-127
+        scale = float(np.abs(embedding).max()) / 127.0 or 1.0
+        quantized = np.clip(np.round(embedding / scale), -127, 127).astype(np.int8)
+        return quantized.tobytes(), scale
+    raise ValueError(f"Unknown template encoding: {encoding}")
+
+
+def decode_embedding(data: bytes, encoding: str, scale: Optional[float] = None) -> np.ndarray:
+    """Normalized float32 embedding from template bytes"""
+    if encoding == 'float16':
+        embedding = np.frombuffer(data, dtype='<f2').astype(np.float32)
+    elif encoding == 'int8':
+        embedding = np.frombuffer(data, dtype=np.int8).astype(np.float32) * (scale or 1.0)
+    else:
+        raise ValueError(f"Unknown template encoding: {encoding}")
+    norm = np.linalg.norm(embedding)
+    return embedding / norm if norm > 0 else embedding
+
+
+class EnrollmentService:
+    """Service for enrolling and loading users' face templates"""
+
+    def __init__(self, person_verification=None):
+        self._person_verification = person_verification
+        self.identity_index_config = dict(DEFAULT_IDENTITY_INDEX_CONFIG)
+
+    @property
+    def person_verification(self):
+        """InsightFace service, created on first enrollment (models are shared)"""
+        if self._person_verification is None:
+            self._person_verification = PersonVerificationService()
+        return self._person_verification
+
+    def enroll(self, user_id, image_data, encoding=None):
+        """
+        Self-enrollment: compute and store the user's first template from a
+        base64 or uploaded reference image
+
+        Refused (``conflict``) when the user already has a template or an
+        approved KYC submission; those templates are replaced through KYC.
+        """
+        try:
+            encoding = encoding or DEFAULT_TEMPLATE_ENCODING
+            if encoding not in TEMPLATE_ENCODINGS:
+                return {'success': False, 'message': f'encoding must be one of {list(TEMPLATE_ENCODINGS)}'}
+
+            user = User.query.get(user_id)
+            if not user:
+                return {'success': False, 'message': 'User not found'}
+
+            if FaceTemplate.query.filter_by(user_id=user_id).first():
+                return {'success': False, 'conflict': True,
+                        'message': 'A face template is already enrolled; re-enrollment goes through KYC review'}
+            if KYCSubmission.query.filter_by(user_id=user_id, status='approved').first():
+                return {'success': False, 'conflict': True,
+                        'message': 'Your face template comes from your approved KYC submission; '
+                                   'submit KYC again to replace it'}
+
+            service = self.person_verification
+            if not service.is_model_loaded():
+                return {'success': False, 'message': 'InsightFace model not loaded'}
+
+            image = decode_image_data(image_data)
+            if image is None:
+                return {'success': False, 'message': 'Failed to decode image'}
+
+            try:
+                embedding, face = service.get_reference_face(image)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+
+            template = self.store_template(user_id, embedding, face, encoding)
+            return {'success': True, 'data': template.to_dict()}
+
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'message': f'Enrollment failed: {str(e)}'}
+
+    def store_template(self, user_id, embedding: np.ndarray, face: Dict[str, Any],
+                       encoding: Optional[str] = None, source: str = SELF_ENROLLED) -> FaceTemplate:
+        """Save (or replace) a user's template; KYC templates also go into the identity index"""
+        data, scale = encode_embedding(embedding, encoding or DEFAULT_TEMPLATE_ENCODING)
+        template = FaceTemplate.query.filter_by(user_id=user_id).first()
+        if template is None:
+            template = FaceTemplate(user_id=user_id)
+            db.session.add(template)
+        template.embedding = data
+        template.encoding = encoding or DEFAULT_TEMPLATE_ENCODING
+        template.scale = scale
+        template.dim = int(embedding.size)
+        template.model_name = FACE_MODEL_NAME
+        template.model_version = self.person_verification.model_version
+        template.det_score = face.get('det_score')
+        template.source = source
+        db.session.commit()
+
+        index = self._loaded_identity_index()
+        if index is not None and source != KYC_ENROLLED:
+            index.remove(int(user_id))
+        elif index is not None:
+            index.add([int(user_id)], decode_embedding(data, template.encoding, scale)[np.newaxis])
+        return template
+
+    def get_template(self, user_id):
+        """Template metadata (never the embedding itself)"""
+        try:
+            template = FaceTemplate.query.filter_by(user_id=user_id).first()
+            if not template:
+                return {'success': False, 'message': 'No enrolled face template'}
+            return {'success': True, 'data': template.to_dict()}
+        except Exception as e:
+            return {'success': False, 'message': f'Failed to get template: {str(e)}'}
+
+    def delete_template(self, user_id):
+        """Remove the user's template"""
+        try:
+            template = FaceTemplate.query.filter_by(user_id=user_id).first()
+            if not template:
+                return {'success': False, 'message': 'No enrolled face template'}
+            db.session.delete(template)
+            db.session.commit()
+            index = self._loaded_identity_index()
+            if index is not None:
+                index.remove(int(user_id))
+            return {'success': True, 'data': {'user_id': user_id}}
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'message': f'Failed to delete template: {str(e)}'}
+
+    @staticmethod
+    def load_embedding(user_id) -> np.ndarray:
+        """
+        Enrolled embedding of a user, ready for verification
+
+        Raises:
+            ValueError: No template, or it was made with another model pack
+        """
+        template = FaceTemplate.query.filter_by(user_id=user_id).first()
+        if template is None:
+            raise ValueError('No enrolled face template; enroll first or send a reference image')
+        if template.model_name != FACE_MODEL_NAME:
+            raise ValueError(f'Face template was enrolled with {template.model_name}; please re-enroll')
+        return decode_embedding(template.embedding, template.encoding, template.scale)
+
+    # 1:N identity index
+
+    def _identity_index_key(self) -> str:
+        return f"identity_index:{self.identity_index_config['path']}"
+
+    def _loaded_identity_index(self) -> Optional[IdentityIndex]:
+        """The index if this process has already loaded it (enrollment never triggers a load)"""
+        if not self.identity_index_config.get('enabled') or not model_registry.is_loaded(self._identity_index_key()):
+            return None
+        return self.identity_index
+
+    @property
+    def identity_index(self) -> Optional[IdentityIndex]:
+        """Process-wide index over the KYC templates of the current model, or None when disabled"""
+        if not self.identity_index_config.get('enabled'):
+            return None
+        key = self._identity_index_key()
+        index = model_registry.get(key, self._load_identity_index)
+        interval = self.identity_index_config.get('refresh_interval')
+        if interval and time.monotonic() - _index_checked_at.get(key, 0.0) >= interval:
+            index = self._refresh_identity_index(index)
+        return index
+
+    def _load_identity_index(self) -> IdentityIndex:
+        """Saved index brought up to date with the template table, otherwise a fresh build"""
+        config = self.identity_index_config
+        path = config['path']
+        _index_checked_at[self._identity_index_key()] = time.monotonic()
+        if IdentityIndex.exists(path):
+            try:
+                index = IdentityIndex.load(path, block_size=config['block_size'])
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Identity index at {path} is unreadable ({e}); rebuilding")
+            else:
+                changed = self._sync_identity_index(index)
+                if changed is not None:
+                    if changed:
+                        index.save(path)
+                    return index
+                logger.info(f"Identity index at {path} is out of date; rebuilding")
+        index = self.build_identity_index()
+        index.save(path)
+        return index
+
+    def _refresh_identity_index(self, index: IdentityIndex) -> IdentityIndex:
+        """Pick up template changes made by other workers since the last check"""
+        key = self._identity_index_key()
+        with _index_refresh_lock:
+            if time.monotonic() - _index_checked_at.get(key, 0.0) < self.identity_index_config['refresh_interval']:
+                return model_registry.get(key, self._load_identity_index)
+            _index_checked_at[key] = time.monotonic()
+            try:
+                changed = self._sync_identity_index(index)
+                if changed is None:
+                    rebuilt = self.build_identity_index()
+                    model_registry.reset(key)
+                    index = model_registry.get(key, lambda: rebuilt)
+                    changed = True
+                if changed:
+                    index.save(self.identity_index_config['path'])
+            except Exception as e:
+                # Keep serving the current gallery; the next check retries
+                db.session.rollback()
+                logger.warning(f"Identity index refresh failed: {e}")
+        return index
+
+    def _template_state(self) -> Tuple[int, Optional[str]]:
+        """Number of indexable templates and the newest update time (ISO format)"""
+        count, latest = (db.session.query(func.count(FaceTemplate.id), func.max(FaceTemplate.updated_at))
+                         .filter(FaceTemplate.model_name == FACE_MODEL_NAME, FaceTemplate.source == KYC_ENROLLED)
+                         .one())
+        return int(count), latest.isoformat() if latest is not None else None
+
+    def _sync_identity_index(self, index: IdentityIndex) -> Optional[bool]:
+        """
+        Add templates created or replaced since ``index.version``
+
+        Returns:
+            False when the index was already current, True when it was
+            updated, None when it cannot be brought up to date incrementally
+            (no version, or templates were deleted) and must be rebuilt
+        """
+        count, latest = self._template_state()
+        if index.version == latest and len(index) == count:
+            return False
+        if index.version is None:
+            return None
+        rows = (FaceTemplate.query
+                .filter(FaceTemplate.model_name == FACE_MODEL_NAME, FaceTemplate.source == KYC_ENROLLED,
+                        FaceTemplate.updated_at >= datetime.fromisoformat(index.version))
+                .with_entities(FaceTemplate.user_id, FaceTemplate.embedding,
+                               FaceTemplate.encoding, FaceTemplate.scale, FaceTemplate.dim)
+                .all())
+        if rows:
+            ids, embeddings = self._decode_batch([tuple(row) for row in rows], index.dim)
+            index.add(ids, embeddings)
+        if len(index) != count:
+            return None
+        index.version = latest
+        return True
+
+    def build_identity_index(self, batch_size: int = 10000) -> IdentityIndex:
+        """Index every KYC template of the current model, decoded in batches"""
+        config = self.identity_index_config
+        # Taken first: templates written during the build are re-checked by the next sync
+        _, latest = self._template_state()
+        index = None
+        query = (FaceTemplate.query
+                 .filter_by(model_name=FACE_MODEL_NAME, source=KYC_ENROLLED)
+                 .with_entities(FaceTemplate.user_id, FaceTemplate.embedding,
+                                FaceTemplate.encoding, FaceTemplate.scale, FaceTemplate.dim)
+                 .yield_per(batch_size))
+
+        batch: List[tuple] = []
+
+        def flush():
+            nonlocal index
+            if not batch:
+                return
+            if index is None:
+                index = IdentityIndex(dim=batch[0][4], block_size=config['block_size'], nprobe=config['nprobe'])
+            ids, embeddings = self._decode_batch(batch, index.dim)
+            index.add(ids, embeddings)
+            batch.clear()
+
+        for row in query:
+            batch.append(tuple(row))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+
+        if index is None:
+            index = IdentityIndex(block_size=config['block_size'], nprobe=config['nprobe'])
+        mode = config.get('mode', 'auto')
+        if len(index) and (mode == 'ivf' or (mode == 'auto' and len(index) >= config['ivf_min_size'])):
+            index.train()
+        index.version = latest
+        logger.info(f"Built identity index over {len(index)} templates")
+        return index
+
+    @staticmethod
+    def _decode_batch(rows: List[tuple], dim: int) -> Tuple[List[int], np.ndarray]:
+        """Decode a batch of template rows at once instead of row by row"""
+        ids, parts = [], []
+        for encoding in TEMPLATE_ENCODINGS:
+            selected = [r for r in rows if r[2] == encoding and r[4] == dim]
+            if not selected:
+                continue
+            blob = b''.join(r[1] for r in selected)
+            if encoding == 'float16':
+                vectors = np.frombuffer(blob, dtype='<f2').astype(np.float32).reshape(-1, dim)
+            else:
+                scales = np.array([r[3] or 1.0 for r in selected], dtype=np.float32)
+                vectors = np.frombuffer(blob, dtype=np.int8).astype(np.float32).reshape(-1, dim) * scales[:, None]
+            ids.extend(int(r[0]) for r in selected)
+            parts.append(vectors)
+        embeddings = np.concatenate(parts) if parts else np.empty((0, dim), dtype=np.float32)
+        return ids, embeddings
+
+    def find_similar_identities(self, embedding: np.ndarray, k: Optional[int] = None,
+                                exclude: Iterable[int] = ()) -> List[Dict[str, Any]]:
+        """
+        Top-k enrolled users most similar to an embedding
+
+        Returns:
+            List of dicts with ``user_id``, ``similarity`` and ``duplicate``
+            (similarity at or above the duplicate threshold), best first
+        """
+        index = self.identity_index
+        if index is None:
+            return []
+        config = self.identity_index_config
+        matches = index.search(embedding, k=k or config['top_k'], exclude=exclude,
+                               approximate=config.get('mode') != 'exact')
+        threshold = config['duplicate_threshold']
+        return [
+            {'user_id': user_id, 'similarity': round(similarity, 4), 'duplicate': similarity >= threshold}
+            for user_id, similarity in matches
+        ]
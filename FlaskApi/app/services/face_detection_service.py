@@ -2,12 +2,13 @@
 Face detection service
 """
 
-import base64
 import json
 import cv2
 import numpy as np
 from datetime import datetime
 from app.models import FaceDetection, Session
+from app.services.frame_sources import decode_image_data
+from app.services.metrics import stage_timer
 from app import db
 
 class FaceDetectionService:
@@ -18,20 +19,14 @@ class FaceDetectionService:
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
     
     def decode_image(self, image_data):
-        """Decode base64 image data"""
+        """Decode base64 text or uploaded image bytes (decoded images pass through)"""
         try:
-            # Remove data URL prefix if present
-            if ',' in image_data:
-                image_data = image_data.split(',')[1]
-            
-            # Decode base64
-            image_bytes = base64.b64decode(image_data)
-            nparr = np.frombuffer(image_bytes, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-            
-            return image
+            image = decode_image_data(image_data)
         except Exception as e:
             raise ValueError(f"Failed to decode image: {str(e)}")
+        if image is None:
+            raise ValueError("Failed to decode image")
+        return image
     
     def detect_faces(self, image):
         """Detect faces in image using OpenCV"""
@@ -40,12 +35,13 @@ class FaceDetectionService:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Detect faces
-            faces = self.face_cascade.detectMultiScale(
-                gray,
-                scaleFactor=1.1,
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
+            with stage_timer('face_detection'):
+                faces = self.face_cascade.detectMultiScale(
+                    gray,
+                    scaleFactor=1.1,
+                    minNeighbors=5,
+                    minSize=(30, 30)
+                )
             
             face_data = []
             for (x, y, w, h) in faces:
@@ -0,0 +1,131 @@
+"""
+Face Tracker - Detect-then-track wrapper around the dlib HOG face detector
+
+The frontal HOG detector is the slowest part of the blink and mouth loops.
+In tracking mode full detection runs only every N frames (or when tracking
+confidence drops) and the face box is propagated in between, either by a
+dlib correlation tracker or by the bounding box of the last 68 landmarks.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TRACKING_CONFIG = {
+    'enabled': False,
+    # 'correlation' (dlib correlation tracker) or 'landmarks' (box from last landmarks)
+    'mode': 'correlation',
+    # Run full detection at least every N frames
+    'redetect_interval': 5,
+    # Re-detect when the correlation tracker's peak-to-sidelobe ratio drops below this
+    'min_confidence': 7.0,
+    # Margin added around the landmark box, as a fraction of its size
+    'landmark_margin': 0.15,
+}
+
+
+class FaceTracker:
+    """Propagate face boxes between periodic full detections"""
+
+    def __init__(self, detector, mode: str = 'correlation', redetect_interval: int = 5,
+                 min_confidence: float = 7.0, landmark_margin: float = 0.15, **_):
+        if mode not in ('correlation', 'landmarks'):
+            raise ValueError(f"Unknown tracking mode: {mode}")
+        self.detector = detector
+        self.mode = mode
+        self.redetect_interval = max(1, int(redetect_interval))
+        self.min_confidence = min_confidence
+        self.landmark_margin = landmark_margin
+
+        self.detections = 0
+        self.tracked_frames = 0
+        self._frames_since_detection = 0
+        self._trackers = []
+        self._landmark_boxes: List[Any] = []
+
+    @classmethod
+    def from_config(cls, detector, config: Optional[Dict[str, Any]]) -> Optional['FaceTracker']:
+        """Build a tracker from a tracking config, or None when tracking is disabled"""
+        if not config or not config.get('enabled'):
+            return None
+        options = dict(DEFAULT_TRACKING_CONFIG)
+        options.update(config)
+        options.pop('enabled', None)
+        return cls(detector, **options)
+
+    def _detect(self, gray: np.ndarray) -> list:
+        import dlib
+
+        rects = list(self.detector(gray, 0))
+        self.detections += 1
+        self._frames_since_detection = 0
+        self._landmark_boxes = []
+
+        if self.mode == 'correlation':
+            self._trackers = []
+            for rect in rects:
+                tracker = dlib.correlation_tracker()
+                tracker.start_track(gray, rect)
+                self._trackers.append(tracker)
+        return rects
+
+    def _track_correlation(self, gray: np.ndarray) -> Optional[list]:
+        import dlib
+
+        rects = []
+        for tracker in self._trackers:
+            confidence = tracker.update(gray)
+            if confidence < self.min_confidence:
+                return None
+            pos = tracker.get_position()
+            rects.append(dlib.rectangle(int(pos.left()), int(pos.top()),
+                                        int(pos.right()), int(pos.bottom())))
+        return rects
+
+    def observe_landmarks(self, shapes: List[np.ndarray], frame_shape):
+        """Remember landmark boxes to predict the next frame's face boxes"""
+        if self.mode != 'landmarks':
+            return
+        import dlib
+
+        h, w = frame_shape[:2]
+        boxes = []
+        for shape_np in shapes:
+            x1, y1 = shape_np.min(axis=0)
+            x2, y2 = shape_np.max(axis=0)
+            mx = int((x2 - x1) * self.landmark_margin)
+            my = int((y2 - y1) * self.landmark_margin)
+            boxes.append(dlib.rectangle(int(max(x1 - mx, 0)), int(max(y1 - my, 0)),
+                                        int(min(x2 + mx, w - 1)), int(min(y2 + my, h - 1))))
+        self._landmark_boxes = boxes
+
+    def update(self, gray: np.ndarray) -> list:
+        """Face boxes for the next frame (in order)"""
+        due = self._frames_since_detection + 1 >= self.redetect_interval
+
+        if not due:
+            if self.mode == 'correlation' and self._trackers:
+                rects = self._track_correlation(gray)
+            elif self.mode == 'landmarks' and self._landmark_boxes:
+                rects = list(self._landmark_boxes)
+            else:
+                rects = None
+
+            if rects:
+                self._frames_since_detection += 1
+                self.tracked_frames += 1
+                return rects
+
+        return self._detect(gray)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.detections + self.tracked_frames
+        return {
+            'mode': self.mode,
+            'detections': self.detections,
+            'tracked_frames': self.tracked_frames,
+            'detection_ratio': (self.detections / total) if total else 0.0
+        }
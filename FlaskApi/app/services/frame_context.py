@@ -0,0 +1,235 @@
+"""
+Frame Context - Lazily computed, memoized per-frame artifacts
+
+Blink and mouth analysis both need a grayscale frame, dlib face boxes and the
+68-point landmarks; the MiDaS step needs the RGB frame and FaceMesh. A
+FrameContext computes each artifact the first time any analyzer asks for it
+and hands the same result to every later caller, so in the fused pipeline
+face detection and landmarking run once per frame instead of once per step.
+"""
+
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+import cv2
+import numpy as np
+
+from .metrics import stage_timer
+from .model_registry import ModelPool
+
+logger = logging.getLogger(__name__)
+
+# Artifact name -> function(ctx) that computes it
+_PROVIDERS: Dict[str, Callable[['FrameContext'], Any]] = {}
+
+
+def register_artifact(name: str):
+    """Register a provider function for a named per-frame artifact"""
+    def decorator(func):
+        _PROVIDERS[name] = func
+        return func
+    return decorator
+
+
+class FrameContext:
+    """One frame plus the artifacts derived from it"""
+
+    def __init__(self, frame: np.ndarray, frame_id: int, timestamp: float = 0.0,
+                 cache: Optional['FrameContextCache'] = None):
+        self.frame = frame
+        self.frame_id = frame_id
+        self.timestamp = timestamp
+        self.cache = cache
+        self._artifacts: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._key_locks: Dict[str, threading.Lock] = {}
+
+    def get(self, name: str) -> Any:
+        """Return an artifact, computing it once if nobody has asked for it yet"""
+        if name in self._artifacts:
+            return self._artifacts[name]
+
+        provider = _PROVIDERS.get(name)
+        if provider is None:
+            raise KeyError(f"Unknown frame artifact: {name}")
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(name, threading.Lock())
+        with key_lock:
+            if name not in self._artifacts:
+                self._artifacts[name] = provider(self)
+        return self._artifacts[name]
+
+    def has(self, name: str) -> bool:
+        """Whether an artifact has already been computed"""
+        return name in self._artifacts
+
+    def model(self, name: str) -> Any:
+        """Model handle supplied by the owning cache"""
+        if self.cache is None:
+            raise RuntimeError(f"No model '{name}' available without a FrameContextCache")
+        return self.cache.model(name)
+
+    def optional_model(self, name: str) -> Any:
+        """Model handle supplied by the owning cache, or None"""
+        if self.cache is None:
+            return None
+        return self.cache.models.get(name)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.get('gray')
+
+    @property
+    def rgb(self) -> np.ndarray:
+        return self.get('rgb')
+
+
+class FrameContextCache:
+    """
+    Small LRU of recent frame contexts keyed by frame id
+
+    The cache also carries the model handles the providers need (dlib face
+    detector and shape predictor, FaceMesh), so analyzers sharing a cache
+    share one set of artifacts per frame.
+    """
+
+    def __init__(self, capacity: int = 8, **models):
+        """
+        Args:
+            capacity: Number of recent frames to keep
+            **models: Model handles by name (``face_detector``, ``shape_predictor``,
+                ``face_mesh``, optional ``face_tracker``). A ModelPool is leased
+                on first use and held until release_models(), so one run keeps
+                the same stateful instance (FaceMesh tracking) throughout; a
+                callable ``face_mesh`` is called on use.
+        """
+        self.capacity = capacity
+        self.models = models
+        self._leased: Dict[str, Any] = {}
+        self.hits = 0
+        self.misses = 0
+        self._next_id = 0
+        self._contexts: 'OrderedDict[int, FrameContext]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def model(self, name: str) -> Any:
+        handle = self.models.get(name)
+        if handle is None:
+            raise RuntimeError(f"Frame context model '{name}' not configured")
+        if isinstance(handle, ModelPool):
+            with self._lock:
+                leased = self._leased.get(name)
+            if leased is not None:
+                return leased
+            # Acquired outside the lock: waiting for a free instance must not block frame lookups
+            instance = handle.acquire()
+            with self._lock:
+                leased = self._leased.setdefault(name, instance)
+            if leased is not instance:
+                handle.release(instance)
+            return leased
+        return handle
+
+    def release_models(self):
+        """Return leased pool instances; call when the run that owns the cache ends"""
+        with self._lock:
+            leased, self._leased = self._leased, {}
+        for name, handle in leased.items():
+            self.models[name].release(handle)
+
+    def context(self, frame: np.ndarray, frame_id: Optional[int] = None,
+                timestamp: float = 0.0) -> FrameContext:
+        """Return the context for a frame, reusing it if the id was seen recently"""
+        with self._lock:
+            if frame_id is None:
+                frame_id = self._next_id
+            self._next_id = max(self._next_id, frame_id + 1)
+
+            ctx = self._contexts.get(frame_id)
+            if ctx is not None:
+                self._contexts.move_to_end(frame_id)
+                self.hits += 1
+                return ctx
+
+            self.misses += 1
+            ctx = FrameContext(frame, frame_id, timestamp, cache=self)
+            self._contexts[frame_id] = ctx
+            while len(self._contexts) > self.capacity:
+                self._contexts.popitem(last=False)
+            return ctx
+
+    def clear(self):
+        with self._lock:
+            self._contexts.clear()
+
+
+@register_artifact('gray')
+def _gray(ctx: FrameContext) -> np.ndarray:
+    with stage_timer('color_convert'):
+        return cv2.cvtColor(ctx.frame, cv2.COLOR_BGR2GRAY)
+
+
+@register_artifact('rgb')
+def _rgb(ctx: FrameContext) -> np.ndarray:
+    with stage_timer('color_convert'):
+        return cv2.cvtColor(ctx.frame, cv2.COLOR_BGR2RGB)
+
+
+@register_artifact('face_rects')
+def _face_rects(ctx: FrameContext):
+    """dlib HOG face boxes, or tracked boxes between detections in tracking mode"""
+    tracker = ctx.optional_model('face_tracker')
+    gray = ctx.gray
+    with stage_timer('face_detection'):
+        if tracker is not None:
+            return tracker.update(gray)
+        detector = ctx.model('face_detector')
+        return list(detector(gray, 0))
+
+
+@register_artifact('landmarks68')
+def _landmarks68(ctx: FrameContext):
+    """List of (rect, dlib shape, (68, 2) int array) for every detected face"""
+    predictor = ctx.model('shape_predictor')
+    gray = ctx.gray
+    rects = ctx.get('face_rects')
+    faces = []
+    with stage_timer('landmarks'):
+        for rect in rects:
+            shape = predictor(gray, rect)
+            shape_np = np.array([(p.x, p.y) for p in shape.parts()], dtype=np.int32)
+            faces.append((rect, shape, shape_np))
+
+    tracker = ctx.optional_model('face_tracker')
+    if tracker is not None:
+        tracker.observe_landmarks([shape_np for _, _, shape_np in faces], ctx.frame.shape)
+    return faces
+
+
+@register_artifact('facemesh468')
+def _facemesh468(ctx: FrameContext):
+    """MediaPipe FaceMesh landmarks of the first face, or None"""
+    face_mesh = ctx.model('face_mesh')
+    if callable(face_mesh) and not hasattr(face_mesh, 'process'):
+        face_mesh = face_mesh()
+    rgb = ctx.rgb
+    with stage_timer('facemesh'):
+        results = face_mesh.process(rgb)
+    if not results.multi_face_landmarks:
+        return None
+    return results.multi_face_landmarks[0].landmark
+
+
+@register_artifact('facemesh_points')
+def _facemesh_points(ctx: FrameContext):
+    """FaceMesh landmarks as a contiguous (N, 2) float32 array of pixel coordinates, or None"""
+    lm = ctx.get('facemesh468')
+    if lm is None:
+        return None
+    h, w = ctx.frame.shape[:2]
+    points = np.fromiter((c for p in lm for c in (p.x, p.y)), dtype=np.float32, count=2 * len(lm)).reshape(-1, 2)
+    points *= np.array([w, h], dtype=np.float32)
+    return points
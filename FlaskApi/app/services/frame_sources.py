@@ -0,0 +1,513 @@
+"""
+Frame Sources - Pluggable providers of BGR frames for the liveness services
+
+Every step service pulls frames through ``get_frame()`` and measures its
+analysis window with ``clock()``. Live sources (local device, network ring
+buffer) use wall-clock time; recorded sources (video file, uploaded image
+sequence) use media time so a clip is analysed the same way regardless of
+how fast the host can decode it.
+"""
+
+import base64
+import math
+import os
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import cv2
+import numpy as np
+
+from .metrics import FRAMES_DROPPED, FRAMES_READ, count_frames, stage_timer
+
+logger = logging.getLogger(__name__)
+
+ImageInput = Union[np.ndarray, bytes, bytearray, memoryview, str]
+
+DEFAULT_CAPTURE_CONFIG = {
+    # Grab camera frames on a background thread instead of inside the analysis loop
+    'threaded': os.environ.get('CAMERA_THREADED_CAPTURE', 'True').lower() == 'true',
+    # 'latest' hands out the newest frame and drops older unread ones;
+    # 'every' hands out frames in order, dropping the oldest only on overflow
+    'policy': os.environ.get('CAMERA_READ_POLICY', 'latest'),
+    # Preallocated frame slots (one is always leased to the reader)
+    'buffer_size': 4,
+    # How long a read waits for a new frame before returning None
+    'read_timeout': 0.1,
+}
+
+
+def decode_image_bytes(data: Union[bytes, bytearray, memoryview]) -> Optional[np.ndarray]:
+    """Decode JPEG/PNG bytes to a BGR frame without an intermediate copy"""
+    buffer = np.frombuffer(data, dtype=np.uint8)
+    if buffer.size == 0:
+        return None
+    with stage_timer('decode'):
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
+
+def decode_image_data(data: Union[np.ndarray, bytes, bytearray, memoryview, str]) -> Optional[np.ndarray]:
+    """
+    BGR frame from whatever an endpoint received: an already decoded frame,
+    encoded JPEG/PNG bytes (e.g. a binary upload buffer) or base64 text
+    (optionally a data URL)
+    """
+    if isinstance(data, np.ndarray) and data.ndim >= 2:
+        return data
+    if isinstance(data, str):
+        data = base64.b64decode(data.split(',', 1)[-1])
+    return decode_image_bytes(data)
+
+
+class FrameSource:
+    """Base class for anything that yields BGR frames"""
+
+    #: Live sources are timed by the wall clock, recorded ones by media time
+    is_live = True
+    #: ``source`` label of the frame counters in /metrics
+    kind = 'frames'
+
+    def __init__(self):
+        self.frames_read = 0
+        self.timestamp = 0.0
+        self._opened_at = time.time()
+
+    def read(self) -> Optional[np.ndarray]:
+        """Return the next frame, or None if no frame is available right now"""
+        raise NotImplementedError
+
+    def get_frame(self) -> Optional[np.ndarray]:
+        """Get the next frame (interface used by the step services)"""
+        try:
+            frame = self.read()
+        except Exception as e:
+            logger.error(f"Error getting frame from {type(self).__name__}: {e}")
+            return None
+        if frame is not None:
+            self.frames_read += 1
+            count_frames(FRAMES_READ, self.kind)
+        return frame
+
+    def clock(self) -> float:
+        """Seconds used to time analysis windows"""
+        if self.is_live:
+            return time.time()
+        return self.timestamp
+
+    @property
+    def exhausted(self) -> bool:
+        """True once a finite source has no more frames to give"""
+        return False
+
+    def is_opened(self) -> bool:
+        """Check if the source can deliver frames"""
+        return True
+
+    def release(self):
+        """Release underlying resources"""
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+
+class DeviceFrameSource(FrameSource):
+    """Frames from a local capture device (webcam)"""
+
+    is_live = True
+    kind = 'device'
+
+    def __init__(self, source: int = 0, api_preference: Optional[int] = None):
+        super().__init__()
+        if api_preference is None:
+            # DirectShow only exists on Windows; let OpenCV pick elsewhere
+            api_preference = cv2.CAP_DSHOW if os.name == 'nt' else cv2.CAP_ANY
+        self.source = source
+        self.capture = cv2.VideoCapture(source, api_preference)
+
+    def read(self) -> Optional[np.ndarray]:
+        if self.capture is None:
+            return None
+        ret, frame = self.capture.read()
+        if not ret:
+            logger.warning("Failed to read frame from camera")
+            return None
+        self.timestamp = time.time() - self._opened_at
+        return frame
+
+    def is_opened(self) -> bool:
+        return self.capture is not None and self.capture.isOpened()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+
+
+class ThreadedDeviceFrameSource(DeviceFrameSource):
+    """
+    Local capture device read by a background thread into a ring of frames
+
+    The grab thread decodes into preallocated slots so capture keeps the
+    camera's pace however slow the analyzers are, and readers never spin on
+    an empty device. The frame returned by ``read()`` is leased to the
+    caller and stays untouched until the next ``read()``; the thread only
+    writes into the other slots. Frames captured but never handed out are
+    counted as dropped, and repeats of the previous capture as duplicates
+    (they are never handed out).
+    """
+
+    is_live = True
+    POLICIES = ('latest', 'every')
+
+    def __init__(self, source: int = 0, api_preference: Optional[int] = None,
+                 buffer_size: int = 4, policy: str = 'latest', read_timeout: float = 0.1):
+        if policy not in self.POLICIES:
+            raise ValueError(f"policy must be one of {list(self.POLICIES)}")
+        super().__init__(source, api_preference)
+        self.policy = policy
+        self.read_timeout = read_timeout
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.frames_duplicated = 0
+        self.read_timeouts = 0
+        # Per slot: frame array, capture sequence number (0 = empty) and timestamp
+        self._slots: List[Optional[np.ndarray]] = [None] * max(3, int(buffer_size))
+        self._seq = [0] * len(self._slots)
+        self._stamps = [0.0] * len(self._slots)
+        self._writing: Optional[int] = None
+        self._leased: Optional[int] = None
+        self._last_seq = 0
+        self._running = False
+        self._cond = threading.Condition()
+        self._thread = None
+        if super().is_opened():
+            self._running = True
+            self._thread = threading.Thread(target=self._grab_loop, name='camera-grabber', daemon=True)
+            self._thread.start()
+
+    def _next_slot(self) -> int:
+        """Oldest slot that is neither leased to the reader nor being written"""
+        free = [i for i in range(len(self._slots)) if i != self._leased]
+        return min(free, key=lambda i: self._seq[i])
+
+    def _grab_loop(self):
+        failures = 0
+        while self._running:
+            with self._cond:
+                slot = self._writing = self._next_slot()
+                newest = max(range(len(self._slots)), key=lambda i: self._seq[i])
+                previous = self._slots[newest] if self._seq[newest] > 0 else None
+            capture = self.capture
+            ret, frame = capture.read(self._slots[slot]) if capture is not None else (False, None)
+            ret = ret and frame is not None
+            # Some backends hand back the same buffer when polled faster than they capture
+            duplicate = ret and self._same_frame(frame, previous)
+            with self._cond:
+                self._writing = None
+                if not ret or duplicate:
+                    # The slot may be half written; never hand it out
+                    self._seq[slot] = 0
+                    if duplicate:
+                        self._slots[slot] = frame
+                        self.frames_duplicated += 1
+                    else:
+                        failures += 1
+                        if failures == 1:
+                            logger.warning("Failed to read frame from camera")
+                else:
+                    failures = 0
+                    # read() reuses the slot when the shape matches, else allocates it once
+                    self._slots[slot] = frame
+                    self.frames_captured += 1
+                    self._seq[slot] = self.frames_captured
+                    self._stamps[slot] = time.time() - self._opened_at
+                    self._cond.notify_all()
+            if not ret:
+                time.sleep(0.01)
+
+    @staticmethod
+    def _same_frame(frame: np.ndarray, previous: Optional[np.ndarray]) -> bool:
+        """Byte-identical to the previous capture (checked on a sparse pixel grid)"""
+        if previous is None or previous.shape != frame.shape:
+            return False
+        return np.array_equal(frame[::8, ::8], previous[::8, ::8])
+
+    def _ready(self) -> List[int]:
+        return [i for i in range(len(self._slots))
+                if i != self._writing and self._seq[i] > self._last_seq]
+
+    def read(self) -> Optional[np.ndarray]:
+        with self._cond:
+            ready = self._ready()
+            if not ready and self._running:
+                self._cond.wait(self.read_timeout)
+                ready = self._ready()
+            if not ready:
+                self.read_timeouts += 1
+                return None
+            pick = max if self.policy == 'latest' else min
+            slot = pick(ready, key=lambda i: self._seq[i])
+            seq = self._seq[slot]
+            self.frames_dropped += seq - self._last_seq - 1
+            count_frames(FRAMES_DROPPED, self.kind, seq - self._last_seq - 1)
+            self._last_seq = seq
+            self._leased = slot
+            self.timestamp = self._stamps[slot]
+            return self._slots[slot]
+
+    def stats(self) -> Dict[str, Any]:
+        """Capture counters: frames grabbed, handed out, dropped, duplicated and read timeouts"""
+        with self._cond:
+            return {
+                'policy': self.policy,
+                'buffer_size': len(self._slots),
+                'frames_captured': self.frames_captured,
+                'frames_read': self.frames_read,
+                'frames_dropped': self.frames_dropped,
+                'frames_duplicated': self.frames_duplicated,
+                'read_timeouts': self.read_timeouts
+            }
+
+    def release(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        super().release()
+
+
+class VideoFileFrameSource(FrameSource):
+    """
+    Frames decoded from a recorded video file
+
+    Only the frames that will be analysed are decoded. ``max_fps`` caps the
+    sampling rate and ``skip_to()`` lets the reader announce the next media
+    time it needs; frames before it are grabbed without being decoded to
+    pixels, and gaps longer than ``seek_seconds`` are jumped with a seek.
+    """
+
+    is_live = False
+    kind = 'video'
+    #: Supports skip_to(): readers may skip frames they do not need
+    seekable = True
+
+    def __init__(self, path: str, max_fps: Optional[float] = None, seek_seconds: float = 1.0):
+        super().__init__()
+        self.path = path
+        self.capture = cv2.VideoCapture(path)
+        self.fps = float(self.capture.get(cv2.CAP_PROP_FPS) or 0.0) or 30.0
+        self.frame_count = int(self.capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+        self.max_fps = max_fps
+        self.seek_frames = max(1, int(round(seek_seconds * self.fps)))
+        self.frames_grabbed = 0
+        self.frames_skipped = 0
+        self.seeks = 0
+        self._position = 0
+        self._next_time = 0.0
+        self._exhausted = not self.capture.isOpened()
+
+    def skip_to(self, media_time: float):
+        """Do not decode frames before ``media_time`` (seconds into the clip)"""
+        self._next_time = max(self._next_time, media_time)
+
+    def _advance_to(self, index: int) -> bool:
+        """Move to frame ``index`` without decoding the frames in between"""
+        gap = index - self._position
+        if gap <= 0:
+            return True
+        if gap > self.seek_frames and (not self.frame_count or index < self.frame_count):
+            if self.capture.set(cv2.CAP_PROP_POS_FRAMES, index):
+                self.seeks += 1
+                self.frames_skipped += gap
+                self._position = index
+                return True
+        for _ in range(gap):
+            if not self.capture.grab():
+                return False
+            self._position += 1
+            self.frames_grabbed += 1
+            self.frames_skipped += 1
+        return True
+
+    def read(self) -> Optional[np.ndarray]:
+        if self._exhausted:
+            return None
+        if not self._advance_to(math.ceil(self._next_time * self.fps - 1e-3)):
+            self._exhausted = True
+            return None
+        with stage_timer('decode'):
+            ret, frame = self.capture.read()
+        if not ret:
+            self._exhausted = True
+            return None
+        self._position += 1
+        pos_msec = self.capture.get(cv2.CAP_PROP_POS_MSEC)
+        self.timestamp = pos_msec / 1000.0 if pos_msec > 0 else (self._position - 1) / self.fps
+        if self.max_fps:
+            self._next_time = self.timestamp + 1.0 / self.max_fps
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        """Frames decoded versus skipped (grabbed only, or jumped by a seek)"""
+        return {
+            'fps': round(self.fps, 2),
+            'frame_count': self.frame_count,
+            'frames_decoded': self.frames_read,
+            'frames_skipped': self.frames_skipped,
+            'frames_grabbed': self.frames_grabbed,
+            'seeks': self.seeks,
+            'duration_analysed': round(self.timestamp, 2)
+        }
+
+    @property
+    def exhausted(self) -> bool:
+        return self._exhausted
+
+    def is_opened(self) -> bool:
+        return self.capture is not None and self.capture.isOpened()
+
+    def release(self):
+        if self.capture is not None:
+            self.capture.release()
+            self.capture = None
+        self._exhausted = True
+
+
+class ImageSequenceFrameSource(FrameSource):
+    """Frames from an ordered list of uploaded JPEG/PNG images"""
+
+    is_live = False
+    kind = 'images'
+
+    def __init__(self, images: Iterable[ImageInput], fps: float = 30.0):
+        super().__init__()
+        self.images: List[ImageInput] = list(images)
+        self.fps = fps
+        self._index = 0
+
+    def _decode(self, image: ImageInput) -> Optional[np.ndarray]:
+        if isinstance(image, np.ndarray):
+            return image
+        if isinstance(image, str):
+            return cv2.imread(image, cv2.IMREAD_COLOR)
+        return decode_image_bytes(image)
+
+    def read(self) -> Optional[np.ndarray]:
+        while self._index < len(self.images):
+            image = self.images[self._index]
+            self._index += 1
+            frame = self._decode(image)
+            if frame is not None:
+                self.timestamp = (self._index - 1) / self.fps
+                return frame
+            logger.warning(f"Skipping undecodable frame #{self._index - 1}")
+        return None
+
+    @property
+    def exhausted(self) -> bool:
+        return self._index >= len(self.images)
+
+    def release(self):
+        self.images = []
+        self._index = 0
+
+
+class RingBufferFrameSource(FrameSource):
+    """
+    In-memory ring buffer fed by a network stream
+
+    A producer (e.g. a WebSocket handler) calls ``push()`` with encoded or
+    decoded frames; consumers read them in order. When the buffer is full the
+    oldest frame is dropped so a slow analyzer never falls further behind.
+    With ``decode_on_read`` encoded frames are kept as bytes and decoded by
+    the consumer, so frames dropped for backpressure are never decoded.
+    """
+
+    is_live = True
+    kind = 'stream'
+
+    def __init__(self, capacity: int = 32, read_timeout: float = 0.1, decode_on_read: bool = False):
+        super().__init__()
+        self.capacity = capacity
+        self.read_timeout = read_timeout
+        self.decode_on_read = decode_on_read
+        self.frames_pushed = 0
+        self.frames_dropped = 0
+        self.frames_undecodable = 0
+        self._buffer = deque()
+        self._closed = False
+        self._cond = threading.Condition()
+
+    def push(self, frame: Any, timestamp: Optional[float] = None) -> bool:
+        """Add a frame (ndarray or encoded bytes); returns False once closed"""
+        if not isinstance(frame, np.ndarray) and not self.decode_on_read:
+            frame = decode_image_bytes(frame)
+            if frame is None:
+                logger.warning("Dropping undecodable frame pushed to ring buffer")
+                self.frames_undecodable += 1
+                return not self._closed
+        with self._cond:
+            if self._closed:
+                return False
+            if len(self._buffer) >= self.capacity:
+                self._buffer.popleft()
+                self.frames_dropped += 1
+                count_frames(FRAMES_DROPPED, self.kind)
+            ts = timestamp if timestamp is not None else time.time() - self._opened_at
+            self._buffer.append((frame, ts))
+            self.frames_pushed += 1
+            self._cond.notify()
+        return True
+
+    def close(self):
+        """Signal that the producer will not push more frames"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def read(self) -> Optional[np.ndarray]:
+        with self._cond:
+            if not self._buffer and not self._closed:
+                self._cond.wait(self.read_timeout)
+            if not self._buffer:
+                return None
+            frame, timestamp = self._buffer.popleft()
+        if not isinstance(frame, np.ndarray):
+            frame = decode_image_bytes(frame)
+            if frame is None:
+                logger.warning("Dropping undecodable frame from ring buffer")
+                self.frames_undecodable += 1
+                return None
+        self.timestamp = timestamp
+        return frame
+
+    def stats(self) -> Dict[str, Any]:
+        """Frames received, dropped for backpressure, undecodable and analysed"""
+        with self._cond:
+            buffered = len(self._buffer)
+        return {
+            'frames_received': self.frames_pushed,
+            'frames_dropped': self.frames_dropped,
+            'frames_undecodable': self.frames_undecodable,
+            'frames_read': self.frames_read,
+            'buffered': buffered
+        }
+
+    @property
+    def exhausted(self) -> bool:
+        with self._cond:
+            return self._closed and not self._buffer
+
+    def release(self):
+        self.close()
+        with self._cond:
+            self._buffer.clear()
@@ -0,0 +1,384 @@
+"""
+Identity Index - In-process 1:N search over enrolled face embeddings
+
+Embeddings are unit vectors, so cosine similarity is a dot product. Exact
+search scores the whole gallery with one matrix product per block of rows
+and keeps a running top-k, so memory stays bounded and NumPy/BLAS does the
+work. For large galleries an inverted-file (IVF) mode clusters the gallery
+with spherical k-means and only scores the ``nprobe`` clusters closest to
+the query.
+
+The gallery is persisted as a plain ``.npy`` matrix that workers open with
+``mmap_mode='r'``, so several processes share one copy through the page
+cache instead of each holding the whole gallery in memory.
+"""
+
+import os
+import tempfile
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are still atomic per file, just not as a pair
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_IDENTITY_INDEX_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    'models', 'identity_index'
+)
+
+DEFAULT_IDENTITY_INDEX_CONFIG = {
+    'enabled': os.environ.get('IDENTITY_INDEX', 'True').lower() == 'true',
+    # Files are <path>.vectors.npy and <path>.meta.npz
+    'path': os.environ.get('IDENTITY_INDEX_PATH', DEFAULT_IDENTITY_INDEX_PATH),
+    # 'exact', 'ivf', or 'auto' (IVF once the gallery reaches ivf_min_size)
+    'mode': os.environ.get('IDENTITY_INDEX_MODE', 'auto'),
+    'ivf_min_size': 200000,
+    'nprobe': 16,
+    'block_size': 65536,
+    'top_k': 5,
+    # Same threshold as person verification
+    'duplicate_threshold': 0.5,
+    # Seconds between checks of the template table for enrollments made by
+    # other workers (0 disables; the saved file is always checked on load)
+    'refresh_interval': float(os.environ.get('IDENTITY_INDEX_REFRESH_SECONDS', 60)),
+}
+
+
+@contextmanager
+def _path_lock(path: str, exclusive: bool):
+    """Advisory lock so the vectors and meta files are written and read as a pair"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(f"{path}.lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _merge_top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best ``k`` (score, row) pairs, highest first"""
+    if scores.size > k:
+        keep = np.argpartition(-scores, k - 1)[:k]
+        scores, rows = scores[keep], rows[keep]
+    order = np.argsort(-scores, kind='stable')
+    return scores[order], rows[order]
+
+
+class IdentityIndex:
+    """Gallery of (identity id, unit embedding) with exact and IVF top-k search"""
+
+    def __init__(self, dim: int = 512, block_size: int = 65536, nprobe: int = 16,
+                 dtype=np.float16):
+        """
+        Args:
+            dim: Embedding length
+            block_size: Rows scored per matrix product in exact search
+            nprobe: Clusters scored per query in IVF search
+            dtype: Storage type of the gallery (float16 halves memory; scores
+                are computed in float32)
+        """
+        self.dim = dim
+        self.block_size = max(1, int(block_size))
+        self.nprobe = nprobe
+        self.dtype = np.dtype(dtype)
+
+        self._vectors = np.empty((0, dim), dtype=self.dtype)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._size = 0
+        self._row_of: Dict[int, int] = {}
+
+        # IVF state: centroids, cluster of every row, rows of every cluster
+        self._centroids: Optional[np.ndarray] = None
+        self._assign = np.empty(0, dtype=np.int32)
+        self._lists: List[List[int]] = []
+
+        # Caller-defined tag of the data the gallery reflects, saved with it
+        # (the enrollment service stores the newest template timestamp)
+        self.version: Optional[str] = None
+
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __contains__(self, identity_id) -> bool:
+        return int(identity_id) in self._row_of
+
+    @property
+    def trained(self) -> bool:
+        return self._centroids is not None
+
+    # Storage
+
+    def _reserve(self, extra: int):
+        """Make room for ``extra`` more rows (copies a memory-mapped gallery into RAM)"""
+        needed = self._size + extra
+        capacity = self._vectors.shape[0]
+        if needed <= capacity and self._vectors.flags.writeable:
+            return
+        new_capacity = max(needed, capacity + capacity // 2, 1024)
+        vectors = np.empty((new_capacity, self.dim), dtype=self.dtype)
+        vectors[:self._size] = self._vectors[:self._size]
+        ids = np.empty(new_capacity, dtype=np.int64)
+        ids[:self._size] = self._ids[:self._size]
+        assign = np.full(new_capacity, -1, dtype=np.int32)
+        assign[:self._size] = self._assign[:self._size]
+        self._vectors, self._ids, self._assign = vectors, ids, assign
+
+    def _nearest_centroid(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors.astype(np.float32) @ self._centroids.T, axis=1).astype(np.int32)
+
+    def add(self, identity_ids: Iterable[int], embeddings: np.ndarray):
+        """Add or replace identities (one embedding per id)"""
+        ids = np.asarray(list(identity_ids), dtype=np.int64)
+        embeddings = _normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), self.dim))
+        with self._lock:
+            # Replacements are removed first, so each id keeps exactly one row
+            for identity_id in ids.tolist():
+                if identity_id in self._row_of:
+                    self.remove(identity_id)
+
+            self._reserve(len(ids))
+            start, end = self._size, self._size + len(ids)
+            self._vectors[start:end] = embeddings
+            self._ids[start:end] = ids
+            for row, identity_id in enumerate(ids.tolist(), start):
+                self._row_of[identity_id] = row
+            if self.trained:
+                clusters = self._nearest_centroid(embeddings)
+                self._assign[start:end] = clusters
+                for row, cluster in enumerate(clusters.tolist(), start):
+                    self._lists[cluster].append(row)
+            self._size = end
+
+    def remove(self, identity_id: int) -> bool:
+        """Remove an identity; the last row moves into its slot (O(1) plus list upkeep)"""
+        identity_id = int(identity_id)
+        with self._lock:
+            row = self._row_of.pop(identity_id, None)
+            if row is None:
+                return False
+            self._reserve(0)
+            last = self._size - 1
+            if self.trained:
+                self._lists[self._assign[row]].remove(row)
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._vectors[row] = self._vectors[last]
+                self._ids[row] = moved_id
+                self._row_of[moved_id] = row
+                if self.trained:
+                    cluster = self._assign[last]
+                    members = self._lists[cluster]
+                    members[members.index(last)] = row
+                    self._assign[row] = cluster
+            self._size = last
+            return True
+
+    # Approximate search structure
+
+    def train(self, nlist: Optional[int] = None, iterations: int = 10, sample_size: int = 100000,
+              seed: int = 0):
+        """
+        Cluster the gallery with spherical k-means for IVF search
+
+        Args:
+            nlist: Number of clusters (default: about sqrt(gallery size))
+            iterations: k-means iterations on the sample
+            sample_size: Rows sampled for training
+        """
+        with self._lock:
+            if self._size == 0:
+                raise ValueError("Cannot train an empty identity index")
+            nlist = int(nlist or max(1, round(np.sqrt(self._size))))
+            nlist = min(nlist, self._size)
+            rng = np.random.default_rng(seed)
+            sample_rows = rng.choice(self._size, size=min(sample_size, self._size), replace=False)
+            sample = self._vectors[np.sort(sample_rows)].astype(np.float32)
+
+            nlist = min(nlist, len(sample))
+            centroids = sample[rng.choice(len(sample), size=nlist, replace=False)]
+            for _ in range(iterations):
+                assign = np.argmax(sample @ centroids.T, axis=1)
+                order = np.argsort(assign, kind='stable')
+                counts = np.bincount(assign, minlength=nlist)
+                starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+                non_empty = counts > 0
+                sums = np.add.reduceat(sample[order], starts[non_empty], axis=0)
+                # Empty clusters keep their previous centroid
+                centroids[non_empty] = _normalize(sums)
+
+            self._centroids = centroids
+            assign = np.empty(self._size, dtype=np.int32)
+            for start in range(0, self._size, self.block_size):
+                end = min(start + self.block_size, self._size)
+                assign[start:end] = self._nearest_centroid(self._vectors[start:end])
+            self._set_assignments(assign, nlist)
+            logger.info(f"Trained identity index IVF: {nlist} clusters over {self._size} identities")
+
+    @staticmethod
+    def _cluster_lists(assign: np.ndarray, nlist: int) -> List[List[int]]:
+        """Rows of every cluster from the per-row cluster assignment"""
+        order = np.argsort(assign, kind='stable')
+        bounds = np.cumsum(np.bincount(assign, minlength=nlist))[:-1]
+        return [part.tolist() for part in np.split(order, bounds)]
+
+    def _set_assignments(self, assign: np.ndarray, nlist: int):
+        self._reserve(0)
+        self._assign[:self._size] = assign
+        self._lists = self._cluster_lists(assign, nlist)
+
+    # Search
+
+    def _exact(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        best_scores = np.empty(0, dtype=np.float32)
+        best_rows = np.empty(0, dtype=np.int64)
+        for start in range(0, self._size, self.block_size):
+            end = min(start + self.block_size, self._size)
+            scores = self._vectors[start:end].astype(np.float32) @ query
+            rows = np.arange(start, end)
+            scores, rows = _merge_top_k(scores, rows, k)
+            best_scores, best_rows = _merge_top_k(
+                np.concatenate((best_scores, scores)), np.concatenate((best_rows, rows)), k
+            )
+        return best_scores, best_rows
+
+    def _ivf(self, query: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        nprobe = min(nprobe, len(self._lists))
+        probes = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+        rows = np.fromiter((row for cluster in probes for row in self._lists[cluster]), dtype=np.int64)
+        if rows.size == 0:
+            return np.empty(0, dtype=np.float32), rows
+        scores = self._vectors[rows].astype(np.float32) @ query
+        return _merge_top_k(scores, rows, k)
+
+    def search(self, embedding: np.ndarray, k: int = 5, exclude: Iterable[int] = (),
+               approximate: bool = False, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Most similar identities to one embedding
+
+        Args:
+            embedding: Query embedding (normalized here)
+            k: Number of results
+            exclude: Identity ids left out of the results (e.g. the querying user)
+            approximate: Use IVF search (falls back to exact if untrained)
+            nprobe: Clusters scored in IVF search (default: self.nprobe)
+
+        Returns:
+            List of (identity id, cosine similarity), most similar first
+        """
+        exclude = {int(i) for i in exclude}
+        query = _normalize(np.asarray(embedding, dtype=np.float32).reshape(self.dim))
+        with self._lock:
+            if self._size == 0 or k <= 0:
+                return []
+            fetch = min(k + len(exclude), self._size)
+            if approximate and self.trained:
+                scores, rows = self._ivf(query, fetch, nprobe or self.nprobe)
+            else:
+                scores, rows = self._exact(query, fetch)
+            ids = self._ids[rows]
+
+        results = [(int(i), float(s)) for i, s in zip(ids, scores) if int(i) not in exclude]
+        return results[:k]
+
+    # Persistence
+
+    def save(self, path: str):
+        """
+        Write ``<path>.vectors.npy`` (memory-mappable) and ``<path>.meta.npz``
+
+        Each file is written to a unique temporary name and renamed into
+        place under an exclusive lock, so concurrent savers in several workers
+        never leave a vectors file paired with another save's ids.
+        """
+        out_dir = os.path.dirname(os.path.abspath(path))
+        os.makedirs(out_dir, exist_ok=True)
+        with self._lock:
+            vectors_path, meta_path = f"{path}.vectors.npy", f"{path}.meta.npz"
+            meta = {
+                'ids': self._ids[:self._size],
+                'dim': np.array(self.dim),
+                'nprobe': np.array(self.nprobe),
+            }
+            if self.version is not None:
+                meta['version'] = np.array(self.version)
+            if self.trained:
+                meta['centroids'] = self._centroids
+                meta['assign'] = self._assign[:self._size]
+            written = []
+            try:
+                vectors = np.ascontiguousarray(self._vectors[:self._size])
+                for target, write in ((vectors_path, lambda f: np.save(f, vectors)),
+                                      (meta_path, lambda f: np.savez(f, **meta))):
+                    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp', dir=out_dir)
+                    written.append(tmp_path)
+                    with os.fdopen(fd, 'wb') as f:
+                        write(f)
+                with _path_lock(path, exclusive=True):
+                    os.replace(written[0], vectors_path)
+                    os.replace(written[1], meta_path)
+            finally:
+                for tmp_path in written:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return os.path.exists(f"{path}.vectors.npy") and os.path.exists(f"{path}.meta.npz")
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True, block_size: int = 65536) -> 'IdentityIndex':
+        """
+        Open a saved index; with ``mmap`` the gallery stays on disk until modified
+
+        Raises:
+            ValueError: The vectors and meta files do not belong together
+        """
+        with _path_lock(path, exclusive=False):
+            vectors = np.load(f"{path}.vectors.npy", mmap_mode='r' if mmap else None)
+            with np.load(f"{path}.meta.npz") as npz:
+                meta = {key: npz[key] for key in npz.files}
+        if len(meta['ids']) != len(vectors) or vectors.shape[1:] != (int(meta['dim']),):
+            raise ValueError(f"Identity index files at {path} do not match")
+        index = cls(dim=int(meta['dim']), block_size=block_size, nprobe=int(meta['nprobe']),
+                    dtype=vectors.dtype)
+        index.version = str(meta['version']) if 'version' in meta else None
+        index._vectors = vectors
+        index._ids = np.array(meta['ids'], dtype=np.int64)
+        index._size = len(index._ids)
+        index._assign = np.full(index._size, -1, dtype=np.int32)
+        index._row_of = {identity_id: row for row, identity_id in enumerate(index._ids.tolist())}
+        if 'centroids' in meta:
+            index._centroids = np.array(meta['centroids'], dtype=np.float32)
+            index._assign = np.array(meta['assign'], dtype=np.int32)
+            index._lists = cls._cluster_lists(index._assign, len(index._centroids))
+        return index
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'identities': self._size,
+            'dim': self.dim,
+            'dtype': str(self.dtype),
+            'memory_mapped': isinstance(self._vectors, np.memmap),
+            'ivf_clusters': len(self._lists) if self.trained else 0,
+            'nprobe': self.nprobe
+        }
@@ -4,7 +4,9 @@ KYC service
 
 from datetime import datetime
 from app.models import KYCSubmission, Session
+from app.services.enrollment_service import KYC_ENROLLED, EnrollmentService, decode_embedding, encode_embedding
 from app.services.face_detection_service import FaceDetectionService
+from app.services.frame_sources import decode_image_data
 from app import db
 
 class KYCService:
@@ -12,6 +14,7 @@ class KYCService:
     
     def __init__(self):
         self.face_detection_service = FaceDetectionService()
+        self.enrollment_service = EnrollmentService()
     
     def submit_kyc(self, user_id, session_id, document_images, selfie_image):
         """Submit KYC documents for verification"""
@@ -30,31 +33,88 @@ class KYCService:
             if existing_submission:
                 return {'success': False, 'message': 'You already have a pending KYC submission'}
             
+            # Decode the selfie once for the liveness and duplicate checks
+            try:
+                selfie_image = self.face_detection_service.decode_image(selfie_image)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            
             # Perform liveness check on selfie
             liveness_result = self.perform_liveness_check(user_id, session_id, selfie_image)
             
             if not liveness_result['success']:
                 return liveness_result
             
+            # Look for the same face on other accounts
+            duplicate_check = self.check_duplicate_identity(user_id, selfie_image)
+            selfie = duplicate_check.pop('selfie', None)
+            duplicates = [m for m in duplicate_check.get('matches', []) if m['duplicate']]
+            
             # Create KYC submission
             kyc_submission = KYCSubmission(
                 user_id=user_id,
                 liveness_result=liveness_result['data']['liveness_result']['is_live'],
                 status='pending'
             )
+            if duplicates:
+                kyc_submission.notes = 'Possible duplicate identity: ' + ', '.join(
+                    f"user {m['user_id']} ({m['similarity']:.2f})" for m in duplicates
+                )
+            if selfie is not None:
+                # Kept for enrollment once a reviewer approves the submission
+                embedding, face = selfie
+                kyc_submission.selfie_embedding, _ = encode_embedding(embedding, 'float16')
+                kyc_submission.selfie_det_score = face.get('det_score')
             
             db.session.add(kyc_submission)
             db.session.commit()
             
+            data = kyc_submission.to_dict()
+            data['duplicate_check'] = duplicate_check
             return {
                 'success': True,
-                'data': kyc_submission.to_dict()
+                'data': data
             }
             
         except Exception as e:
             db.session.rollback()
             return {'success': False, 'message': f'KYC submission failed: {str(e)}'}
     
+    def check_duplicate_identity(self, user_id, selfie_image):
+        """
+        Top-k enrolled identities most similar to the selfie
+        
+        Nothing is enrolled here: a suspected duplicate must not become a
+        template that later submissions match against. On success the result
+        also carries ``selfie`` (embedding, face), which submit_kyc keeps on
+        the submission until it is approved. A failed check never blocks the
+        submission.
+        """
+        try:
+            service = self.enrollment_service.person_verification
+            if not service.is_model_loaded():
+                return {'status': 'unavailable', 'matches': []}
+            
+            image = decode_image_data(selfie_image)
+            if image is None:
+                return {'status': 'failed', 'message': 'Failed to decode selfie', 'matches': []}
+            try:
+                embedding, face = service.get_reference_face(image)
+            except ValueError as e:
+                return {'status': 'failed', 'message': str(e), 'matches': []}
+            
+            matches = self.enrollment_service.find_similar_identities(embedding, exclude=[int(user_id)])
+            
+            return {
+                'status': 'duplicate_suspected' if any(m['duplicate'] for m in matches) else 'clear',
+                'matches': matches,
+                'selfie': (embedding, face)
+            }
+            
+        except Exception as e:
+            db.session.rollback()
+            return {'status': 'failed', 'message': f'Duplicate check failed: {str(e)}', 'matches': []}
+    
     def perform_liveness_check(self, user_id, session_id, image_data):
         """Perform liveness check for KYC"""
         try:
@@ -87,6 +147,21 @@ class KYCService:
         except Exception as e:
             return {'success': False, 'message': f'Liveness check failed: {str(e)}'}
     
+    def enroll_approved_selfie(self, kyc_submission):
+        """Store an approved submission's selfie as the user's template; True if enrolled"""
+        if kyc_submission.selfie_embedding is None:
+            return False
+        try:
+            embedding = decode_embedding(kyc_submission.selfie_embedding, 'float16')
+            self.enrollment_service.store_template(
+                kyc_submission.user_id, embedding, {'det_score': kyc_submission.selfie_det_score},
+                source=KYC_ENROLLED
+            )
+            return True
+        except Exception:
+            db.session.rollback()
+            return False
+    
     def create_kyc_session(self, user_id):
         """Create a new KYC session for the user"""
         try:
@@ -131,7 +206,12 @@ class KYCService:
             return {'success': False, 'message': f'Failed to get KYC status: {str(e)}'}
     
     def update_kyc_status(self, submission_id, status, notes=None):
-        """Update KYC submission status (admin function)"""
+        """
+        Update KYC submission status (admin function)
+        
+        Approving a submission enrolls its selfie as the user's face template,
+        replacing any earlier one; rejecting it discards the selfie embedding.
+        """
         try:
             kyc_submission = KYCSubmission.query.get(submission_id)
             
@@ -143,12 +223,18 @@ class KYCService:
             
             if notes:
                 kyc_submission.notes = notes
+            if status == 'rejected':
+                kyc_submission.selfie_embedding = None
+                kyc_submission.selfie_det_score = None
             
             db.session.commit()
             
+            data = kyc_submission.to_dict()
+            if status == 'approved':
+                data['template_enrolled'] = self.enroll_approved_selfie(kyc_submission)
             return {
                 'success': True,
-                'data': kyc_submission.to_dict()
+                'data': data
             }
             
         except Exception as e:
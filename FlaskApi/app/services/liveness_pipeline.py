@@ -0,0 +1,338 @@
+"""
+Liveness Pipeline - Incremental frame analyzers and the fused single-pass runner
+
+Each step service exposes its per-frame logic as a FrameAnalyzer. The step
+services drive one analyzer over their own timed window (sequential mode);
+FusedLivenessPipeline reads a single frame stream once and fans every frame
+out to all analyzers at the same time, each at its own rate.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .frame_context import FrameContext, FrameContextCache
+from .metrics import step_timer
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EARLY_STOPPING = {
+    'enabled': False,
+    # Never decide before this many analysed frames
+    'min_frames': 5,
+    # Per-step confidence bounds. A step stops as soon as it passes with
+    # confidence >= accept_confidence, or fails with confidence <=
+    # reject_confidence. None disables that side of the decision; blink and
+    # captcha evidence only accumulates, so they never reject early. Accept
+    # bounds sit above the service's confidence_threshold (0.7), so an early
+    # accept never reports less confidence than the verdict needs.
+    'bounds': {
+        'person_verification': {'accept_confidence': 0.75, 'reject_confidence': 0.2},
+        'midas_liveness': {'accept_confidence': 0.85, 'reject_confidence': 0.2},
+        'blink_detection': {'accept_confidence': 0.75, 'reject_confidence': None},
+        'mouth_captcha': {'accept_confidence': 0.75, 'reject_confidence': None},
+    }
+}
+
+
+class FrameAnalyzer:
+    """Incremental per-frame analyzer behind a liveness step"""
+
+    name = 'analyzer'
+
+    def __init__(self, duration: Optional[float] = None, max_fps: Optional[float] = None,
+                 context_cache: Optional[FrameContextCache] = None,
+                 early_stop: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            duration: Seconds of stream this analyzer needs (None = whole stream)
+            max_fps: Upper bound on frames analysed per second (None = every frame)
+            context_cache: Cache of per-frame artifacts, shared with other analyzers
+                in the fused pipeline
+            early_stop: Sequential decision bounds (``accept_confidence``,
+                ``reject_confidence``, ``min_frames``); None runs the full window
+        """
+        self.duration = duration
+        self.max_fps = max_fps
+        self.context_cache = context_cache if context_cache is not None else FrameContextCache()
+        self.early_stop = early_stop
+        self.frames_processed = 0
+        self.decision = None
+        self.decided_at = None
+        self._last_timestamp = None
+
+    def wants(self, timestamp: float) -> bool:
+        """Whether the frame at ``timestamp`` (seconds into the window) should be analysed"""
+        if self.is_done(timestamp):
+            return False
+        if not self.max_fps or self._last_timestamp is None:
+            return True
+        # Tolerate rounding so frames on an exact 1/max_fps grid are not skipped
+        return timestamp - self._last_timestamp >= 1.0 / self.max_fps - 1e-6
+
+    def next_wanted(self) -> float:
+        """Earliest window time of the next frame this analyzer would analyse"""
+        if not self.max_fps or self._last_timestamp is None:
+            return 0.0
+        return self._last_timestamp + 1.0 / self.max_fps
+
+    def is_done(self, timestamp: float) -> bool:
+        """Whether the analyzer has all the evidence it needs"""
+        if self.decision is not None:
+            return True
+        return self.duration is not None and timestamp >= self.duration
+
+    def start(self):
+        """Acquire per-run resources (audio streams, etc.)"""
+        pass
+
+    def feed(self, ctx: FrameContext):
+        """Analyse one frame context and update the rate limiter"""
+        self._last_timestamp = ctx.timestamp
+        self.frames_processed += 1
+        with step_timer(self.name):
+            self.process(ctx)
+        if self.early_stop and self.decision is None:
+            self._update_decision(ctx.timestamp)
+
+    def feed_frame(self, frame: np.ndarray, timestamp: float):
+        """Analyse a raw frame using this analyzer's own context cache"""
+        self.feed(self.context_cache.context(frame, timestamp=timestamp))
+
+    def process(self, ctx: FrameContext):
+        """Analyse one frame"""
+        raise NotImplementedError
+
+    def stop(self):
+        """Release per-run resources"""
+        pass
+
+    def evidence(self) -> Optional[Tuple[bool, float]]:
+        """(passing, confidence) from the frames seen so far, or None if undecided"""
+        return None
+
+    def _update_decision(self, timestamp: float):
+        """Stop the step once the evidence crosses an accept or reject bound"""
+        if self.frames_processed < self.early_stop.get('min_frames', 1):
+            return
+        evidence = self.evidence()
+        if evidence is None:
+            return
+        passing, confidence = evidence
+        accept = self.early_stop.get('accept_confidence')
+        reject = self.early_stop.get('reject_confidence')
+
+        if passing and accept is not None and confidence >= accept:
+            self.decision = 'accept'
+        elif not passing and reject is not None and confidence <= reject:
+            self.decision = 'reject'
+        else:
+            return
+        self.decided_at = timestamp
+        logger.info(f"{self.name}: early {self.decision} after {self.frames_processed} frames "
+                    f"({timestamp:.2f}s, confidence {confidence:.2f})")
+
+    def early_stop_report(self) -> Dict[str, Any]:
+        """How much of the window an early decision saved"""
+        if self.decision is None:
+            return {'early_stopped': False, 'time_saved': 0.0, 'frames_saved': 0}
+        time_saved = max(0.0, self.duration - self.decided_at) if self.duration else 0.0
+        # Frames the analyzer would have processed at its observed rate
+        rate = self.frames_processed / self.decided_at if self.decided_at > 0 else 0.0
+        return {
+            'early_stopped': True,
+            'decision': self.decision,
+            'decided_at': round(self.decided_at, 2),
+            'time_saved': round(time_saved, 2),
+            'frames_saved': int(round(rate * time_saved))
+        }
+
+    def progress(self) -> Dict[str, Any]:
+        """Running state for streaming clients; cheap enough to call every few frames"""
+        state = {'frames_processed': self.frames_processed, 'decision': self.decision}
+        evidence = self.evidence()
+        if evidence is not None:
+            state['passing'], state['confidence'] = bool(evidence[0]), round(float(evidence[1]), 3)
+        return state
+
+    def result(self) -> Dict[str, Any]:
+        """Step result in the same shape the step service returns"""
+        raise NotImplementedError
+
+    def final_result(self) -> Dict[str, Any]:
+        """Step result plus the early-stopping report when early stopping is on"""
+        result = self.result()
+        if self.early_stop:
+            result.update(self.early_stop_report())
+        return result
+
+
+class AnalyzerWorkers:
+    """
+    Long-lived single-thread executors per analyzer name
+
+    A run checks out one executor per analyzer and returns it afterwards, so
+    worker threads are started once and reused instead of being spawned on
+    every request. Concurrent runs each get their own executor; idle ones
+    beyond ``max_idle`` per name are shut down.
+    """
+
+    def __init__(self, max_idle: int = 8):
+        self.max_idle = max_idle
+        self._idle: Dict[str, List[ThreadPoolExecutor]] = {}
+        self._lock = threading.Lock()
+
+    def checkout(self, name: str) -> ThreadPoolExecutor:
+        with self._lock:
+            idle = self._idle.get(name)
+            if idle:
+                return idle.pop()
+        return ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"fused-{name}")
+
+    def checkin(self, name: str, executor: ThreadPoolExecutor):
+        with self._lock:
+            idle = self._idle.setdefault(name, [])
+            if len(idle) < self.max_idle:
+                idle.append(executor)
+                return
+        executor.shutdown(wait=False)
+
+
+# Worker threads shared by every fused run in this process
+analyzer_workers = AnalyzerWorkers()
+
+
+class FusedLivenessPipeline:
+    """Single capture window that feeds every frame to all analyzers at once"""
+
+    def __init__(self, analyzers: Dict[str, FrameAnalyzer], parallel: bool = True,
+                 context_cache: Optional[FrameContextCache] = None,
+                 workers: Optional[AnalyzerWorkers] = None):
+        self.analyzers = analyzers
+        self.parallel = parallel
+        self.workers = workers if workers is not None else analyzer_workers
+        # Shared artifacts: gray/RGB, face boxes and landmarks are computed
+        # once per frame no matter how many analyzers ask for them.
+        self.context_cache = context_cache if context_cache is not None else FrameContextCache()
+        self.frames_read = 0
+        self.elapsed = 0.0
+
+    def _run_analyzer(self, analyzer: FrameAnalyzer, ctx: FrameContext):
+        analyzer.feed(ctx)
+
+    def run(self, frame_source, duration: float,
+            on_frame: Optional[Callable[[float, Dict[str, FrameAnalyzer]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Run all analyzers over one window of the frame source
+
+        Args:
+            frame_source: FrameSource to read from
+            duration: Length of the shared capture window in seconds
+            on_frame: Called with (window time, analyzers) after every analysed
+                frame, once all analyzers are done with it
+
+        Returns:
+            Dict mapping analyzer name to its step result
+        """
+        errors: Dict[str, str] = {}
+        started = []
+        # One worker thread per analyzer for the whole run, taken from the
+        # long-lived workers so no thread is started on the request path
+        executors = {}
+
+        try:
+            for name, analyzer in self.analyzers.items():
+                try:
+                    analyzer.start()
+                    started.append(name)
+                except Exception as e:
+                    logger.error(f"Fused analyzer '{name}' failed to start: {e}")
+                    errors[name] = str(e)
+                if self.parallel and name not in errors:
+                    executors[name] = self.workers.checkout(name)
+
+            start_time = frame_source.clock()
+            while frame_source.clock() - start_time < duration:
+                active = {name: a for name, a in self.analyzers.items() if name not in errors}
+                timestamp = frame_source.clock() - start_time
+                if not active or all(a.is_done(timestamp) for a in active.values()):
+                    break
+
+                # Recorded sources skip frames no analyzer is due for without decoding them
+                if getattr(frame_source, 'seekable', False):
+                    pending = [a.next_wanted() for a in active.values() if not a.is_done(timestamp)]
+                    frame_source.skip_to(start_time + min(pending))
+
+                frame = frame_source.get_frame()
+                if frame is None:
+                    if frame_source.exhausted:
+                        break
+                    continue
+
+                self.frames_read += 1
+                timestamp = frame_source.clock() - start_time
+                due = {name: a for name, a in active.items() if a.wants(timestamp)}
+                if not due:
+                    continue
+                ctx = self.context_cache.context(frame, self.frames_read, timestamp)
+
+                if self.parallel and len(due) > 1:
+                    futures = {name: executors[name].submit(self._run_analyzer, a, ctx)
+                               for name, a in due.items()}
+                    for name, future in futures.items():
+                        try:
+                            future.result()
+                        except Exception as e:
+                            logger.error(f"Fused analyzer '{name}' failed: {e}")
+                            errors[name] = str(e)
+                else:
+                    for name, analyzer in due.items():
+                        try:
+                            if self.parallel:
+                                executors[name].submit(self._run_analyzer, analyzer, ctx).result()
+                            else:
+                                self._run_analyzer(analyzer, ctx)
+                        except Exception as e:
+                            logger.error(f"Fused analyzer '{name}' failed: {e}")
+                            errors[name] = str(e)
+
+                if on_frame is not None:
+                    on_frame(timestamp, self.analyzers)
+
+            self.elapsed = frame_source.clock() - start_time
+        finally:
+            for name in started:
+                try:
+                    self.analyzers[name].stop()
+                except Exception as e:
+                    logger.warning(f"Fused analyzer '{name}' failed to stop cleanly: {e}")
+            # Every submitted frame was waited on, so the workers are idle again
+            for name, executor in executors.items():
+                self.workers.checkin(name, executor)
+            # Pooled models (FaceMesh) leased for this window go back to the pool
+            self.context_cache.release_models()
+
+        results = {}
+        for name, analyzer in self.analyzers.items():
+            if name in errors:
+                results[name] = {
+                    'success': False,
+                    'confidence': 0.0,
+                    'message': f'{name} failed: {errors[name]}',
+                    'error': errors[name]
+                }
+                continue
+            try:
+                results[name] = analyzer.final_result()
+            except Exception as e:
+                logger.error(f"Fused analyzer '{name}' failed to produce a result: {e}")
+                results[name] = {
+                    'success': False,
+                    'confidence': 0.0,
+                    'message': f'{name} failed: {e}',
+                    'error': str(e)
+                }
+        return results
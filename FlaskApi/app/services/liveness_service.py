@@ -8,19 +8,32 @@ import numpy as np
 import base64
 import os
 import tempfile
+import copy
 import logging
-from typing import Dict, Any, Optional, Tuple
+from typing import Callable, Dict, Any, Optional, Tuple, Union
 from datetime import datetime
 
 # Import existing modules
 from .camera_service import CameraService
+from .frame_sources import DEFAULT_CAPTURE_CONFIG, FrameSource, VideoFileFrameSource, decode_image_data
+from .batch_scheduler import DEFAULT_BATCHING_CONFIG
+from .embedding_cache import DEFAULT_REFERENCE_CACHE_CONFIG
+from .face_tracker import DEFAULT_TRACKING_CONFIG
+from .frame_context import FrameContextCache
 from .person_verification_service import PersonVerificationService
 from .blink_detection_service import BlinkDetectionService
-from .mouth_captcha_service import MouthCaptchaService
-from .midas_liveness_service import MidasLivenessService
+from .mouth_captcha_service import AudioFeed, MouthCaptchaService
+from .midas_liveness_service import DEFAULT_DEPTH_ROI_CONFIG, DEFAULT_HEAD_MOTION_CONFIG, MidasLivenessService
+from .model_registry import model_registry
+from .rate_scheduler import DEFAULT_SCHEDULING_CONFIG
+from .liveness_pipeline import DEFAULT_EARLY_STOPPING, FusedLivenessPipeline
+from .liveness_stream import DEFAULT_STREAM_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# Base64 text (JSON requests) or encoded image bytes (binary uploads)
+ImagePayload = Union[str, np.ndarray]
+
 class LivenessDetectionService:
     """Comprehensive liveness detection service integrating all detection methods"""
     
@@ -38,8 +51,63 @@ class LivenessDetectionService:
             'blink_detection_duration': 4,
             'mouth_captcha_duration': 7,
             'enable_display': False,  # Disable for API mode
-            'confidence_threshold': 0.7
+            'confidence_threshold': 0.7,
+            # 'sequential' runs one timed window per step; 'fused' shares one window
+            'pipeline_mode': 'sequential',
+            'fused_parallel': True,
+            # Recent frames whose gray/RGB/landmark artifacts are kept for reuse
+            'frame_cache_size': 4,
+            # Per-step frame rate caps in fused mode (None = every frame).
+            # Blink/MAR counters need consecutive frames, depth/ArcFace do not.
+            'fused_max_fps': {
+                'person_verification': 5,
+                'midas_liveness': 10,
+                'blink_detection': None,
+                'mouth_captcha': None
+            },
+            # Detect-then-track for the dlib face detector (blink/mouth steps)
+            'face_tracking': dict(DEFAULT_TRACKING_CONFIG),
+            # Stop each step as soon as its evidence is decisive
+            'early_stopping': copy.deepcopy(DEFAULT_EARLY_STOPPING),
+            # Cross-request micro-batching for MiDaS and ArcFace inference
+            'inference_batching': dict(DEFAULT_BATCHING_CONFIG),
+            # MiDaS on the padded face region instead of the full frame
+            'depth_roi': dict(DEFAULT_DEPTH_ROI_CONFIG),
+            # Run MiDaS at a lower rate than landmarks/PnP, adapting to the frame budget
+            'depth_scheduling': copy.deepcopy(DEFAULT_SCHEDULING_CONFIG),
+            # Head-motion variance check in the 2D/3D step
+            'head_motion': dict(DEFAULT_HEAD_MOTION_CONFIG),
+            # Local camera grabbed on a background thread into a drop-stale ring
+            'camera_capture': dict(DEFAULT_CAPTURE_CONFIG),
+            # Uploaded clips: one shared window, frames sampled (and skipped undecoded) at max_fps
+            'uploaded_video': {
+                'mode': 'fused',
+                'max_fps': float(os.environ.get('VIDEO_SAMPLE_FPS', 15)),
+                'seek_seconds': 1.0
+            },
+            # Media that cannot answer the voice captcha (uploaded clips, job
+            # frames) is never live by default; when allowed its verdict is
+            # marked liveness_proof 'recorded'
+            'allow_recorded_media': os.environ.get('LIVENESS_ALLOW_RECORDED_MEDIA', 'False').lower() == 'true',
+            # WebSocket sessions: per-connection frame buffer and progress rate
+            'streaming': dict(DEFAULT_STREAM_CONFIG),
+            # Reference embeddings cached by payload hash
+            'reference_cache': dict(DEFAULT_REFERENCE_CACHE_CONFIG),
+            # InsightFace heads loaded at startup and per-frame detector sizes
+            'insightface': self.person_verification.insightface_config,
+            # Person verification on a quality-weighted template of the best frames
+            'embedding_aggregation': self.person_verification.aggregation_config
         }
+        # Step services read the same dict, so runtime changes apply everywhere
+        self.blink_detection.tracking_config = self.config['face_tracking']
+        self.mouth_captcha.tracking_config = self.config['face_tracking']
+        self.midas_liveness.batching_config = self.config['inference_batching']
+        self.person_verification.batching_config = self.config['inference_batching']
+        self.midas_liveness.depth_roi_config = self.config['depth_roi']
+        self.midas_liveness.scheduling_config = self.config['depth_scheduling']
+        self.midas_liveness.head_motion_config = self.config['head_motion']
+        self.person_verification.reference_cache_config = self.config['reference_cache']
+        self.camera_service.capture_config = self.config['camera_capture']
     
     def decode_image_from_base64(self, image_data: str) -> np.ndarray:
         """Decode base64 image data to OpenCV format"""
@@ -60,6 +128,28 @@ class LivenessDetectionService:
         except Exception as e:
             raise ValueError(f"Image decoding failed: {str(e)}")
     
+    def decode_image(self, image_data: ImagePayload) -> np.ndarray:
+        """Decode base64 text or uploaded image bytes to OpenCV format"""
+        try:
+            image = decode_image_data(image_data)
+        except Exception as e:
+            raise ValueError(f"Image decoding failed: {str(e)}")
+        if image is None:
+            raise ValueError("Image decoding failed: Failed to decode image")
+        return image
+    
+    @staticmethod
+    def _has_reference(reference_image_data: Optional[ImagePayload]) -> bool:
+        """A non-empty reference image (base64 text or an upload buffer)"""
+        return reference_image_data is not None and len(reference_image_data) > 0
+    
+    def _reference_embedding(self, reference_image_data: Optional[ImagePayload],
+                             reference_embedding: Optional[np.ndarray] = None) -> np.ndarray:
+        """Enrolled embedding if given, else the reference image's (computed only on a cache miss)"""
+        if reference_embedding is not None:
+            return reference_embedding
+        return self.person_verification.reference_embedding_from_data(reference_image_data, self.decode_image)
+    
     def encode_image_to_base64(self, image: np.ndarray) -> str:
         """Encode OpenCV image to base64 string"""
         try:
@@ -69,16 +159,175 @@ class LivenessDetectionService:
         except Exception as e:
             raise ValueError(f"Image encoding failed: {str(e)}")
     
-    def run_complete_liveness_detection(self, reference_image_data: Optional[str] = None) -> Dict[str, Any]:
+    def _open_frame_source(self, frame_source: Optional[FrameSource]) -> FrameSource:
+        """Use the caller's frame source, or fall back to the local camera"""
+        if frame_source is not None:
+            return frame_source
+        camera = self.camera_service.get_camera()
+        if not camera:
+            raise RuntimeError("Camera not available")
+        return camera
+    
+    def _release_frame_source(self, frame_source: Optional[FrameSource],
+                              results: Optional[Dict[str, Any]] = None):
+        """Release the local camera; caller-provided sources are left to the caller"""
+        if frame_source is None:
+            try:
+                capture = self.camera_service.capture_stats()
+                if capture and results is not None:
+                    results['capture'] = capture
+                self.camera_service.release_camera()
+            except:
+                pass
+    
+    # Step order, display names and failure messages shared by both pipeline modes
+    STEPS = [
+        ('person_verification', 'Person verification', 'Person verification failed'),
+        ('midas_liveness', '2D/3D liveness check', '2D/3D liveness check failed'),
+        ('blink_detection', 'Blink detection', 'Blink detection failed'),
+        ('mouth_captcha', 'Voice captcha verification', 'Voice captcha verification failed'),
+    ]
+    
+    def _early_stop_bounds(self, step_name: str) -> Optional[Dict[str, Any]]:
+        """Accept/reject bounds for one step, or None when early stopping is off"""
+        early_stopping = self.config['early_stopping']
+        if not early_stopping.get('enabled'):
+            return None
+        bounds = dict(early_stopping.get('bounds', {}).get(step_name, {}))
+        bounds.setdefault('min_frames', early_stopping.get('min_frames', 1))
+        # Accepting below the verdict threshold would pass a step that then drags the
+        # combined confidence under it
+        if bounds.get('accept_confidence') is not None:
+            bounds['accept_confidence'] = max(bounds['accept_confidence'], self.config['confidence_threshold'])
+        return bounds
+    
+    def _format_step_result(self, step_name: str, step_result: Dict[str, Any]) -> Dict[str, Any]:
+        """Shape a raw step service result for the combined response"""
+        formatted = {
+            'passed': step_result['success'],
+            'confidence': step_result['confidence'],
+        }
+        if step_name == 'blink_detection':
+            formatted['blinks_detected'] = step_result.get('blinks_detected', 0)
+            formatted['gaze_movements'] = step_result.get('gaze_movements', 0)
+        elif step_name == 'mouth_captcha':
+            formatted['captcha_question'] = step_result.get('question', '')
+            formatted['captcha_answer'] = step_result.get('answer', '')
+            formatted['spoken_text'] = step_result.get('spoken_text', '')
+        if 'early_stopped' in step_result:
+            formatted['early_stopped'] = step_result['early_stopped']
+            formatted['time_saved'] = step_result['time_saved']
+            formatted['frames_saved'] = step_result['frames_saved']
+        formatted['message'] = step_result.get('message', '')
+        return formatted
+    
+    def _notify_step(self, on_step: Optional[Callable[[str, Dict[str, Any]], None]],
+                     step_name: str, step_result: Dict[str, Any]):
+        """Report a finished step to the caller's progress callback"""
+        if on_step is None:
+            return
+        try:
+            on_step(step_name, step_result)
+        except Exception as e:
+            logger.warning(f"Step progress callback failed for {step_name}: {e}")
+    
+    @staticmethod
+    def _captcha_applicable(frame_source: Optional[FrameSource], audio_feed: Optional[AudioFeed] = None) -> bool:
+        """
+        Whether the voice captcha can run on this input
+
+        The question is generated during analysis, so only someone in front of
+        a live source can answer it. Recorded clips and uploaded frame
+        sequences were captured before the question existed, and the server
+        microphone must never stand in for the client's.
+        """
+        if audio_feed is not None or frame_source is None:
+            return True
+        return frame_source.is_live
+    
+    def _not_applicable_captcha(self) -> Dict[str, Any]:
+        return {
+            'passed': None,
+            'applicable': False,
+            'confidence': None,
+            'message': 'Not applicable - recorded media cannot answer a live captcha'
+        }
+    
+    def _skipped_person_verification(self) -> Dict[str, Any]:
+        return {
+            'passed': True,
+            'confidence': 1.0,
+            'message': 'Skipped - no reference image provided'
+        }
+    
+    def _finalize_results(self, results: Dict[str, Any], step_results: Dict[str, Any],
+                          passed_steps: int, total_confidence: float) -> Dict[str, Any]:
+        """
+        Combine per-step scores into the final liveness verdict
+        
+        Steps marked not applicable (the captcha on recorded media) count
+        neither as passed nor towards the total. Without the captcha nothing
+        proves the subject was present, so such a run is only accepted when
+        config['allow_recorded_media'] is set, and then needs every applicable
+        step to pass and is marked ``liveness_proof: 'recorded'``.
+        """
+        total_steps = sum(1 for step in step_results.values() if step.get('applicable', True))
+        recorded = total_steps < len(step_results)
+        final_confidence = total_confidence / passed_steps if passed_steps > 0 else 0.0
+        if self.config['early_stopping'].get('enabled'):
+            results['time_saved'] = round(sum(step.get('time_saved', 0.0) for step in step_results.values()), 2)
+            results['frames_saved'] = sum(step.get('frames_saved', 0) for step in step_results.values())
+        is_live = passed_steps >= min(3, total_steps) and final_confidence >= self.config['confidence_threshold']
+        message = 'Liveness detection completed successfully' if is_live else 'Liveness detection failed'
+        if recorded and not self.config['allow_recorded_media']:
+            is_live = False
+            message = 'Recorded media cannot prove liveness without the live voice captcha'
+        
+        results.update({
+            'success': True,
+            'is_live': is_live,
+            'liveness_proof': 'recorded' if recorded else 'live',
+            'confidence': final_confidence,
+            'steps': step_results,
+            'passed_steps': passed_steps,
+            'total_steps': total_steps,
+            'message': message
+        })
+        
+        if is_live:
+            logger.info("🎉 SUCCESS: Person is LIVE! All verification steps passed.")
+        else:
+            logger.warning("❌ VERIFICATION FAILED: Spoof attempt detected")
+        
+        return results
+    
+    def run_complete_liveness_detection(self, reference_image_data: Optional[ImagePayload] = None,
+                                        frame_source: Optional[FrameSource] = None,
+                                        mode: Optional[str] = None,
+                                        on_step: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                                        reference_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Run complete liveness detection sequence with all verification steps
         
         Args:
-            reference_image_data: Base64 encoded reference image (optional)
+            reference_image_data: Base64 encoded or uploaded reference image (optional)
+            frame_source: Source of frames (defaults to the local camera)
+            mode: 'sequential' (one timed window per step) or 'fused' (one shared
+                window feeding all steps at once); defaults to config['pipeline_mode']
+            on_step: Called with (step name, step result) as each step finishes
+            reference_embedding: Enrolled face template; used instead of
+                ``reference_image_data`` for person verification
             
         Returns:
             Dict containing detection results and confidence scores
         """
+        mode = mode or self.config['pipeline_mode']
+        if mode == 'fused':
+            return self.run_fused_liveness_detection(reference_image_data, frame_source, on_step=on_step,
+                                                     reference_embedding=reference_embedding)
+        if mode != 'sequential':
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+        
         results = {
             'success': False,
             'is_live': False,
@@ -91,31 +340,38 @@ class LivenessDetectionService:
         try:
             logger.info("Starting complete liveness detection sequence")
             
-            # Initialize camera
-            camera = self.camera_service.get_camera()
-            if not camera:
-                raise RuntimeError("Camera not available")
+            # Initialize frame source
+            camera = self._open_frame_source(frame_source)
             
-            step_results = {}
+            # Shared with the response so a failed step still reports the steps before it
+            step_results = results['steps']
             total_confidence = 0.0
             passed_steps = 0
             
-            # Step 1: Person Verification (if reference image provided)
-            if reference_image_data:
+            # Step 1: Person Verification (if reference image or template provided)
+            if self._has_reference(reference_image_data) or reference_embedding is not None:
                 logger.info("Step 1/4: Person Verification")
                 try:
-                    reference_image = self.decode_image_from_base64(reference_image_data)
-                    person_result = self.person_verification.verify_person(
-                        camera, reference_image, 
-                        duration=self.config['person_verification_duration'],
-                        display=self.config['enable_display']
-                    )
+                    try:
+                        ref_emb = self._reference_embedding(reference_image_data, reference_embedding)
+                    except ValueError as e:
+                        person_result = {
+                            'success': False,
+                            'confidence': 0.0,
+                            'message': str(e),
+                            'error': 'Invalid reference image'
+                        }
+                    else:
+                        person_result = self.person_verification.verify_person(
+                            camera, None,
+                            duration=self.config['person_verification_duration'],
+                            display=self.config['enable_display'],
+                            early_stop=self._early_stop_bounds('person_verification'),
+                            reference_embedding=ref_emb
+                        )
                     
-                    step_results['person_verification'] = {
-                        'passed': person_result['success'],
-                        'confidence': person_result['confidence'],
-                        'message': person_result['message']
-                    }
+                    step_results['person_verification'] = self._format_step_result('person_verification', person_result)
+                    self._notify_step(on_step, 'person_verification', step_results['person_verification'])
                     
                     if person_result['success']:
                         passed_steps += 1
@@ -133,13 +389,11 @@ class LivenessDetectionService:
                         'confidence': 0.0,
                         'error': str(e)
                     }
+                    self._notify_step(on_step, 'person_verification', step_results['person_verification'])
             else:
                 logger.info("Skipping person verification (no reference image)")
-                step_results['person_verification'] = {
-                    'passed': True,
-                    'confidence': 1.0,
-                    'message': 'Skipped - no reference image provided'
-                }
+                step_results['person_verification'] = self._skipped_person_verification()
+                self._notify_step(on_step, 'person_verification', step_results['person_verification'])
                 passed_steps += 1
                 total_confidence += 1.0
             
@@ -149,14 +403,12 @@ class LivenessDetectionService:
                 midas_result = self.midas_liveness.run_liveness_check(
                     camera,
                     duration=self.config['midas_liveness_duration'],
-                    display=self.config['enable_display']
+                    display=self.config['enable_display'],
+                    early_stop=self._early_stop_bounds('midas_liveness')
                 )
                 
-                step_results['midas_liveness'] = {
-                    'passed': midas_result['success'],
-                    'confidence': midas_result['confidence'],
-                    'message': midas_result['message']
-                }
+                step_results['midas_liveness'] = self._format_step_result('midas_liveness', midas_result)
+                self._notify_step(on_step, 'midas_liveness', step_results['midas_liveness'])
                 
                 if midas_result['success']:
                     passed_steps += 1
@@ -174,6 +426,7 @@ class LivenessDetectionService:
                     'confidence': 0.0,
                     'error': str(e)
                 }
+                self._notify_step(on_step, 'midas_liveness', step_results['midas_liveness'])
             
             # Step 3: Blink Detection
             logger.info("Step 3/4: Blink Detection")
@@ -181,16 +434,12 @@ class LivenessDetectionService:
                 blink_result = self.blink_detection.detect_blinks(
                     camera,
                     duration=self.config['blink_detection_duration'],
-                    display=self.config['enable_display']
+                    display=self.config['enable_display'],
+                    early_stop=self._early_stop_bounds('blink_detection')
                 )
                 
-                step_results['blink_detection'] = {
-                    'passed': blink_result['success'],
-                    'confidence': blink_result['confidence'],
-                    'blinks_detected': blink_result.get('blinks_detected', 0),
-                    'gaze_movements': blink_result.get('gaze_movements', 0),
-                    'message': blink_result['message']
-                }
+                step_results['blink_detection'] = self._format_step_result('blink_detection', blink_result)
+                self._notify_step(on_step, 'blink_detection', step_results['blink_detection'])
                 
                 if blink_result['success']:
                     passed_steps += 1
@@ -208,24 +457,26 @@ class LivenessDetectionService:
                     'confidence': 0.0,
                     'error': str(e)
                 }
+                self._notify_step(on_step, 'blink_detection', step_results['blink_detection'])
             
             # Step 4: Voice Captcha Verification
+            if not self._captcha_applicable(frame_source):
+                logger.info("Skipping voice captcha (recorded media)")
+                step_results['mouth_captcha'] = self._not_applicable_captcha()
+                self._notify_step(on_step, 'mouth_captcha', step_results['mouth_captcha'])
+                return self._finalize_results(results, step_results, passed_steps, total_confidence)
+            
             logger.info("Step 4/4: Voice Captcha Verification")
             try:
                 captcha_result = self.mouth_captcha.run_captcha_verification(
                     camera,
                     duration=self.config['mouth_captcha_duration'],
-                    display=self.config['enable_display']
+                    display=self.config['enable_display'],
+                    early_stop=self._early_stop_bounds('mouth_captcha')
                 )
                 
-                step_results['mouth_captcha'] = {
-                    'passed': captcha_result['success'],
-                    'confidence': captcha_result['confidence'],
-                    'captcha_question': captcha_result.get('question', ''),
-                    'captcha_answer': captcha_result.get('answer', ''),
-                    'spoken_text': captcha_result.get('spoken_text', ''),
-                    'message': captcha_result['message']
-                }
+                step_results['mouth_captcha'] = self._format_step_result('mouth_captcha', captcha_result)
+                self._notify_step(on_step, 'mouth_captcha', step_results['mouth_captcha'])
                 
                 if captcha_result['success']:
                     passed_steps += 1
@@ -243,27 +494,10 @@ class LivenessDetectionService:
                     'confidence': 0.0,
                     'error': str(e)
                 }
+                self._notify_step(on_step, 'mouth_captcha', step_results['mouth_captcha'])
             
             # Calculate final results
-            final_confidence = total_confidence / passed_steps if passed_steps > 0 else 0.0
-            is_live = passed_steps >= 3 and final_confidence >= self.config['confidence_threshold']
-            
-            results.update({
-                'success': True,
-                'is_live': is_live,
-                'confidence': final_confidence,
-                'steps': step_results,
-                'passed_steps': passed_steps,
-                'total_steps': 4,
-                'message': 'Liveness detection completed successfully' if is_live else 'Liveness detection failed'
-            })
-            
-            if is_live:
-                logger.info("🎉 SUCCESS: Person is LIVE! All verification steps passed.")
-            else:
-                logger.warning("❌ VERIFICATION FAILED: Spoof attempt detected")
-            
-            return results
+            return self._finalize_results(results, step_results, passed_steps, total_confidence)
             
         except Exception as e:
             logger.error(f"Liveness detection failed: {e}")
@@ -272,57 +506,300 @@ class LivenessDetectionService:
         
         finally:
             # Clean up camera
+            self._release_frame_source(frame_source, results)
+    
+    def _build_context_cache(self) -> FrameContextCache:
+        """Frame artifact cache shared by all fused analyzers"""
+        models = {}
+        for service in (self.blink_detection, self.mouth_captcha):
+            if service.is_model_loaded():
+                models['face_detector'] = service.detector
+                models['shape_predictor'] = service.predictor
+                models['face_tracker'] = service.create_face_tracker()
+                break
+        if self.midas_liveness.is_model_loaded():
+            models['face_mesh'] = self.midas_liveness.face_mesh_pool
+        return FrameContextCache(capacity=self.config['frame_cache_size'], **models)
+    
+    def _build_fused_analyzers(self, reference_image_data: Optional[ImagePayload],
+                               reference_embedding: Optional[np.ndarray] = None,
+                               audio_feed: Optional[AudioFeed] = None,
+                               include_captcha: bool = True):
+        """
+        Create one analyzer per step, each with its own window and frame rate
+        
+        Returns:
+            Tuple of (analyzers by step name, step names whose models are not
+            loaded, frame context cache shared by the analyzers)
+        """
+        rates = self.config['fused_max_fps']
+        context_cache = self._build_context_cache()
+        analyzers = {}
+        unavailable = []
+        
+        if self._has_reference(reference_image_data) or reference_embedding is not None:
+            if self.person_verification.is_model_loaded():
+                ref_emb = self._reference_embedding(reference_image_data, reference_embedding)
+                analyzers['person_verification'] = self.person_verification.create_analyzer(
+                    ref_emb,
+                    duration=self.config['person_verification_duration'],
+                    max_fps=rates.get('person_verification'),
+                    context_cache=context_cache,
+                    early_stop=self._early_stop_bounds('person_verification')
+                )
+            else:
+                unavailable.append('person_verification')
+        
+        if self.midas_liveness.is_model_loaded():
+            analyzers['midas_liveness'] = self.midas_liveness.create_analyzer(
+                duration=self.config['midas_liveness_duration'],
+                max_fps=rates.get('midas_liveness'),
+                context_cache=context_cache,
+                early_stop=self._early_stop_bounds('midas_liveness')
+            )
+        else:
+            unavailable.append('midas_liveness')
+        
+        if self.blink_detection.is_model_loaded():
+            analyzers['blink_detection'] = self.blink_detection.create_analyzer(
+                duration=self.config['blink_detection_duration'],
+                max_fps=rates.get('blink_detection'),
+                context_cache=context_cache,
+                early_stop=self._early_stop_bounds('blink_detection')
+            )
+        else:
+            unavailable.append('blink_detection')
+        
+        # Never built for recorded media: its recorder would open the server microphone
+        if include_captcha and self.mouth_captcha.is_model_loaded():
+            analyzers['mouth_captcha'] = self.mouth_captcha.create_analyzer(
+                duration=self.config['mouth_captcha_duration'],
+                max_fps=rates.get('mouth_captcha'),
+                context_cache=context_cache,
+                early_stop=self._early_stop_bounds('mouth_captcha'),
+                audio_feed=audio_feed
+            )
+        elif include_captcha:
+            unavailable.append('mouth_captcha')
+        
+        return analyzers, unavailable, context_cache
+    
+    def run_fused_liveness_detection(self, reference_image_data: Optional[ImagePayload] = None,
+                                     frame_source: Optional[FrameSource] = None,
+                                     on_step: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                                     reference_embedding: Optional[np.ndarray] = None,
+                                     on_frame: Optional[Callable[[float, Dict[str, Any]], None]] = None,
+                                     audio_feed: Optional[AudioFeed] = None) -> Dict[str, Any]:
+        """
+        Run all verification steps over a single shared capture window
+        
+        One frame stream is read once and fanned out to every step analyzer in
+        parallel. Each analyzer stops after its own configured duration, so the
+        capture window is the longest step instead of the sum of all steps. The
+        verdict uses the same per-step scoring as the sequential mode.
+        
+        Args:
+            reference_image_data: Base64 encoded or uploaded reference image (optional)
+            frame_source: Source of frames (defaults to the local camera)
+            on_step: Called with (step name, step result) once the window ends
+            reference_embedding: Enrolled face template (instead of a reference image)
+            on_frame: Called with (window time, analyzers) after every analysed frame
+            audio_feed: Client-supplied audio for the voice captcha (instead of
+                the local microphone)
+            
+        Returns:
+            Dict containing detection results and confidence scores
+        """
+        results = {
+            'success': False,
+            'is_live': False,
+            'confidence': 0.0,
+            'steps': {},
+            'mode': 'fused',
+            'timestamp': datetime.utcnow().isoformat(),
+            'error': None
+        }
+        
+        try:
+            logger.info("Starting fused liveness detection")
+            
             try:
-                self.camera_service.release_camera()
-            except:
-                pass
+                captcha_applicable = self._captcha_applicable(frame_source, audio_feed)
+                analyzers, unavailable, context_cache = self._build_fused_analyzers(
+                    reference_image_data, reference_embedding, audio_feed=audio_feed,
+                    include_captcha=captcha_applicable
+                )
+            except ValueError as e:
+                results['error'] = f"Person verification failed: {e}"
+                return results
+            
+            camera = self._open_frame_source(frame_source)
+            duration = max(a.duration for a in analyzers.values()) if analyzers else 0
+            pipeline = FusedLivenessPipeline(analyzers, parallel=self.config['fused_parallel'],
+                                             context_cache=context_cache)
+            raw_results = pipeline.run(camera, duration, on_frame=on_frame)
+            
+            # Steps whose models are missing fail the same way as in sequential mode
+            for name in unavailable:
+                raw_results[name] = {
+                    'success': False,
+                    'confidence': 0.0,
+                    'message': f'{name} models not loaded',
+                    'error': 'Models not available'
+                }
+            
+            results['frames_read'] = pipeline.frames_read
+            results['capture_seconds'] = round(pipeline.elapsed, 2)
+            tracker = context_cache.models.get('face_tracker')
+            if tracker is not None:
+                results['face_tracking'] = tracker.stats()
+            
+            step_results = {}
+            total_confidence = 0.0
+            passed_steps = 0
+            
+            for step_name, label, failure_message in self.STEPS:
+                if (step_name == 'person_verification' and not self._has_reference(reference_image_data)
+                        and reference_embedding is None):
+                    step_results[step_name] = self._skipped_person_verification()
+                    self._notify_step(on_step, step_name, step_results[step_name])
+                    passed_steps += 1
+                    total_confidence += 1.0
+                    continue
+                if step_name == 'mouth_captcha' and not captcha_applicable:
+                    step_results[step_name] = self._not_applicable_captcha()
+                    self._notify_step(on_step, step_name, step_results[step_name])
+                    continue
+                
+                step_result = raw_results[step_name]
+                step_results[step_name] = self._format_step_result(step_name, step_result)
+                self._notify_step(on_step, step_name, step_results[step_name])
+                
+                if step_result['success']:
+                    passed_steps += 1
+                    total_confidence += step_result['confidence']
+                    logger.info(f"✅ {label} passed")
+                else:
+                    logger.warning(f"❌ {label} failed")
+                    results['error'] = failure_message
+                    results['steps'] = step_results
+                    return results
+            
+            return self._finalize_results(results, step_results, passed_steps, total_confidence)
+            
+        except Exception as e:
+            logger.error(f"Fused liveness detection failed: {e}")
+            results['error'] = str(e)
+            return results
+        
+        finally:
+            self._release_frame_source(frame_source, results)
     
-    def run_individual_step(self, step_name: str, image_data: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    def run_video_liveness_detection(self, video_path: str,
+                                     reference_image_data: Optional[ImagePayload] = None,
+                                     mode: Optional[str] = None,
+                                     on_step: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                                     reference_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
+        """
+        Run the complete liveness sequence over a recorded clip
+        
+        The clip is timed by media time, and only the frames the steps will
+        analyse are decoded (see VideoFileFrameSource). The result has the
+        same schema as run_complete_liveness_detection, plus decode counters
+        under ``video``. The voice captcha is not applicable to a recording
+        (the question did not exist when it was made): it is reported with
+        ``applicable: False``, and the clip is only judged live when
+        config['allow_recorded_media'] is set (see _finalize_results).
+        
+        Args:
+            video_path: Path of the clip on local disk
+            reference_image_data: Base64 encoded or uploaded reference image (optional)
+            mode: 'sequential' or 'fused'; defaults to config['uploaded_video']['mode']
+            on_step: Called with (step name, step result) as each step finishes
+            reference_embedding: Enrolled face template (instead of a reference image)
+        """
+        config = self.config['uploaded_video']
+        source = VideoFileFrameSource(video_path, max_fps=config.get('max_fps'),
+                                      seek_seconds=config.get('seek_seconds', 1.0))
+        try:
+            if not source.is_opened():
+                return {
+                    'success': False,
+                    'is_live': False,
+                    'confidence': 0.0,
+                    'steps': {},
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'error': 'Could not open the uploaded video'
+                }
+            results = self.run_complete_liveness_detection(
+                reference_image_data, frame_source=source, mode=mode or config.get('mode'),
+                on_step=on_step, reference_embedding=reference_embedding
+            )
+            results['video'] = source.stats()
+            return results
+        finally:
+            source.release()
+    
+    def run_individual_step(self, step_name: str, image_data: Optional[ImagePayload] = None,
+                            frame_source: Optional[FrameSource] = None, **kwargs) -> Dict[str, Any]:
         """
         Run individual liveness detection step
         
         Args:
             step_name: Name of the step to run
             image_data: Base64 encoded image data (for person verification)
+            frame_source: Source of frames (defaults to the local camera)
             **kwargs: Additional parameters for the specific step
             
         Returns:
             Dict containing step results
         """
         try:
-            camera = self.camera_service.get_camera()
-            if not camera:
-                raise RuntimeError("Camera not available")
+            camera = self._open_frame_source(frame_source)
             
             if step_name == 'person_verification':
-                if not image_data:
-                    raise ValueError("Reference image required for person verification")
-                reference_image = self.decode_image_from_base64(image_data)
+                reference_embedding = kwargs.get('reference_embedding')
+                if not self._has_reference(image_data) and reference_embedding is None:
+                    raise ValueError("Reference image or enrolled template required for person verification")
+                try:
+                    ref_emb = self._reference_embedding(image_data, reference_embedding)
+                except ValueError as e:
+                    return {
+                        'success': False,
+                        'confidence': 0.0,
+                        'message': str(e),
+                        'error': 'Invalid reference image'
+                    }
                 return self.person_verification.verify_person(
-                    camera, reference_image, 
-                    duration=kwargs.get('duration', self.config['person_verification_duration']),
-                    display=kwargs.get('display', self.config['enable_display'])
+                    camera, None,
+                    duration=kwargs.get('duration') or self.config['person_verification_duration'],
+                    display=kwargs.get('display', self.config['enable_display']),
+                    early_stop=kwargs.get('early_stop', self._early_stop_bounds(step_name)),
+                    reference_embedding=ref_emb
                 )
             
             elif step_name == 'midas_liveness':
                 return self.midas_liveness.run_liveness_check(
                     camera,
-                    duration=kwargs.get('duration', self.config['midas_liveness_duration']),
-                    display=kwargs.get('display', self.config['enable_display'])
+                    duration=kwargs.get('duration') or self.config['midas_liveness_duration'],
+                    display=kwargs.get('display', self.config['enable_display']),
+                    early_stop=kwargs.get('early_stop', self._early_stop_bounds(step_name))
                 )
             
             elif step_name == 'blink_detection':
                 return self.blink_detection.detect_blinks(
                     camera,
-                    duration=kwargs.get('duration', self.config['blink_detection_duration']),
-                    display=kwargs.get('display', self.config['enable_display'])
+                    duration=kwargs.get('duration') or self.config['blink_detection_duration'],
+                    display=kwargs.get('display', self.config['enable_display']),
+                    early_stop=kwargs.get('early_stop', self._early_stop_bounds(step_name))
                 )
             
             elif step_name == 'mouth_captcha':
                 return self.mouth_captcha.run_captcha_verification(
                     camera,
-                    duration=kwargs.get('duration', self.config['mouth_captcha_duration']),
-                    display=kwargs.get('display', self.config['enable_display'])
+                    duration=kwargs.get('duration') or self.config['mouth_captcha_duration'],
+                    display=kwargs.get('display', self.config['enable_display']),
+                    early_stop=kwargs.get('early_stop', self._early_stop_bounds(step_name))
                 )
             
             else:
@@ -338,10 +815,29 @@ class LivenessDetectionService:
             }
         
         finally:
-            try:
-                self.camera_service.release_camera()
-            except:
-                pass
+            self._release_frame_source(frame_source)
+    
+    def _batching_stats(self) -> Dict[str, Any]:
+        """
+        Batch sizes achieved by the shared MiDaS/ArcFace batchers
+
+        Only batchers a run already created are reported: a status request
+        must not start batcher threads of its own.
+        """
+        stats = {}
+        for name, key in (('midas', self.midas_liveness.depth_batcher_key),
+                          ('arcface', self.person_verification.embedding_batcher_key)):
+            batcher = model_registry.peek(key) if key is not None else None
+            if batcher is not None:
+                stats[name] = batcher.stats()
+        return stats
+    
+    def _reference_cache_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters of the reference embedding cache"""
+        if not self.person_verification.is_model_loaded():
+            return {}
+        cache = self.person_verification.reference_cache
+        return cache.stats() if cache is not None else {}
     
     def get_system_status(self) -> Dict[str, Any]:
         """Get system status and available capabilities"""
@@ -353,6 +849,9 @@ class LivenessDetectionService:
                 'mouth_captcha': self.mouth_captcha.is_model_loaded(),
                 'midas_liveness': self.midas_liveness.is_model_loaded()
             },
+            'model_registry': model_registry.stats(),
+            'inference_batching': self._batching_stats(),
+            'reference_cache': self._reference_cache_stats(),
             'configuration': self.config,
             'timestamp': datetime.utcnow().isoformat()
         }
@@ -0,0 +1,187 @@
+"""
+Liveness Stream - One WebSocket client's live liveness session
+
+The browser pushes encoded frames (and microphone audio for the voice
+captcha); the fused pipeline analyses them on a background thread and the
+session reports running step states, each step's decision as soon as it is
+made, and the final verdict. Frames go through a small drop-oldest ring
+buffer and are decoded only when analysed, so a client that sends faster
+than the server can analyse costs bandwidth, not CPU.
+
+Wire protocol (all server messages are JSON text):
+
+* client text ``{"type": "start", ...}``: optional first message with
+  ``reference_image`` (base64), ``use_enrolled_template`` and
+  ``audio_samplerate``; sending frames first starts with defaults
+* client binary: a JPEG/PNG frame, optionally tagged with a leading 0x01;
+  0x02 followed by 16-bit mono PCM is a chunk of microphone audio
+* client text ``{"type": "stop"}``: no more frames; the window ends
+* server ``started``, ``progress``, ``decision``, ``step``, ``verdict``,
+  ``error``
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import numpy as np
+
+from .frame_sources import RingBufferFrameSource
+from .mouth_captcha_service import AudioFeed
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_CONFIG = {
+    # Frames waiting for analysis per connection; older ones are dropped
+    'buffer_size': 2,
+    # Seconds between progress messages
+    'progress_interval': 0.25,
+    # Default sample rate of client audio (16-bit mono PCM)
+    'audio_samplerate': 16000,
+    # Largest frame or audio message accepted
+    'max_message_bytes': 2 * 1024 * 1024,
+}
+
+FRAME_TAG = 0x01
+AUDIO_TAG = 0x02
+
+
+class LivenessStreamSession:
+    """Runs the fused pipeline over frames pushed by one streaming client"""
+
+    def __init__(self, service, send: Callable[[Dict[str, Any]], None],
+                 config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            service: LivenessDetectionService owning the step services
+            send: Delivers one JSON-serialisable message to the client
+            config: Overrides of DEFAULT_STREAM_CONFIG
+        """
+        self.service = service
+        self.config = dict(DEFAULT_STREAM_CONFIG, **(config or {}))
+        self._send = send
+        self._send_lock = threading.Lock()
+        self.source = RingBufferFrameSource(capacity=self.config['buffer_size'], decode_on_read=True)
+        self.audio_feed: Optional[AudioFeed] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._decided = set()
+        self._last_progress = 0.0
+        self.messages_rejected = 0
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def finished(self) -> bool:
+        return self._thread is not None and not self._thread.is_alive()
+
+    def send(self, message: Dict[str, Any]):
+        """Send a message; a closed connection only ends the reporting"""
+        try:
+            with self._send_lock:
+                self._send(message)
+        except Exception as e:
+            logger.debug(f"Liveness stream send failed: {e}")
+
+    def start(self, reference_image: Optional[str] = None,
+              reference_embedding: Optional[np.ndarray] = None,
+              audio_samplerate: Optional[int] = None):
+        """Start the shared analysis window on a background thread"""
+        if self.started:
+            return
+        self.audio_feed = AudioFeed(int(audio_samplerate or self.config['audio_samplerate']))
+        self._thread = threading.Thread(
+            target=self._run, args=(reference_image, reference_embedding),
+            name='liveness-stream', daemon=True
+        )
+        self._thread.start()
+
+    def _run(self, reference_image, reference_embedding):
+        try:
+            self.result = self.service.run_fused_liveness_detection(
+                reference_image,
+                frame_source=self.source,
+                on_step=self._on_step,
+                reference_embedding=reference_embedding,
+                on_frame=self._on_frame,
+                audio_feed=self.audio_feed
+            )
+        except Exception as e:
+            logger.error(f"Liveness stream failed: {e}")
+            self.result = {'success': False, 'is_live': False, 'confidence': 0.0, 'error': str(e)}
+        finally:
+            self.source.close()
+        self.result['stream'] = self.stats()
+        self.send({'type': 'verdict', 'result': self.result})
+
+    def _on_step(self, step_name: str, step_result: Dict[str, Any]):
+        self.send({'type': 'step', 'step': step_name, 'result': step_result})
+
+    def _on_frame(self, timestamp: float, analyzers: Dict[str, Any]):
+        """Report decisions immediately and running states at the progress interval"""
+        for name, analyzer in analyzers.items():
+            if name in self._decided or not analyzer.is_done(timestamp):
+                continue
+            self._decided.add(name)
+            try:
+                result = analyzer.final_result()
+            except Exception as e:
+                result = {'success': False, 'error': str(e)}
+            self.send({'type': 'decision', 'step': name, 't': round(timestamp, 2),
+                       'decision': analyzer.decision or 'window_complete', 'result': result})
+
+        now = time.monotonic()
+        if now - self._last_progress < self.config['progress_interval']:
+            return
+        self._last_progress = now
+        steps = {}
+        for name, analyzer in analyzers.items():
+            try:
+                steps[name] = analyzer.progress()
+            except Exception as e:
+                steps[name] = {'error': str(e)}
+        self.send({'type': 'progress', 't': round(timestamp, 2), 'frames': self.source.stats(), 'steps': steps})
+
+    def handle_binary(self, data: bytes):
+        """Route one binary message to the frame buffer or the audio feed"""
+        if len(data) > self.config['max_message_bytes']:
+            self.messages_rejected += 1
+            return
+        view = memoryview(data)
+        if view[:1] == bytes([AUDIO_TAG]):
+            if self.audio_feed is not None:
+                self.audio_feed.push(view[1:])
+            return
+        if view[:1] == bytes([FRAME_TAG]):
+            view = view[1:]
+        self.source.push(view)
+
+    def stop(self):
+        """End of the client's stream: the window ends once buffered frames are analysed"""
+        self.source.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the verdict; True once the session has finished"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.finished
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.source.stats()
+        stats['messages_rejected'] = self.messages_rejected
+        if self.audio_feed is not None:
+            stats['audio_chunks_dropped'] = self.audio_feed.chunks_dropped
+        return stats
+
+
+def parse_message(message) -> Optional[Dict[str, Any]]:
+    """Decode a client text message, or None if it is not a JSON object"""
+    try:
+        data = json.loads(message)
+    except (TypeError, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
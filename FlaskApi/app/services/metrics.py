@@ -0,0 +1,301 @@
+"""
+Metrics - Process-wide latency histograms and counters in Prometheus text format
+
+Hot paths record into fixed-bucket histograms: one ``perf_counter`` pair, a
+bisect over the bucket bounds and a short lock per observation, so the
+instrumentation costs a few microseconds per frame. ``render()`` writes
+everything in the Prometheus text exposition format for the ``/metrics``
+endpoint (see app/metrics.py).
+
+Each process keeps its own series; with several gunicorn or Celery workers,
+scrape every worker or aggregate in Prometheus.
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+DEFAULT_METRICS_CONFIG = {
+    'enabled': os.environ.get('METRICS_ENABLED', 'True').lower() == 'true',
+}
+
+# Seconds; stage timings range from sub-millisecond color conversions to
+# multi-second model calls on a cold CPU
+STAGE_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    """A named family of series keyed by label values"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The series for these label values, created on first use"""
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        lines.extend(self._samples())
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._children.clear()
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonic total (e.g. frames read); rates come from Prometheus ``rate()``"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(_Metric):
+    """Last observed value (e.g. model load time)"""
+
+    kind = 'gauge'
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def _samples(self):
+        for key, child in list(self._children.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(child.value)}'
+
+
+class _HistogramChild:
+    def __init__(self, bounds: Tuple[float, ...]):
+        self._bounds = bounds
+        # One slot per bound plus +Inf; cumulative counts are built on render
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self._bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self._counts), self._sum
+
+
+class Histogram(_Metric):
+    """Fixed-bucket latency distribution"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count and mean per series, keyed by the comma-joined label values"""
+        summary = {}
+        for key, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            count = sum(counts)
+            summary[','.join(key)] = {'count': count, 'mean': total / count if count else 0.0}
+        return summary
+
+    def _samples(self):
+        bounds = self.buckets + (float('inf'),)
+        for key, child in list(self._children.items()):
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                le = ('le', _format_value(bound))
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}'
+            labels = _format_labels(self.labelnames, key)
+            yield f'{self.name}_sum{labels} {_format_value(total)}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class StageTimer:
+    """Context manager that observes its block's wall time into a histogram series"""
+
+    __slots__ = ('_child', '_start')
+
+    def __init__(self, child: Optional[_HistogramChild]):
+        self._child = child
+        self._start = 0.0
+
+    def __enter__(self):
+        if self._child is not None:
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._child is not None:
+            self._child.observe(time.perf_counter() - self._start)
+        return False
+
+
+class MetricsRegistry:
+    """All metrics of this process, rendered together"""
+
+    def __init__(self, config: Optional[Dict] = None):
+        self.config = dict(DEFAULT_METRICS_CONFIG, **(config or {}))
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config['enabled']
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """Every metric in the Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        """Drop every recorded series (benchmarks start from a clean slate)"""
+        for metric in list(self._metrics.values()):
+            metric.clear()
+
+
+# Process-wide registry shared by all services
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.histogram(
+    'liveness_stage_seconds',
+    'Hot-path stage latency (decode, color_convert, face_detection, landmarks, facemesh, '
+    'depth, pnp, recognition, asr, db_commit)',
+    ['stage']
+)
+STEP_FRAME_SECONDS = metrics.histogram(
+    'liveness_step_frame_seconds', 'Time a liveness step spends analysing one frame', ['step']
+)
+REQUEST_SECONDS = metrics.histogram(
+    'http_request_seconds', 'HTTP request latency by endpoint', ['endpoint', 'method', 'status'],
+    buckets=REQUEST_BUCKETS
+)
+FRAMES_READ = metrics.counter(
+    'liveness_frames_read_total', 'Frames delivered by frame sources', ['source']
+)
+FRAMES_DROPPED = metrics.counter(
+    'liveness_frames_dropped_total', 'Frames captured or received but never analysed', ['source']
+)
+MODEL_LOAD_SECONDS = metrics.gauge(
+    'model_load_seconds', 'Time taken to load each registered model', ['model']
+)
+
+
+def stage_timer(stage: str) -> StageTimer:
+    """``with stage_timer('depth'):`` records the block into liveness_stage_seconds"""
+    if not metrics.enabled:
+        return StageTimer(None)
+    return StageTimer(STAGE_SECONDS.labels(stage))
+
+
+def step_timer(step: str) -> StageTimer:
+    """Records one analysed frame of a liveness step into liveness_step_frame_seconds"""
+    if not metrics.enabled:
+        return StageTimer(None)
+    return StageTimer(STEP_FRAME_SECONDS.labels(step))
+
+
+def observe_stage(stage: str, seconds: float):
+    if metrics.enabled:
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+def count_frames(counter: Counter, source: str, amount: float = 1.0):
+    if metrics.enabled and amount:
+        counter.labels(source).inc(amount)
@@ -2,15 +2,28 @@
 MiDaS Liveness Service - Wrapper for 2D/3D liveness detection functionality
 """
 
+import copy
 import cv2
 import numpy as np
 import logging
 import os
 import sys
 import time
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from collections import deque
 
+from .batch_scheduler import DEFAULT_BATCHING_CONFIG, MicroBatcher
+from .depth_backends import (
+    DEFAULT_INT8_ONNX_PATH, DEFAULT_ONNX_PATH, DEPTH_MODEL_NAME, DepthBackend, OnnxDepthBackend, TorchDepthBackend,
+    check_parity, export_midas_onnx, load_torch_midas, synthetic_parity_frames
+)
+from .frame_context import FrameContext, FrameContextCache
+from .liveness_pipeline import FrameAnalyzer
+from .metrics import stage_timer
+from .model_registry import ModelPool, model_registry
+from .rate_scheduler import DEFAULT_SCHEDULING_CONFIG, RateScheduler
+from .streaming_stats import WindowedStats
+
 # Add the flask-api directory to the path to import existing modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
 flask_api_dir = os.path.dirname(os.path.dirname(current_dir))
@@ -18,54 +31,221 @@ sys.path.insert(0, flask_api_dir)
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_FACE_MESH_POOL_CONFIG = {
+    # FaceMesh instances per process; each analysis run holds one, so this
+    # bounds the concurrent MiDaS steps (further runs wait for a free one)
+    'size': int(os.environ.get('FACE_MESH_POOL_SIZE', 4)),
+    # Seconds a run waits for a free instance before failing the step
+    'timeout': float(os.environ.get('FACE_MESH_POOL_TIMEOUT', 30)),
+}
+
+DEFAULT_DEPTH_ROI_CONFIG = {
+    'enabled': os.environ.get('MIDAS_FACE_ROI', 'False').lower() == 'true',
+    # Padding around the FaceMesh box, as a fraction of its size
+    'padding': 0.25,
+    # Re-estimate the crop -> full-frame depth scale every N ROI frames (0 = only
+    # once). Until a calibration succeeds depth runs on the full frame, and a
+    # failed attempt is retried after this many frames (30 when 0).
+    'calibration_interval': 30,
+    'calibration_alpha': 0.2,
+}
+
+DEFAULT_HEAD_MOTION_CONFIG = {
+    # Require natural head motion (variance of yaw/pitch/roll) for a live vote
+    'enabled': True,
+    # Pose samples the variance is taken over
+    'window': 10,
+    # Motion variances averaged into the smoothed value
+    'smoothing_window': 10,
+    'min_samples': 3,
+    # Base threshold on yaw + pitch + roll variance (deg^2), scaled by contrast
+    'threshold': 0.2,
+}
+
+def _reset_face_mesh(face_mesh):
+    """Drop the tracked face before a pooled FaceMesh serves another session"""
+    reset = getattr(face_mesh, 'reset', None)
+    if reset is not None:
+        reset()
+
+
 class MidasLivenessService:
     """Service for 2D/3D liveness detection using MiDaS depth estimation"""
     
-    def __init__(self):
+    def __init__(self, backend: Optional[str] = None, onnx_path: Optional[str] = None):
+        """
+        Args:
+            backend: Depth inference engine, 'torch', 'onnx' or 'onnx_int8'
+                (defaults to the MIDAS_BACKEND environment variable, then 'torch')
+            onnx_path: ONNX model for the 'onnx' / 'onnx_int8' backends
+        """
         self.model_loaded = False
         self.midas = None
         self.transforms = None
         self.transform = None
-        self.face_mesh = None
+        self.torch = None
+        self._face_mesh_loader = None
         self.device = None
+        self.model_key = None
+        self.backend = backend or os.environ.get('MIDAS_BACKEND', 'torch')
+        if self.backend == 'onnx_int8':
+            self.onnx_path = onnx_path or os.environ.get('MIDAS_INT8_ONNX_PATH', DEFAULT_INT8_ONNX_PATH)
+        else:
+            self.onnx_path = onnx_path or os.environ.get('MIDAS_ONNX_PATH', DEFAULT_ONNX_PATH)
+        self.depth_backend: Optional[DepthBackend] = None
+        # Cross-request micro-batching of MiDaS forward passes
+        self.batching_config = dict(DEFAULT_BATCHING_CONFIG)
+        # Run depth on the padded face region instead of the full frame
+        self.depth_roi_config = dict(DEFAULT_DEPTH_ROI_CONFIG)
+        # Per-component rates (depth / FaceMesh / PnP) inside the analyzer
+        self.scheduling_config = copy.deepcopy(DEFAULT_SCHEDULING_CONFIG)
+        # Streaming head-motion variance check
+        self.head_motion_config = dict(DEFAULT_HEAD_MOTION_CONFIG)
         self._load_models()
     
+    def _ort_threads(self) -> Dict[str, int]:
+        return {
+            'intra_op_threads': int(os.environ.get('ORT_INTRA_OP_THREADS', 0)),
+            'inter_op_threads': int(os.environ.get('ORT_INTER_OP_THREADS', 0))
+        }
+    
+    def _load_int8_backend(self) -> OnnxDepthBackend:
+        """Quantized model; produced and evaluated offline, never on the fly"""
+        if not os.path.exists(self.onnx_path):
+            raise FileNotFoundError(f"No INT8 depth model at {self.onnx_path}; run quantize_midas_onnx.py first")
+        return OnnxDepthBackend(self.onnx_path, **self._ort_threads())
+    
+    def _load_onnx_backend(self) -> DepthBackend:
+        """
+        ONNX Runtime session, exporting the model first if it is not stored yet
+        
+        A fresh export is checked against torch; if it drifts beyond tolerance
+        the file is discarded and this process serves depth with torch instead.
+        """
+        exported = False
+        if not os.path.exists(self.onnx_path):
+            logger.info(f"No ONNX depth model at {self.onnx_path}; exporting {DEPTH_MODEL_NAME} once")
+            export_midas_onnx(self.onnx_path)
+            exported = True
+        
+        backend = OnnxDepthBackend(self.onnx_path, **self._ort_threads())
+        
+        if exported:
+            # torch.hub is already loaded for the export, so check parity now
+            model, transform = load_torch_midas('cpu')
+            reference = TorchDepthBackend(model, transform, 'cpu')
+            parity = check_parity(reference, backend, synthetic_parity_frames())
+            logger.info(f"ONNX depth parity vs torch: {parity}")
+            if not parity['within_tolerance']:
+                logger.error(f"ONNX export of {DEPTH_MODEL_NAME} differs from torch beyond tolerance; "
+                             f"removing {self.onnx_path} and using torch")
+                try:
+                    os.remove(self.onnx_path)
+                except OSError:
+                    pass
+                return reference
+        return backend
+    
     def _load_models(self):
         """Load MiDaS and MediaPipe models"""
         try:
-            import torch
             import mediapipe as mp
             
-            # MiDaS configuration
-            DEPTH_MODEL_NAME = "MiDaS_small"
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+            # MiDaS (shared across service instances)
+            if self.backend == 'onnx':
+                self.device = "cpu"
+                self.model_key = f"midas_onnx:{self.onnx_path}"
+                self.depth_backend = model_registry.get(self.model_key, self._load_onnx_backend)
+            elif self.backend == 'onnx_int8':
+                self.device = "cpu"
+                self.model_key = f"midas_onnx:{self.onnx_path}"
+                self.depth_backend = model_registry.get(self.model_key, self._load_int8_backend)
+            elif self.backend == 'torch':
+                import torch
+                self.device = "cuda" if torch.cuda.is_available() else "cpu"
+                
+                def load_midas():
+                    return torch.hub.load("intel-isl/MiDaS", DEPTH_MODEL_NAME).to(self.device).eval()
+                
+                self.model_key = f"midas_{DEPTH_MODEL_NAME}:{self.device}"
+                self.midas = model_registry.get(self.model_key, load_midas)
+                self.transforms = model_registry.get(
+                    "midas_transforms",
+                    lambda: torch.hub.load("intel-isl/MiDaS", "transforms")
+                )
+                self.transform = self.transforms.small_transform if DEPTH_MODEL_NAME.endswith("small") else self.transforms.default_transform
+                self.torch = torch
+                self.depth_backend = TorchDepthBackend(self.midas, self.transform, self.device)
+            else:
+                raise ValueError(f"Unknown MiDaS backend: {self.backend}")
             
-            # Load MiDaS model
-            self.midas = torch.hub.load("intel-isl/MiDaS", DEPTH_MODEL_NAME).to(self.device).eval()
-            self.transforms = torch.hub.load("intel-isl/MiDaS", "transforms")
-            self.transform = self.transforms.small_transform if DEPTH_MODEL_NAME.endswith("small") else self.transforms.default_transform
+            # Load MediaPipe FaceMesh. FaceMesh keeps tracking state between
+            # frames, so each run leases its own instance from a pool.
+            def load_face_mesh():
+                mp_face_mesh = mp.solutions.face_mesh
+                return mp_face_mesh.FaceMesh(
+                    static_image_mode=False,
+                    max_num_faces=1,
+                    refine_landmarks=True,
+                    min_detection_confidence=0.5,
+                    min_tracking_confidence=0.5,
+                )
             
-            # Load MediaPipe FaceMesh
-            mp_face_mesh = mp.solutions.face_mesh
-            self.face_mesh = mp_face_mesh.FaceMesh(
-                static_image_mode=False,
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5,
-            )
+            self._face_mesh_loader = load_face_mesh
+            # Load the first instance now so a broken install fails here, not mid-run
+            pool = self.face_mesh_pool
+            pool.release(pool.acquire())
             
             self.model_loaded = True
-            logger.info("MiDaS and MediaPipe models loaded successfully")
+            logger.info(f"MiDaS ({self.backend}) and MediaPipe models loaded successfully")
             
         except Exception as e:
             logger.error(f"Failed to load MiDaS/MediaPipe models: {e}")
             self.model_loaded = False
     
+    @property
+    def face_mesh_pool(self) -> Optional[ModelPool]:
+        """Process-wide pool of FaceMesh instances, leased one per run"""
+        if self._face_mesh_loader is None:
+            return None
+        return model_registry.pool("mediapipe_face_mesh", self._face_mesh_loader,
+                                   size=DEFAULT_FACE_MESH_POOL_CONFIG['size'],
+                                   reset=_reset_face_mesh,
+                                   timeout=DEFAULT_FACE_MESH_POOL_CONFIG['timeout'])
+    
     def is_model_loaded(self) -> bool:
         """Check if model is loaded"""
         return self.model_loaded
     
+    @property
+    def depth_batcher_key(self) -> Optional[str]:
+        """Registry key of the MiDaS batcher for the current config, or None when batching is disabled"""
+        config = self.batching_config
+        if not config.get('enabled'):
+            return None
+        return f"batcher:{self.model_key}:{config['max_batch_size']}:{config['max_wait_ms']}"
+    
+    @property
+    def depth_batcher(self) -> Optional[MicroBatcher]:
+        """Process-wide MiDaS batcher, or None when batching is disabled"""
+        key = self.depth_batcher_key
+        if key is None:
+            return None
+        max_batch_size, max_wait_ms = self.batching_config['max_batch_size'], self.batching_config['max_wait_ms']
+        return model_registry.get(
+            key,
+            lambda: MicroBatcher(self.depth_backend.infer, max_batch_size, max_wait_ms, name='midas')
+        )
+    
+    def estimate_depth(self, rgb: np.ndarray) -> np.ndarray:
+        """Relative inverse depth map (model resolution) for one RGB frame"""
+        with stage_timer('depth'):
+            inp = self.depth_backend.prepare(rgb)
+            batcher = self.depth_batcher
+            if batcher is not None:
+                return batcher(inp)
+            return self.depth_backend.infer([inp])[0]
+    
     def rotation_matrix_to_euler_angles(self, R):
         """Convert rotation matrix to Euler angles"""
         sy = np.sqrt(R[0,0]*R[0,0] + R[1,0]*R[1,0])
@@ -107,32 +287,61 @@ class MidasLivenessService:
         return combined_score, depth_range
     
     def liveness_decision(self, depth_std_face, reproj_err, yaw, pitch, roll, depth_roi, face_size, 
-                         depth_thresh=3.0, motion_thresh=0.2):
-        """Enhanced liveness decision with confidence scoring"""
+                         depth_thresh=3.0, motion_thresh=0.2, motion_var=None):
+        """
+        Enhanced liveness decision with confidence scoring
+        
+        ``motion_var`` is the smoothed yaw + pitch + roll variance; None skips
+        the motion check (neutral motion confidence).
+        """
         # Individual condition checks
         cond_depth = depth_std_face > depth_thresh
         cond_pnp = reproj_err < 12.0  # REPROJ_ERR_THRESH
-        cond_motion = True  # Simplified for API mode
         
         # Confidence scoring (0-1 range)
         depth_conf = min(1.0, depth_std_face / (depth_thresh * 2))
         pnp_conf = max(0.0, 1.0 - (reproj_err / 12.0))
-        motion_conf = 0.5  # Default motion confidence for API mode
+        if motion_var is None:
+            cond_motion = True
+            motion_conf = 0.5
+        else:
+            cond_motion = motion_var > motion_thresh
+            motion_conf = min(1.0, motion_var / (motion_thresh * 2))
         
         # Combined confidence score
         total_confidence = (depth_conf * 0.4 + pnp_conf * 0.3 + motion_conf * 0.3)
         
         # Final decision with confidence threshold
-        is_live = (cond_depth and cond_pnp) and (total_confidence > 0.7)
+        is_live = (cond_depth and cond_pnp and cond_motion) and (total_confidence > 0.7)
         
         return is_live, cond_depth, cond_pnp, total_confidence
     
-    def run_liveness_check(self, camera, duration: int = 5, display: bool = False) -> Dict[str, Any]:
+    def create_context_cache(self) -> FrameContextCache:
+        """Per-frame artifact cache that leases a FaceMesh from the pool on first use"""
+        return FrameContextCache(face_mesh=self.face_mesh_pool)
+    
+    def create_analyzer(self, duration: Optional[float] = None, max_fps: Optional[float] = None,
+                        display: bool = False, context_cache: Optional[FrameContextCache] = None,
+                        early_stop: Optional[Dict[str, Any]] = None) -> 'MidasLivenessAnalyzer':
+        """
+        Create an incremental depth + head pose analyzer for the fused pipeline
+        
+        Without a shared ``context_cache`` the analyzer gets its own, and its
+        stop() returns the FaceMesh that cache leased.
+        """
+        analyzer = MidasLivenessAnalyzer(self, duration=duration, max_fps=max_fps, display=display,
+                                         context_cache=context_cache or self.create_context_cache(),
+                                         early_stop=early_stop)
+        analyzer.owns_context_cache = context_cache is None
+        return analyzer
+    
+    def run_liveness_check(self, camera, duration: int = 5, display: bool = False,
+                           early_stop: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Run 2D/3D liveness check using MiDaS depth estimation and head pose analysis
         
         Args:
-            camera: Camera object with get_frame() method
+            camera: FrameSource (device, video file, image sequence or ring buffer)
             duration: Duration to run check in seconds
             display: Whether to show visual feedback
             
@@ -148,157 +357,37 @@ class MidasLivenessService:
             }
         
         try:
-            # 3D model points (for PnP)
-            MODEL_POINTS = np.array([
-                (0.0,   0.0,    0.0),     # Nose tip
-                (0.0, -63.6,  -12.5),     # Chin
-                (-43.3, 32.7, -26.0),     # Left eye outer
-                (43.3,  32.7, -26.0),     # Right eye outer
-                (-28.9,-28.9, -24.1),     # Mouth left
-                (28.9, -28.9, -24.1),     # Mouth right
-            ], dtype=np.float32)
-            
-            IDX_NOSE_TIP, IDX_CHIN, IDX_LEFT_EYE_O, IDX_RIGHT_EYE_O, IDX_MOUTH_L, IDX_MOUTH_R = 1, 152, 33, 263, 61, 291
-            SEL_IDX = [IDX_NOSE_TIP, IDX_CHIN, IDX_LEFT_EYE_O, IDX_RIGHT_EYE_O, IDX_MOUTH_L, IDX_MOUTH_R]
+            analyzer = self.create_analyzer(duration=duration, display=display, early_stop=early_stop)
+            analyzer.start()
             
-            # History for decision
-            live_votes = deque(maxlen=int(duration * 30))  # ~30fps * duration
-            depth_history = deque(maxlen=5)  # for depth smoothing
-            motion_history = deque(maxlen=10)  # for motion smoothing
-            
-            start_time = time.time()
-            frame_count = 0
-            confidence_scores = []
-            
-            logger.info(f"Starting {duration}-second 2D/3D liveness check...")
-            
-            while time.time() - start_time < duration:
-                frame = camera.get_frame()
-                if frame is None:
-                    continue
-                
-                frame_count += 1
-                h, w = frame.shape[:2]
-                
-                # Depth estimation (MiDaS)
-                rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                inp = self.transform(rgb).to(self.device)
-                
-                with torch.no_grad():
-                    depth = self.midas(inp).squeeze().cpu().numpy()
-                
-                depth_norm = cv2.normalize(depth, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-                depth_color = cv2.applyColorMap(depth_norm, cv2.COLORMAP_MAGMA)
+            try:
+                start_time = camera.clock()
                 
-                # Adaptive lighting analysis
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                brightness = np.mean(gray)
-                contrast = np.std(gray)
+                logger.info(f"Starting {duration}-second 2D/3D liveness check...")
                 
-                # Adjust thresholds based on lighting conditions
-                adaptive_depth_thresh = 3.0 * (0.8 + 0.4 * (brightness / 128.0))
-                
-                # Landmarks (MediaPipe)
-                results = self.face_mesh.process(rgb)
-                depth_std_face, reproj_err, yaw, pitch, roll = 0.0, 1e9, 0.0, 0.0, 0.0
-                depth_roi = np.array([])
-                face_size = 0
-
-                if results.multi_face_landmarks:
-                    lm = results.multi_face_landmarks[0].landmark
-                    pts_2d = np.array([[int(lm[idx].x*w), int(lm[idx].y*h)] for idx in SEL_IDX], dtype=np.float32)
-
-                    cam_mat = np.array([[w,0,w/2],[0,w,h/2],[0,0,1]], dtype=np.float32)
-                    dist = np.zeros((4,1), dtype=np.float32)
-                    success, rvec, tvec = cv2.solvePnP(MODEL_POINTS, pts_2d, cam_mat, dist, flags=cv2.SOLVEPNP_ITERATIVE)
+                while not analyzer.is_done(camera.clock() - start_time):
+                    frame = camera.get_frame()
+                    if frame is None:
+                        if camera.exhausted:
+                            break
+                        continue
                     
-                    if success:
-                        proj, _ = cv2.projectPoints(MODEL_POINTS, rvec, tvec, cam_mat, dist)
-                        reproj_err = float(np.linalg.norm(proj.reshape(-1,2) - pts_2d, axis=1).mean())
-                        R, _ = cv2.Rodrigues(rvec)
-                        yaw, pitch, roll = self.rotation_matrix_to_euler_angles(R)
-                        
-                        if display:
-                            self.draw_axes(frame, cam_mat, dist, rvec, tvec, 70)
-
-                    # Enhanced face region detection
-                    xs, ys = [int(l.x*w) for l in lm], [int(l.y*h) for l in lm]
-                    x1,y1 = max(min(xs)-20,0), max(min(ys)-20,0)
-                    x2,y2 = min(max(xs)+20,w-1), min(max(ys)+20,h-1)
+                    analyzer.feed_frame(frame, camera.clock() - start_time)
                     
-                    face_size = max(x2-x1, y2-y1)
-                    
-                    # Extract depth ROI
-                    if face_size >= 100:  # MIN_FACE_SIZE
-                        center_x, center_y = (x1+x2)//2, (y1+y2)//2
-                        roi_size = min(face_size//2, min(w,h)//4)
-                        roi_x1 = max(center_x - roi_size//2, 0)
-                        roi_y1 = max(center_y - roi_size//2, 0)
-                        roi_x2 = min(center_x + roi_size//2, w-1)
-                        roi_y2 = min(center_y + roi_size//2, h-1)
-                        
-                        depth_roi = depth[roi_y1:roi_y2, roi_x1:roi_x2]
-                        if depth_roi.size > 0:
-                            depth_std_face = float(np.std(depth_roi))
-                        
-                        if display:
-                            cv2.rectangle(frame, (roi_x1, roi_y1), (roi_x2, roi_y2), (255,100,100), 2)
-                    else:
-                        roi = depth[y1:y2, x1:x2]
-                        if roi.size > 0:
-                            depth_std_face = float(np.std(roi))
-                        depth_roi = roi
-
                     if display:
-                        for (x,y) in pts_2d.astype(int):
-                            cv2.circle(frame, (x,y), 2, (0,255,255), -1)
-                        cv2.rectangle(frame, (x1,y1), (x2,y2), (255,0,0), 1)
-
-                # Decision vote
-                live, ok_depth, ok_pnp, confidence = self.liveness_decision(
-                    depth_std_face, reproj_err, yaw, pitch, roll, depth_roi, face_size,
-                    depth_thresh=adaptive_depth_thresh
-                )
-                live_votes.append(live)
-                confidence_scores.append(confidence)
-                
-                if display:
-                    status = "CHECKING ⏳" if len(live_votes) < 30 else ("LIVE ✅" if live else "SPOOF ❌")
-                    color = (0,255,255) if len(live_votes) < 30 else ((0,255,0) if live else (0,0,255))
-                    cv2.putText(frame, status, (10,30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
-                    cv2.putText(frame, f"DepthStd: {depth_std_face:.2f}", (10,60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 2)
-                    cv2.putText(frame, f"ReprojErr: {reproj_err:.2f}px", (10,85), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 2)
-                    cv2.putText(frame, f"Confidence: {confidence:.2f}", (10,110), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,255), 2)
-                    
-                    cv2.imshow("Liveness: MiDaS + PnP", frame)
-                    cv2.imshow("Depth Map", depth_color)
+                        cv2.imshow("Liveness: MiDaS + PnP", frame)
+                        cv2.imshow("Depth Map", analyzer.depth_color)
 
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                        if cv2.waitKey(1) & 0xFF == ord('q'):
+                            break
+            finally:
+                # Returns the leased FaceMesh
+                analyzer.stop()
             
             if display:
                 cv2.destroyAllWindows()
             
-            # Calculate final results
-            if len(live_votes) == 0:
-                final_live = False
-                final_confidence = 0.0
-            else:
-                final_live = (sum(live_votes) / len(live_votes)) > 0.6
-                final_confidence = np.mean(confidence_scores) if confidence_scores else 0.0
-            
-            logger.info(f"2D/3D liveness check completed - Live vote ratio: {sum(live_votes)}/{len(live_votes)} ({(sum(live_votes)/len(live_votes)*100):.1f}%)")
-            
-            return {
-                'success': final_live,
-                'confidence': float(final_confidence),
-                'live_votes': sum(live_votes),
-                'total_votes': len(live_votes),
-                'frames_processed': frame_count,
-                'avg_depth_std': float(np.mean([d for d in [depth_std_face] if d > 0])) if 'depth_std_face' in locals() else 0.0,
-                'avg_reproj_err': float(np.mean([r for r in [reproj_err] if r < 1e8])) if 'reproj_err' in locals() else 0.0,
-                'message': '2D/3D liveness check completed successfully' if final_live else '2D/3D liveness check failed'
-            }
+            return analyzer.final_result()
             
         except Exception as e:
             logger.error(f"2D/3D liveness check failed: {e}")
@@ -308,3 +397,366 @@ class MidasLivenessService:
                 'message': f'2D/3D liveness check failed: {str(e)}',
                 'error': str(e)
             }
+
+
+class MidasLivenessAnalyzer(FrameAnalyzer):
+    """Per-frame depth variation and head pose voting"""
+    
+    name = 'midas_liveness'
+    
+    # 3D model points (for PnP)
+    MODEL_POINTS = np.array([
+        (0.0,   0.0,    0.0),     # Nose tip
+        (0.0, -63.6,  -12.5),     # Chin
+        (-43.3, 32.7, -26.0),     # Left eye outer
+        (43.3,  32.7, -26.0),     # Right eye outer
+        (-28.9,-28.9, -24.1),     # Mouth left
+        (28.9, -28.9, -24.1),     # Mouth right
+    ], dtype=np.float32)
+    
+    IDX_NOSE_TIP, IDX_CHIN, IDX_LEFT_EYE_O, IDX_RIGHT_EYE_O, IDX_MOUTH_L, IDX_MOUTH_R = 1, 152, 33, 263, 61, 291
+    SEL_IDX = np.array([IDX_NOSE_TIP, IDX_CHIN, IDX_LEFT_EYE_O, IDX_RIGHT_EYE_O, IDX_MOUTH_L, IDX_MOUTH_R])
+    
+    def __init__(self, service: MidasLivenessService, duration: Optional[float] = None,
+                 max_fps: Optional[float] = None, display: bool = False,
+                 context_cache: Optional[FrameContextCache] = None,
+                 early_stop: Optional[Dict[str, Any]] = None):
+        super().__init__(duration=duration, max_fps=max_fps, context_cache=context_cache,
+                         early_stop=early_stop)
+        self.service = service
+        self.display = display
+        # Set by create_analyzer when the cache is private to this analyzer
+        self.owns_context_cache = False
+        
+        # History for decision
+        self.live_votes = deque(maxlen=int((duration or 5) * 30))  # ~30fps * duration
+        self.confidence_scores = []
+        self.depth_std_values = []
+        self.reproj_errors = []
+        self.depth_color = None
+        # Per-frame inputs and outcome of the last liveness vote
+        self.last_measurement = None
+        # Face-ROI depth mode
+        self._last_face_box = None
+        self.roi_frames = 0
+        self.roi_calibrations = 0
+        self.roi_calibration_failures = 0
+        self._roi_uncalibrated_frames = 0
+        self.roi_depth_scale = 1.0
+        # Temporal subsampling: last result of each component, carried forward
+        # on frames where the scheduler skips it
+        self.scheduler = RateScheduler.from_config(service.scheduling_config)
+        self.depth_frames = 0
+        self._last_landmarks = None
+        self._last_depth = None
+        self._last_pose = None
+        # Head motion: windowed pose variance, smoothed over recent frames
+        motion_config = service.head_motion_config
+        self._pose_stats = WindowedStats(motion_config.get('window', 10), dims=3)
+        self._motion_smoothing = WindowedStats(motion_config.get('smoothing_window', 10))
+        self.motion_var = 0.0
+        self.motion_values = []
+    
+    def _face_box(self, points: np.ndarray, w: int, h: int) -> Tuple[int, int, int, int]:
+        """FaceMesh bounding box with a 20px margin, in frame coordinates"""
+        pixels = points.astype(np.int32)
+        (min_x, min_y), (max_x, max_y) = pixels.min(axis=0), pixels.max(axis=0)
+        x1,y1 = max(int(min_x)-20,0), max(int(min_y)-20,0)
+        x2,y2 = min(int(max_x)+20,w-1), min(int(max_y)+20,h-1)
+        return x1, y1, x2, y2
+    
+    def _depth_crop_box(self, face_box, w: int, h: int) -> Optional[Tuple[int, int, int, int]]:
+        """Padded face region the depth model runs on in face-ROI mode"""
+        x1, y1, x2, y2 = face_box
+        pad = self.service.depth_roi_config.get('padding', 0.25)
+        px, py = int((x2 - x1) * pad), int((y2 - y1) * pad)
+        cx1, cy1 = max(x1 - px, 0), max(y1 - py, 0)
+        cx2, cy2 = min(x2 + px, w), min(y2 + py, h)
+        if cx2 - cx1 < 32 or cy2 - cy1 < 32:
+            return None
+        return cx1, cy1, cx2, cy2
+    
+    def _depth_region(self, depth: np.ndarray, region, crop_box=None) -> np.ndarray:
+        """
+        Depth values for a frame-coordinate region
+        
+        Full-frame depth is sliced with frame coordinates as before; crop
+        depth is sliced after mapping the region into the crop's depth map.
+        """
+        x1, y1, x2, y2 = region
+        if crop_box is None:
+            return depth[y1:y2, x1:x2]
+        cx1, cy1, cx2, cy2 = crop_box
+        sx = depth.shape[1] / float(cx2 - cx1)
+        sy = depth.shape[0] / float(cy2 - cy1)
+        dx1, dx2 = int(max(x1 - cx1, 0) * sx), int(min(x2 - cx1, cx2 - cx1) * sx)
+        dy1, dy2 = int(max(y1 - cy1, 0) * sy), int(min(y2 - cy1, cy2 - cy1) * sy)
+        return depth[dy1:dy2, dx1:dx2]
+    
+    def _calibrate_roi_scale(self, full_depth: np.ndarray, crop_depth: np.ndarray, region, crop_box) -> bool:
+        """
+        Track the ratio between full-frame and crop depth variation
+        
+        MiDaS depth is relative to each input, so a face filling the crop
+        yields different magnitudes than the same face in the full frame.
+        Every few frames both are run and the ratio of the ROI standard
+        deviations updates a running scale applied to crop stats.
+        
+        Returns:
+            False if either region has no depth variation to compare
+        """
+        full_std = float(np.std(self._depth_region(full_depth, region)))
+        crop_std = float(np.std(self._depth_region(crop_depth, region, crop_box)))
+        if full_std <= 0 or crop_std <= 0:
+            self.roi_calibration_failures += 1
+            return False
+        ratio = full_std / crop_std
+        alpha = self.service.depth_roi_config.get('calibration_alpha', 0.2)
+        if self.roi_calibrations == 0:
+            self.roi_depth_scale = ratio
+        else:
+            self.roi_depth_scale = (1 - alpha) * self.roi_depth_scale + alpha * ratio
+        self.roi_calibrations += 1
+        return True
+    
+    def _depth_std(self, rgb: np.ndarray, w: int, h: int, face_box, region) -> Tuple[float, np.ndarray]:
+        """
+        Run MiDaS for this frame and measure the depth variation in ``region``
+        
+        In face-ROI mode depth runs on the padded face region (current
+        landmarks, else the previous frame's), otherwise on the full frame.
+        Crop stats need a calibrated scale, so until the first calibration
+        succeeds the full frame is used and the crop only runs on attempt
+        frames (the first, then every ``calibration_interval``).
+        """
+        service = self.service
+        interval = service.depth_roi_config.get('calibration_interval', 30)
+        crop_box = None
+        if service.depth_roi_config.get('enabled'):
+            box = face_box or self._last_face_box
+            if box is not None:
+                crop_box = self._depth_crop_box(box, w, h)
+        
+        if crop_box is not None and self.roi_calibrations == 0:
+            depth = service.estimate_depth(rgb)
+            retry = interval or 30
+            if region is not None and self._roi_uncalibrated_frames % retry == 0:
+                cx1, cy1, cx2, cy2 = crop_box
+                crop_depth = service.estimate_depth(np.ascontiguousarray(rgb[cy1:cy2, cx1:cx2]))
+                self._calibrate_roi_scale(depth, crop_depth, region, crop_box)
+            self._roi_uncalibrated_frames += 1
+            crop_box = None
+        elif crop_box is not None:
+            cx1, cy1, cx2, cy2 = crop_box
+            depth = service.estimate_depth(np.ascontiguousarray(rgb[cy1:cy2, cx1:cx2]))
+            self.roi_frames += 1
+        else:
+            depth = service.estimate_depth(rgb)
+        self.depth_frames += 1
+        
+        if self.display:
+            depth_norm = cv2.normalize(depth, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+            self.depth_color = cv2.applyColorMap(depth_norm, cv2.COLORMAP_MAGMA)
+        
+        depth_std_face, depth_roi = 0.0, np.array([])
+        if region is not None:
+            depth_roi = self._depth_region(depth, region, crop_box)
+            if crop_box is not None and depth_roi.size > 0:
+                if interval and self.roi_frames % interval == 0:
+                    self._calibrate_roi_scale(service.estimate_depth(rgb), depth, region, crop_box)
+                # Express crop depth in full-frame units so the thresholds apply unchanged
+                depth_roi = depth_roi * self.roi_depth_scale
+            if depth_roi.size > 0:
+                depth_std_face = float(np.std(depth_roi))
+        return depth_std_face, depth_roi
+    
+    def _head_pose(self, frame: np.ndarray, pts_2d: np.ndarray, w: int, h: int) -> Tuple[float, float, float, float]:
+        """PnP reprojection error and (yaw, pitch, roll) from the selected landmarks"""
+        cam_mat = np.array([[w,0,w/2],[0,w,h/2],[0,0,1]], dtype=np.float32)
+        dist = np.zeros((4,1), dtype=np.float32)
+        with stage_timer('pnp'):
+            success, rvec, tvec = cv2.solvePnP(self.MODEL_POINTS, pts_2d, cam_mat, dist, flags=cv2.SOLVEPNP_ITERATIVE)
+            if not success:
+                return 1e9, 0.0, 0.0, 0.0
+            proj, _ = cv2.projectPoints(self.MODEL_POINTS, rvec, tvec, cam_mat, dist)
+        reproj_err = float(np.linalg.norm(proj.reshape(-1,2) - pts_2d, axis=1).mean())
+        R, _ = cv2.Rodrigues(rvec)
+        yaw, pitch, roll = self.service.rotation_matrix_to_euler_angles(R)
+        
+        if self.display:
+            self.service.draw_axes(frame, cam_mat, dist, rvec, tvec, 70)
+        return reproj_err, yaw, pitch, roll
+    
+    def _update_motion(self, yaw: float, pitch: float, roll: float) -> float:
+        """Add a fresh head pose and return the smoothed motion variance (O(1))"""
+        self._pose_stats.push((yaw, pitch, roll))
+        if self._pose_stats.count < self.service.head_motion_config.get('min_samples', 3):
+            return 0.0
+        motion_var = float(self._pose_stats.variance.sum())
+        self._motion_smoothing.push(motion_var)
+        if self._motion_smoothing.count >= 3:
+            motion_var = float(self._motion_smoothing.mean[0])
+        return motion_var
+    
+    def _due(self, name: str, timestamp: float) -> bool:
+        return self.scheduler is None or self.scheduler.due(name, timestamp)
+    
+    def process(self, ctx: FrameContext):
+        """Estimate depth and head pose for one frame and cast a liveness vote"""
+        service = self.service
+        frame = ctx.frame
+        h, w = frame.shape[:2]
+        started = time.perf_counter()
+        
+        # Landmarks (MediaPipe) as an (N, 2) pixel array; between scheduled
+        # runs the last landmarks are reused
+        if self._due('facemesh', ctx.timestamp):
+            points = self._last_landmarks = ctx.get('facemesh_points')
+        else:
+            points = self._last_landmarks
+        face_box = self._face_box(points, w, h) if points is not None else None
+        
+        # Adaptive lighting analysis
+        gray = ctx.gray
+        mean, std = cv2.meanStdDev(gray)
+        brightness, contrast = float(mean[0][0]), float(std[0][0])
+        
+        # Adjust thresholds based on lighting conditions
+        adaptive_depth_thresh = 3.0 * (0.8 + 0.4 * (brightness / 128.0))
+        motion_config = service.head_motion_config
+        adaptive_motion_thresh = motion_config.get('threshold', 0.2) * (0.7 + 0.6 * (contrast / 64.0))
+        
+        reproj_err, yaw, pitch, roll = 1e9, 0.0, 0.0, 0.0
+        face_size = 0
+        region = None
+        pts_2d = None
+        
+        if points is not None:
+            # Enhanced face region detection
+            x1, y1, x2, y2 = face_box
+            face_size = max(x2-x1, y2-y1)
+            
+            # Depth ROI: central face area for large faces, whole box otherwise
+            if face_size >= 100:  # MIN_FACE_SIZE
+                center_x, center_y = (x1+x2)//2, (y1+y2)//2
+                roi_size = min(face_size//2, min(w,h)//4)
+                region = (max(center_x - roi_size//2, 0), max(center_y - roi_size//2, 0),
+                          min(center_x + roi_size//2, w-1), min(center_y + roi_size//2, h-1))
+            else:
+                region = (x1, y1, x2, y2)
+        
+        # Depth estimation (MiDaS): the slowest and slowest-changing signal, so
+        # between scheduled runs the last depth measurement is carried forward
+        if self._due('depth', ctx.timestamp) or self._last_depth is None:
+            self._last_depth = self._depth_std(ctx.rgb, w, h, face_box, region)
+        depth_std_face, depth_roi = self._last_depth
+        if face_box is not None:
+            self._last_face_box = face_box
+        
+        # Head pose (PnP); carried forward between scheduled runs
+        if points is not None:
+            if self._due('pnp', ctx.timestamp) or self._last_pose is None:
+                # Whole-pixel points, as the PnP thresholds were tuned on
+                pts_2d = points[self.SEL_IDX].astype(np.int32).astype(np.float32)
+                self._last_pose = self._head_pose(frame, pts_2d, w, h)
+                # Only fresh poses count as motion samples; carried-forward
+                # poses would read as a perfectly still head
+                if self._last_pose[0] < 1e8:
+                    self.motion_var = self._update_motion(*self._last_pose[1:])
+            reproj_err, yaw, pitch, roll = self._last_pose
+        
+        if self.display and points is not None:
+            x1, y1, x2, y2 = face_box
+            if face_size >= 100:
+                cv2.rectangle(frame, region[:2], region[2:], (255,100,100), 2)
+            if pts_2d is not None:
+                for (x,y) in pts_2d.astype(int):
+                    cv2.circle(frame, (x,y), 2, (0,255,255), -1)
+            cv2.rectangle(frame, (x1,y1), (x2,y2), (255,0,0), 1)
+
+        # Decision vote
+        motion_var = self.motion_var if motion_config.get('enabled') else None
+        live, ok_depth, ok_pnp, confidence = service.liveness_decision(
+            depth_std_face, reproj_err, yaw, pitch, roll, depth_roi, face_size,
+            depth_thresh=adaptive_depth_thresh, motion_thresh=adaptive_motion_thresh,
+            motion_var=motion_var
+        )
+        self.live_votes.append(live)
+        self.confidence_scores.append(confidence)
+        self.last_measurement = {
+            'depth_std_face': depth_std_face,
+            'reproj_err': reproj_err,
+            'motion_var': self.motion_var,
+            'face_size': face_size,
+            'live': bool(live),
+            'confidence': float(confidence)
+        }
+        if depth_std_face > 0:
+            self.depth_std_values.append(depth_std_face)
+        if reproj_err < 1e8:
+            self.reproj_errors.append(reproj_err)
+            self.motion_values.append(self.motion_var)
+        
+        if self.scheduler is not None:
+            self.scheduler.report_cost((time.perf_counter() - started) * 1000)
+        
+        if self.display:
+            status = "CHECKING ⏳" if len(self.live_votes) < 30 else ("LIVE ✅" if live else "SPOOF ❌")
+            color = (0,255,255) if len(self.live_votes) < 30 else ((0,255,0) if live else (0,0,255))
+            cv2.putText(frame, status, (10,30), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+            cv2.putText(frame, f"DepthStd: {depth_std_face:.2f}", (10,60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 2)
+            cv2.putText(frame, f"ReprojErr: {reproj_err:.2f}px", (10,85), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 2)
+            cv2.putText(frame, f"Confidence: {confidence:.2f}", (10,110), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,255,255), 2)
+            cv2.putText(frame, f"MotionVar: {self.motion_var:4.2f} (thr: {adaptive_motion_thresh:.2f})", (10,135), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 2)
+    
+    def stop(self):
+        """Return the FaceMesh leased by a private context cache"""
+        if self.owns_context_cache and self.context_cache is not None:
+            self.context_cache.release_models()
+    
+    def evidence(self) -> Optional[Tuple[bool, float]]:
+        """Current majority vote and mean per-frame confidence"""
+        if not self.live_votes:
+            return None
+        live = (sum(self.live_votes) / len(self.live_votes)) > 0.6
+        return live, float(np.mean(self.confidence_scores))
+    
+    def progress(self) -> Dict[str, Any]:
+        state = super().progress()
+        measurement = self.last_measurement or {}
+        state.update(depth_std=round(float(measurement.get('depth_std_face', 0.0)), 4),
+                     motion_var=round(float(self.motion_var), 4),
+                     live_votes=int(sum(self.live_votes)), votes=len(self.live_votes))
+        return state
+    
+    def result(self) -> Dict[str, Any]:
+        """Majority vote over the frames seen so far"""
+        live_votes = self.live_votes
+        
+        # Calculate final results
+        if len(live_votes) == 0:
+            final_live = False
+            final_confidence = 0.0
+        else:
+            final_live = (sum(live_votes) / len(live_votes)) > 0.6
+            final_confidence = np.mean(self.confidence_scores) if self.confidence_scores else 0.0
+            
+            logger.info(f"2D/3D liveness check completed - Live vote ratio: {sum(live_votes)}/{len(live_votes)} ({(sum(live_votes)/len(live_votes)*100):.1f}%)")
+        
+        return {
+            'success': bool(final_live),
+            'confidence': float(final_confidence),
+            'live_votes': int(sum(live_votes)),
+            'total_votes': len(live_votes),
+            'frames_processed': self.frames_processed,
+            'avg_depth_std': float(np.mean(self.depth_std_values)) if self.depth_std_values else 0.0,
+            'avg_reproj_err': float(np.mean(self.reproj_errors)) if self.reproj_errors else 0.0,
+            'avg_motion_var': float(np.mean(self.motion_values)) if self.motion_values else 0.0,
+            'depth_roi_frames': self.roi_frames,
+            'depth_roi_scale': float(self.roi_depth_scale),
+            'depth_roi_calibrations': self.roi_calibrations,
+            'depth_roi_calibration_failures': self.roi_calibration_failures,
+            'depth_frames': self.depth_frames,
+            'scheduling': self.scheduler.stats() if self.scheduler is not None else None,
+            'message': '2D/3D liveness check completed successfully' if final_live else '2D/3D liveness check failed'
+        }
@@ -0,0 +1,258 @@
+"""
+Model Registry - Process-wide cache for heavy ML models
+
+Every liveness step service used to load its own copy of InsightFace, MiDaS,
+MediaPipe FaceMesh, dlib and Vosk in its constructor. The registry loads each
+model once per process and hands the same handle to every service instance.
+Stateful models that one run must own at a time (FaceMesh in tracking mode)
+come from a bounded pool instead: instances are loaded on demand up to the
+pool size, checked out per run, reset and reused.
+"""
+
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Return the resident set size of this process in bytes (best effort)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except Exception:
+        pass
+
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE')
+    except Exception:
+        return None
+
+
+class _ModelEntry:
+    """Book-keeping for a single registered model"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.lock = threading.Lock()
+        self.handle = None
+        self.loaded = False
+        self.error = None
+        self.load_time_ms = None
+        self.memory_bytes = None
+        self.loaded_at = None
+        self.thread_local = None
+        self.instances = 0
+
+
+class ModelPool:
+    """Bounded set of instances of a stateful model, each used by one run at a time"""
+
+    def __init__(self, registry: 'ModelRegistry', entry: _ModelEntry, loader: Callable[[], Any],
+                 size: int, reset: Optional[Callable[[Any], None]] = None, timeout: Optional[float] = None):
+        self._registry = registry
+        self._entry = entry
+        self._loader = loader
+        self.size = max(1, int(size))
+        self._reset = reset
+        self.timeout = timeout
+        self._idle: 'queue.LifoQueue[Any]' = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout: Optional[float] = None) -> Any:
+        """
+        An idle instance, a newly loaded one while below ``size``, or the
+        next one released
+
+        Raises:
+            RuntimeError: No instance became free within ``timeout`` (default:
+                the pool's timeout)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._entry.instances < self.size
+            if create:
+                self._entry.instances += 1
+        if create:
+            try:
+                handle = self._registry._load(self._entry, self._loader)
+            except Exception as e:
+                with self._lock:
+                    self._entry.instances -= 1
+                self._entry.error = str(e)
+                raise
+            self._entry.loaded = True
+            self._entry.error = None
+            return handle
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise RuntimeError(f"No free '{self._entry.name}' instance after {timeout}s "
+                               f"(pool size {self.size})")
+
+    def release(self, handle: Any):
+        """Return an instance; it is reset so the next run starts without its state"""
+        if self._reset is not None:
+            try:
+                self._reset(handle)
+            except Exception as e:
+                logger.warning(f"Resetting a pooled '{self._entry.name}' failed; dropping it: {e}")
+                with self._lock:
+                    self._entry.instances -= 1
+                return
+        self._idle.put(handle)
+
+
+class ModelRegistry:
+    """Thread-safe registry that loads each model once and shares the handle"""
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._entries_lock = threading.Lock()
+
+    def _entry(self, name: str) -> _ModelEntry:
+        with self._entries_lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                entry = _ModelEntry(name)
+                self._entries[name] = entry
+            return entry
+
+    def _load(self, entry: _ModelEntry, loader: Callable[[], Any]) -> Any:
+        """
+        Run a loader and record its load time and memory footprint
+
+        Only the first instance of an entry is recorded; further per-thread
+        or pooled instances would otherwise overwrite the one-time load.
+        """
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        handle = loader()
+        load_time_ms = (time.perf_counter() - start) * 1000.0
+        rss_after = _current_rss_bytes()
+        if entry.load_time_ms is not None:
+            logger.debug(f"Additional '{entry.name}' instance loaded in {load_time_ms:.0f} ms")
+            return handle
+        entry.load_time_ms = load_time_ms
+        if rss_before is not None and rss_after is not None:
+            entry.memory_bytes = max(0, rss_after - rss_before)
+        entry.loaded_at = time.time()
+        logger.info(f"Model '{entry.name}' loaded in {entry.load_time_ms:.0f} ms "
+                    f"(+{(entry.memory_bytes or 0) / (1024 * 1024):.1f} MB RSS)")
+        return handle
+
+    def get(self, name: str, loader: Callable[[], Any], per_thread: bool = False) -> Any:
+        """
+        Return the shared handle for a model, loading it on first use
+
+        Args:
+            name: Unique registry key (include the model path if it can vary)
+            loader: Zero-argument callable that builds the model
+            per_thread: Keep one instance per thread for stateful models
+                (e.g. MediaPipe FaceMesh in tracking mode)
+
+        Returns:
+            The loaded model handle. Loader exceptions are re-raised and the
+            failure is remembered so that a broken model is not retried on
+            every request.
+        """
+        entry = self._entry(name)
+
+        if per_thread:
+            with entry.lock:
+                if entry.thread_local is None:
+                    entry.thread_local = threading.local()
+            local = entry.thread_local
+            handle = getattr(local, 'handle', None)
+            if handle is None:
+                try:
+                    handle = self._load(entry, loader)
+                except Exception as e:
+                    entry.error = str(e)
+                    raise
+                local.handle = handle
+                entry.loaded = True
+                entry.error = None
+            return handle
+
+        if entry.loaded:
+            return entry.handle
+
+        with entry.lock:
+            if entry.loaded:
+                return entry.handle
+            if entry.error is not None:
+                raise RuntimeError(f"Model '{name}' failed to load earlier: {entry.error}")
+            try:
+                entry.handle = self._load(entry, loader)
+            except Exception as e:
+                entry.error = str(e)
+                logger.error(f"Failed to load model '{name}': {e}")
+                raise
+            entry.loaded = True
+            return entry.handle
+
+    def pool(self, name: str, loader: Callable[[], Any], size: int,
+             reset: Optional[Callable[[Any], None]] = None, timeout: Optional[float] = None) -> ModelPool:
+        """
+        Process-wide pool for a stateful model (created on first call; later
+        calls return the same pool whatever their ``size``)
+
+        Args:
+            name: Unique registry key
+            loader: Zero-argument callable that builds one instance
+            size: Most instances ever loaded; callers beyond it wait
+            reset: Called on an instance when it is returned to the pool
+            timeout: Seconds acquire() waits for a free instance (None = forever)
+        """
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.handle is None:
+                entry.handle = ModelPool(self, entry, loader, size, reset, timeout)
+            return entry.handle
+
+    def is_loaded(self, name: str) -> bool:
+        """Check whether a model has been loaded"""
+        entry = self._entries.get(name)
+        return bool(entry and entry.loaded)
+
+    def peek(self, name: str) -> Any:
+        """Return the shared handle if it is already loaded, without loading it (else None)"""
+        entry = self._entries.get(name)
+        return entry.handle if entry is not None and entry.loaded else None
+
+    def reset(self, name: Optional[str] = None):
+        """Forget one model (or all of them) so the next get() reloads it"""
+        with self._entries_lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(name, None)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Load time and memory for every registered model"""
+        stats = {}
+        for name, entry in list(self._entries.items()):
+            stats[name] = {
+                'loaded': entry.loaded,
+                'load_time_ms': round(entry.load_time_ms, 1) if entry.load_time_ms is not None else None,
+                'memory_mb': round(entry.memory_bytes / (1024 * 1024), 1) if entry.memory_bytes is not None else None,
+                'loaded_at': entry.loaded_at,
+                'instances': entry.instances if isinstance(entry.handle, ModelPool) else int(entry.loaded),
+                'error': entry.error
+            }
+        return stats
+
+
+# Process-wide registry shared by all services
+model_registry = ModelRegistry()
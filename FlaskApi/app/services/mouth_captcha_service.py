@@ -7,11 +7,16 @@ import numpy as np
 import logging
 import os
 import sys
-import time
 import queue
 import json
 import random
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
+
+from .face_tracker import DEFAULT_TRACKING_CONFIG, FaceTracker
+from .frame_context import FrameContext, FrameContextCache
+from .liveness_pipeline import FrameAnalyzer
+from .metrics import stage_timer
+from .model_registry import model_registry
 
 # Add the flask-api directory to the path to import existing modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -20,6 +25,27 @@ sys.path.insert(0, flask_api_dir)
 
 logger = logging.getLogger(__name__)
 
+class AudioFeed:
+    """Client microphone: 16-bit mono PCM chunks pushed by a streaming connection"""
+    
+    def __init__(self, samplerate: int = 16000, max_chunks: int = 64):
+        self.samplerate = int(samplerate)
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.chunks_dropped = 0
+    
+    def push(self, pcm: bytes):
+        """Queue one chunk, dropping the oldest when the recognizer falls behind"""
+        while True:
+            try:
+                self.queue.put_nowait(bytes(pcm))
+                return
+            except queue.Full:
+                try:
+                    self.queue.get_nowait()
+                    self.chunks_dropped += 1
+                except queue.Empty:
+                    pass
+
 class MouthCaptchaService:
     """Service for mouth movement and voice captcha verification"""
     
@@ -27,6 +53,8 @@ class MouthCaptchaService:
         self.model_loaded = False
         self.detector = None
         self.predictor = None
+        # Detect-then-track settings for the dlib face detector
+        self.tracking_config = dict(DEFAULT_TRACKING_CONFIG)
         self.vosk_model = None
         self._load_models()
     
@@ -52,9 +80,15 @@ class MouthCaptchaService:
                 return
             
             # Load models
-            self.detector = dlib.get_frontal_face_detector()
-            self.predictor = dlib.shape_predictor(dlib_model_path)
-            self.vosk_model = vosk.Model(vosk_model_path)
+            self.detector = model_registry.get("dlib_frontal_face_detector", dlib.get_frontal_face_detector)
+            self.predictor = model_registry.get(
+                f"dlib_shape_predictor:{dlib_model_path}",
+                lambda: dlib.shape_predictor(dlib_model_path)
+            )
+            self.vosk_model = model_registry.get(
+                f"vosk:{vosk_model_path}",
+                lambda: vosk.Model(vosk_model_path)
+            )
             self.face_utils = face_utils
             self.w2n = w2n
             self.sd = sd
@@ -71,12 +105,61 @@ class MouthCaptchaService:
         """Check if model is loaded"""
         return self.model_loaded
     
-    def run_captcha_verification(self, camera, duration: int = 7, display: bool = False) -> Dict[str, Any]:
+    def generate_captcha(self):
+        """Generate a random arithmetic captcha question and its answer"""
+        a = random.randint(20, 90)
+        b = random.randint(0, 10)
+        op = random.choice(["+", "-"])
+
+        if op == "+":
+            answer = a + b
+        else:
+            answer = a - b
+
+        if answer < 0:
+            answer = abs(answer)
+        if answer > 99:
+            answer = answer % 100
+
+        return f"{a} {op} {b} = ?", str(answer)
+    
+    def recognize_number(self, spoken_text: str):
+        """Extract the spoken number from recognized text"""
+        recognized_number = None
+        try:
+            recognized_number = str(self.w2n.word_to_num(spoken_text))
+        except:
+            for token in spoken_text.split():
+                if token.isdigit():
+                    recognized_number = token
+                    break
+        return recognized_number
+    
+    def create_face_tracker(self) -> Optional[FaceTracker]:
+        """Detect-then-track wrapper for the dlib detector, if tracking is enabled"""
+        return FaceTracker.from_config(self.detector, self.tracking_config)
+    
+    def create_context_cache(self) -> FrameContextCache:
+        """Per-frame artifact cache backed by this service's dlib models"""
+        return FrameContextCache(face_detector=self.detector, shape_predictor=self.predictor,
+                                 face_tracker=self.create_face_tracker())
+    
+    def create_analyzer(self, duration: Optional[float] = None, max_fps: Optional[float] = None,
+                        display: bool = False, context_cache: Optional[FrameContextCache] = None,
+                        early_stop: Optional[Dict[str, Any]] = None,
+                        audio_feed: Optional[AudioFeed] = None) -> 'MouthCaptchaAnalyzer':
+        """Create an incremental mouth movement + speech analyzer for the fused pipeline"""
+        return MouthCaptchaAnalyzer(self, duration=duration, max_fps=max_fps, display=display,
+                                    context_cache=context_cache or self.create_context_cache(),
+                                    early_stop=early_stop, audio_feed=audio_feed)
+    
+    def run_captcha_verification(self, camera, duration: int = 7, display: bool = False,
+                                 early_stop: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Run mouth-movement + spoken captcha verification
         
         Args:
-            camera: Camera object with get_frame() method
+            camera: FrameSource (device, video file, image sequence or ring buffer)
             duration: Duration to run verification in seconds
             display: Whether to show visual feedback
             
@@ -92,133 +175,37 @@ class MouthCaptchaService:
             }
         
         try:
-            # Generate captcha question
-            a = random.randint(20, 90)
-            b = random.randint(0, 10)
-            op = random.choice(["+", "-"])
-
-            if op == "+":
-                answer = a + b
-            else:
-                answer = a - b
-
-            if answer < 0:
-                answer = abs(answer)
-            if answer > 99:
-                answer = answer % 100
-
-            captcha_question = f"{a} {op} {b} = ?"
-            captcha_answer = str(answer)
-            
-            logger.info(f"Generated captcha: {captcha_question} (Answer: {captcha_answer})")
-            
-            # Setup audio stream
-            q = queue.Queue()
-            
-            def audio_callback(indata, frames, time_, status):
-                if status:
-                    logger.warning(f"Audio callback status: {status}")
-                q.put(bytes(indata))
-            
-            device_info = self.sd.query_devices(kind="input")
-            samplerate = int(device_info["default_samplerate"])
-            rec = self.vosk.KaldiRecognizer(self.vosk_model, samplerate)
-            stream = self.sd.InputStream(samplerate=samplerate, blocksize=8000, dtype='int16',
-                                        channels=1, callback=audio_callback)
-            stream.start()
-            
-            start_time = time.time()
-            mar_movement = []
-            spoken_text = ""
-            frame_count = 0
+            analyzer = self.create_analyzer(duration=duration, display=display, early_stop=early_stop)
+            analyzer.start()
             
-            logger.info(f"Starting captcha verification for {duration} seconds...")
-            
-            # Main loop
-            while time.time() - start_time < duration:
-                frame = camera.get_frame()
-                if frame is None:
-                    continue
+            try:
+                start_time = camera.clock()
                 
-                frame_count += 1
-                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-
-                faces = self.detector(gray, 0)
-                for face in faces:
-                    shape = self.predictor(gray, face)
-                    shape = self.face_utils.shape_to_np(shape)
-                    mouth = shape[48:68]
-
-                    # Mouth Aspect Ratio (MAR)
-                    A = np.linalg.norm(mouth[2] - mouth[10])
-                    B = np.linalg.norm(mouth[4] - mouth[8])
-                    C = np.linalg.norm(mouth[0] - mouth[6])
-                    mar = (A + B) / (2.0 * C)
-                    mar_movement.append(mar)
+                logger.info(f"Starting captcha verification for {duration} seconds...")
+                
+                # Main loop
+                while not analyzer.is_done(camera.clock() - start_time):
+                    frame = camera.get_frame()
+                    if frame is None:
+                        if camera.exhausted:
+                            break
+                        continue
+                    
+                    analyzer.feed_frame(frame, camera.clock() - start_time)
 
                     if display:
-                        cv2.drawContours(frame, [cv2.convexHull(mouth)], -1, (0, 255, 0), 1)
-
-                if display:
-                    cv2.putText(frame, captcha_question, (50, 50),
-                                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
-                    cv2.imshow("Unified Verification", frame)
-
-                # Process speech
-                try:
-                    data = q.get_nowait()
-                except queue.Empty:
-                    data = None
-                
-                if data is not None:
-                    if rec.AcceptWaveform(data):
-                        result = json.loads(rec.Result())
-                        if result.get("text"):
-                            spoken_text += " " + result["text"]
+                        cv2.imshow("Unified Verification", frame)
 
-                if cv2.waitKey(1) & 0xFF == ord('q'):
-                    break
+                    if cv2.waitKey(1) & 0xFF == ord('q'):
+                        break
+            finally:
+                # Cleanup
+                analyzer.stop()
             
-            # Cleanup
-            stream.stop()
             if display:
                 cv2.destroyAllWindows()
             
-            # Analyze results
-            avg_mar_change = np.std(mar_movement) if mar_movement else 0.0
-            spoken_text = spoken_text.strip()
-            
-            logger.info(f"Captcha results - Spoken: '{spoken_text}', Expected: '{captcha_answer}', MAR variation: {avg_mar_change:.4f}")
-            
-            # Try to extract number from spoken text
-            recognized_number = None
-            try:
-                recognized_number = str(self.w2n.word_to_num(spoken_text))
-            except:
-                for token in spoken_text.split():
-                    if token.isdigit():
-                        recognized_number = token
-                        break
-            
-            # Calculate confidence
-            mar_score = min(1.0, avg_mar_change / 0.02)  # Normalize MAR variation
-            answer_score = 1.0 if recognized_number == captcha_answer else 0.0
-            confidence = (mar_score + answer_score) / 2.0
-            
-            # Success criteria
-            success = avg_mar_change > 0.01 and recognized_number == captcha_answer
-            
-            return {
-                'success': success,
-                'confidence': float(confidence),
-                'question': captcha_question,
-                'answer': captcha_answer,
-                'spoken_text': spoken_text,
-                'recognized_number': recognized_number,
-                'mar_variation': float(avg_mar_change),
-                'frames_processed': frame_count,
-                'message': 'Voice captcha verification completed successfully' if success else 'Voice captcha verification failed'
-            }
+            return analyzer.final_result()
             
         except Exception as e:
             logger.error(f"Mouth captcha verification failed: {e}")
@@ -277,25 +264,19 @@ class MouthCaptchaService:
                 data = data[:, 0]
 
             chunk_size = 4000
-            for i in range(0, len(data), chunk_size):
-                chunk = data[i:i+chunk_size]
-                rec.AcceptWaveform(chunk.tobytes())
-                partial = json.loads(rec.PartialResult()).get('partial')
-                if partial:
-                    spoken_text += ' ' + partial
+            with stage_timer('asr'):
+                for i in range(0, len(data), chunk_size):
+                    chunk = data[i:i+chunk_size]
+                    rec.AcceptWaveform(chunk.tobytes())
+                    partial = json.loads(rec.PartialResult()).get('partial')
+                    if partial:
+                        spoken_text += ' ' + partial
 
-            final = json.loads(rec.FinalResult()).get('text', '')
+                final = json.loads(rec.FinalResult()).get('text', '')
             spoken_text = (spoken_text + ' ' + final).strip()
 
             # Extract recognized number
-            recognized_number = None
-            try:
-                recognized_number = str(self.w2n.word_to_num(spoken_text))
-            except:
-                for token in spoken_text.split():
-                    if token.isdigit():
-                        recognized_number = token
-                        break
+            recognized_number = self.recognize_number(spoken_text)
 
             # Confidence is 1.0 if matches expected, else 0.5 if a number was recognized, else 0.0
             if expected is not None:
@@ -322,4 +303,141 @@ class MouthCaptchaService:
                 'confidence': 0.0,
                 'message': f'Voice captcha upload verification failed: {str(e)}',
                 'error': str(e)
-            }
\ No newline at end of file
+            }
+
+class MouthCaptchaAnalyzer(FrameAnalyzer):
+    """Per-frame mouth movement tracking plus live speech recognition"""
+    
+    name = 'mouth_captcha'
+    
+    def __init__(self, service: MouthCaptchaService, duration: Optional[float] = None,
+                 max_fps: Optional[float] = None, display: bool = False,
+                 context_cache: Optional[FrameContextCache] = None,
+                 early_stop: Optional[Dict[str, Any]] = None,
+                 audio_feed: Optional[AudioFeed] = None):
+        super().__init__(duration=duration, max_fps=max_fps, context_cache=context_cache,
+                         early_stop=early_stop)
+        self.service = service
+        self.display = display
+        self.captcha_question, self.captcha_answer = service.generate_captcha()
+        self.mar_movement = []
+        self.spoken_text = ""
+        self._recognized_number = None
+        # Audio comes from the client (streaming) or the local microphone
+        self.audio_feed = audio_feed
+        self.audio_queue = audio_feed.queue if audio_feed is not None else queue.Queue()
+        self.recognizer = None
+        self.stream = None
+        
+        logger.info(f"Generated captcha: {self.captcha_question} (Answer: {self.captcha_answer})")
+    
+    def start(self):
+        """Open the microphone stream (unless audio is fed by the client) and speech recognizer"""
+        service = self.service
+        if self.audio_feed is not None:
+            self.recognizer = service.vosk.KaldiRecognizer(service.vosk_model, self.audio_feed.samplerate)
+            return
+        
+        def audio_callback(indata, frames, time_, status):
+            if status:
+                logger.warning(f"Audio callback status: {status}")
+            self.audio_queue.put(bytes(indata))
+        
+        device_info = service.sd.query_devices(kind="input")
+        samplerate = int(device_info["default_samplerate"])
+        self.recognizer = service.vosk.KaldiRecognizer(service.vosk_model, samplerate)
+        self.stream = service.sd.InputStream(samplerate=samplerate, blocksize=8000, dtype='int16',
+                                             channels=1, callback=audio_callback)
+        self.stream.start()
+    
+    def stop(self):
+        """Stop the microphone stream"""
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+    
+    def process(self, ctx: FrameContext):
+        """Track mouth aspect ratio and consume pending audio"""
+        frame = ctx.frame
+
+        for _, _, shape in ctx.get('landmarks68'):
+            mouth = shape[48:68]
+
+            # Mouth Aspect Ratio (MAR)
+            A = np.linalg.norm(mouth[2] - mouth[10])
+            B = np.linalg.norm(mouth[4] - mouth[8])
+            C = np.linalg.norm(mouth[0] - mouth[6])
+            mar = (A + B) / (2.0 * C)
+            self.mar_movement.append(mar)
+
+            if self.display:
+                cv2.drawContours(frame, [cv2.convexHull(mouth)], -1, (0, 255, 0), 1)
+
+        if self.display:
+            cv2.putText(frame, self.captcha_question, (50, 50),
+                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 255), 2)
+
+        # Process speech (client feeds can send several small chunks per frame)
+        pending = self.audio_queue.qsize() if self.audio_feed is not None else 1
+        for _ in range(max(1, pending)):
+            try:
+                data = self.audio_queue.get_nowait()
+            except queue.Empty:
+                break
+            
+            if self.recognizer is None:
+                continue
+            with stage_timer('asr'):
+                complete = self.recognizer.AcceptWaveform(data)
+            if complete:
+                result = json.loads(self.recognizer.Result())
+                if result.get("text"):
+                    self.spoken_text += " " + result["text"]
+                    if self.early_stop:
+                        self._recognized_number = self.service.recognize_number(self.spoken_text.strip())
+    
+    def evidence(self) -> Optional[Tuple[bool, float]]:
+        """Answer heard with visible mouth movement, and the running confidence"""
+        if self._recognized_number != self.captcha_answer:
+            return None
+        avg_mar_change = np.std(self.mar_movement) if self.mar_movement else 0.0
+        confidence = (min(1.0, avg_mar_change / 0.02) + 1.0) / 2.0
+        return avg_mar_change > 0.01, float(confidence)
+    
+    def progress(self) -> Dict[str, Any]:
+        state = super().progress()
+        state.update(question=self.captcha_question,
+                     mar_variation=round(float(np.std(self.mar_movement)) if self.mar_movement else 0.0, 4),
+                     spoken_text=self.spoken_text.strip())
+        return state
+    
+    def result(self) -> Dict[str, Any]:
+        """Score mouth movement and the spoken answer"""
+        # Analyze results
+        avg_mar_change = np.std(self.mar_movement) if self.mar_movement else 0.0
+        spoken_text = self.spoken_text.strip()
+        
+        logger.info(f"Captcha results - Spoken: '{spoken_text}', Expected: '{self.captcha_answer}', MAR variation: {avg_mar_change:.4f}")
+        
+        # Try to extract number from spoken text
+        recognized_number = self.service.recognize_number(spoken_text)
+        
+        # Calculate confidence
+        mar_score = min(1.0, avg_mar_change / 0.02)  # Normalize MAR variation
+        answer_score = 1.0 if recognized_number == self.captcha_answer else 0.0
+        confidence = (mar_score + answer_score) / 2.0
+        
+        # Success criteria
+        success = avg_mar_change > 0.01 and recognized_number == self.captcha_answer
+        
+        return {
+            'success': success,
+            'confidence': float(confidence),
+            'question': self.captcha_question,
+            'answer': self.captcha_answer,
+            'spoken_text': spoken_text,
+            'recognized_number': recognized_number,
+            'mar_variation': float(avg_mar_change),
+            'frames_processed': self.frames_processed,
+            'message': 'Voice captcha verification completed successfully' if success else 'Voice captcha verification failed'
+        }
@@ -2,12 +2,21 @@
 Person Verification Service - Wrapper for person verification functionality
 """
 
+import copy
 import cv2
+import heapq
 import numpy as np
 import logging
 import os
 import sys
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, List, Optional, Tuple, Union
+
+from .batch_scheduler import DEFAULT_BATCHING_CONFIG, MicroBatcher
+from .embedding_cache import DEFAULT_REFERENCE_CACHE_CONFIG, EmbeddingCache, content_hash
+from .frame_context import FrameContext, FrameContextCache
+from .liveness_pipeline import FrameAnalyzer
+from .metrics import stage_timer
+from .model_registry import model_registry
 
 # Add the flask-api directory to the path to import existing modules
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -16,24 +25,124 @@ sys.path.insert(0, flask_api_dir)
 
 logger = logging.getLogger(__name__)
 
+# InsightFace model pack; enrolled templates are only comparable within one pack
+FACE_MODEL_NAME = "buffalo_l"
+
+
+def _allowed_modules_from_env() -> Optional[List[str]]:
+    value = os.environ.get('INSIGHTFACE_MODULES', 'detection,recognition').strip()
+    if value.lower() in ('', 'all', 'full'):
+        return None
+    return [m.strip() for m in value.split(',') if m.strip()]
+
+
+DEFAULT_INSIGHTFACE_CONFIG = {
+    # Model heads to load; None loads the full pack (adds landmark_3d_68,
+    # landmark_2d_106 and genderage to every face_app.get result)
+    'allowed_modules': _allowed_modules_from_env(),
+    # Detector input for reference images and frames without a size estimate
+    'det_size': 640,
+    # Per-frame detector input chosen from the face size seen in the previous frame
+    'adaptive_det_size': os.environ.get('INSIGHTFACE_ADAPTIVE_DET_SIZE', 'True').lower() == 'true',
+    'det_sizes': [320, 480, 640],
+    # Smallest face height (px, in detector input) that still gives stable keypoints
+    'min_face_px': 96,
+}
+
+DEFAULT_AGGREGATION_CONFIG = {
+    # Embed only the best frames and verify one quality-weighted template
+    'enabled': os.environ.get('VERIFICATION_AGGREGATION', 'True').lower() == 'true',
+    'top_k': 3,
+    # Frames below this quality are never embedded
+    'min_quality': 0.3,
+    # Running evidence (early stopping, progress) embeds a kept frame only once
+    # it has stayed in the top-K for this many analysed frames; the final
+    # result embeds every kept frame
+    'stable_frames': 5,
+    # Weights of the per-frame quality metrics
+    'weights': {'sharpness': 0.35, 'face_size': 0.25, 'pose': 0.25, 'brightness': 0.15},
+    # Metric saturation points: Laplacian variance and face height (px)
+    'sharpness_ref': 100.0,
+    'face_size_ref': 160.0,
+}
+
+
+def face_quality(gray: np.ndarray, bbox, kps, config: Dict[str, Any]) -> Tuple[float, Dict[str, float]]:
+    """
+    Cheap 0-1 quality score of one detected face, without running recognition
+    
+    Sharpness is the Laplacian variance of the face region, pose comes from
+    the detector's 5 keypoints (nose offset from the eye midpoint for yaw,
+    eye line angle for roll), brightness is the face region's mean level.
+    """
+    h, w = gray.shape[:2]
+    x1, y1 = max(int(bbox[0]), 0), max(int(bbox[1]), 0)
+    x2, y2 = min(int(bbox[2]), w), min(int(bbox[3]), h)
+    face = gray[y1:y2, x1:x2]
+    if face.size == 0:
+        return 0.0, {}
+    
+    sharpness = min(1.0, cv2.Laplacian(face, cv2.CV_64F).var() / config.get('sharpness_ref', 100.0))
+    face_size = min(1.0, (y2 - y1) / config.get('face_size_ref', 160.0))
+    brightness = max(0.0, 1.0 - abs(float(face.mean()) - 128.0) / 128.0)
+    
+    left_eye, right_eye, nose = kps[0], kps[1], kps[2]
+    eye_dist = float(np.linalg.norm(right_eye - left_eye)) or 1.0
+    yaw = abs(float(nose[0] - (left_eye[0] + right_eye[0]) / 2)) / eye_dist
+    roll = abs(np.degrees(np.arctan2(right_eye[1] - left_eye[1], right_eye[0] - left_eye[0])))
+    pose = max(0.0, 1.0 - yaw / 0.5) * max(0.0, 1.0 - roll / 45.0)
+    
+    metrics = {'sharpness': sharpness, 'face_size': face_size, 'pose': pose, 'brightness': brightness}
+    weights = config.get('weights', DEFAULT_AGGREGATION_CONFIG['weights'])
+    score = sum(weights[name] * metrics[name] for name in weights) / (sum(weights.values()) or 1.0)
+    return float(score), metrics
+
+
 class PersonVerificationService:
     """Service for person verification using InsightFace"""
     
-    def __init__(self):
+    def __init__(self, insightface_config: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            insightface_config: Loaded modules and detector sizes
+                (defaults to DEFAULT_INSIGHTFACE_CONFIG)
+        """
+        self.insightface_config = dict(insightface_config or DEFAULT_INSIGHTFACE_CONFIG)
         self.model_loaded = False
         self.face_app = None
+        self.rec_model = None
+        self.model_key = None
+        # Cross-request micro-batching of ArcFace embeddings
+        self.batching_config = dict(DEFAULT_BATCHING_CONFIG)
+        # Reference payload hash -> embedding, shared by all service instances
+        self.reference_cache_config = dict(DEFAULT_REFERENCE_CACHE_CONFIG)
+        # Quality-weighted top-K frame aggregation
+        self.aggregation_config = copy.deepcopy(DEFAULT_AGGREGATION_CONFIG)
         self._load_model()
     
     def _load_model(self):
         """Load InsightFace model"""
         try:
             import insightface
-            MODEL_NAME = "buffalo_l"
-            self.face_app = insightface.app.FaceAnalysis(
-                name=MODEL_NAME, 
-                providers=['CPUExecutionProvider']
-            )
-            self.face_app.prepare(ctx_id=0, det_size=(640, 640))
+            from insightface.utils import face_align
+            config = self.insightface_config
+            allowed_modules = config.get('allowed_modules')
+            det_size = int(config.get('det_size', 640))
+            
+            def load_face_app():
+                face_app = insightface.app.FaceAnalysis(
+                    name=FACE_MODEL_NAME, 
+                    allowed_modules=allowed_modules,
+                    providers=['CPUExecutionProvider']
+                )
+                face_app.prepare(ctx_id=0, det_size=(det_size, det_size))
+                return face_app
+            
+            modules = '+'.join(sorted(allowed_modules)) if allowed_modules else 'all'
+            self.model_key = f"insightface_{FACE_MODEL_NAME}:{modules}:{det_size}"
+            self.face_app = model_registry.get(self.model_key, load_face_app)
+            self.rec_model = self.face_app.models['recognition']
+            self.face_align = face_align
             self.model_loaded = True
             logger.info("InsightFace model loaded successfully")
         except Exception as e:
@@ -44,15 +153,159 @@ class PersonVerificationService:
         """Check if model is loaded"""
         return self.model_loaded
     
-    def verify_person(self, camera, reference_image: np.ndarray, duration: int = 2, display: bool = False) -> Dict[str, Any]:
+    @property
+    def model_version(self) -> str:
+        """Model pack and recognition model file the embeddings come from"""
+        model_file = getattr(self.rec_model, 'model_file', None) or 'recognition'
+        return f"{FACE_MODEL_NAME}/{os.path.basename(model_file)}"
+    
+    def choose_det_size(self, frame_shape, face_height: Optional[float] = None) -> int:
+        """
+        Smallest detector input that keeps the expected face large enough
+        
+        Detection cost grows with the square of the input side; a selfie-
+        distance face is still well above ``min_face_px`` at 320. Without an
+        estimate (first frame, face lost) the full size is used.
+        """
+        config = self.insightface_config
+        full = int(config.get('det_size', 640))
+        if not config.get('adaptive_det_size') or not face_height:
+            return full
+        longest = float(max(frame_shape[:2]))
+        min_face = config.get('min_face_px', 96)
+        for size in sorted(config.get('det_sizes', [full])):
+            if size >= full or face_height * size / longest >= min_face:
+                return min(size, full)
+        return full
+    
+    def detect_faces(self, frame: np.ndarray, det_size: Optional[int] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Face boxes and 5-point keypoints from the InsightFace detector"""
+        input_size = (det_size, det_size) if det_size else None
+        with stage_timer('face_detection'):
+            return self.face_app.det_model.detect(frame, input_size=input_size, max_num=0, metric='default')
+    
+    def _embed_batch(self, crops: list) -> list:
+        """ArcFace features for a batch of aligned face crops"""
+        return list(self.rec_model.get_feat(crops))
+    
+    @property
+    def embedding_batcher_key(self) -> Optional[str]:
+        """Registry key of the ArcFace batcher for the current config, or None when batching is disabled"""
+        config = self.batching_config
+        if not config.get('enabled'):
+            return None
+        return f"batcher:{self.model_key}:{config['max_batch_size']}:{config['max_wait_ms']}"
+    
+    @property
+    def embedding_batcher(self) -> Optional[MicroBatcher]:
+        """Process-wide ArcFace batcher, or None when batching is disabled"""
+        key = self.embedding_batcher_key
+        if key is None:
+            return None
+        max_batch_size, max_wait_ms = self.batching_config['max_batch_size'], self.batching_config['max_wait_ms']
+        return model_registry.get(
+            key,
+            lambda: MicroBatcher(self._embed_batch, max_batch_size, max_wait_ms, name='arcface')
+        )
+    
+    def align_face(self, frame: np.ndarray, kps: np.ndarray) -> np.ndarray:
+        """ArcFace input crop of the face with the given keypoints"""
+        return self.face_align.norm_crop(frame, landmark=kps, image_size=self.rec_model.input_size[0])
+    
+    def embed_aligned(self, crops: list) -> list:
+        """Normalized ArcFace embeddings of aligned crops, in one forward pass"""
+        batcher = self.embedding_batcher
+        with stage_timer('recognition'):
+            if batcher is not None:
+                futures = [batcher.submit(crop) for crop in crops]
+                features = [future.result() for future in futures]
+            else:
+                features = self._embed_batch(crops)
+        embeddings = []
+        for feature in features:
+            embedding = np.asarray(feature).flatten()
+            embeddings.append(embedding / np.linalg.norm(embedding))
+        return embeddings
+    
+    def embed_face(self, frame: np.ndarray, kps: np.ndarray) -> np.ndarray:
+        """Normalized ArcFace embedding of the face with the given keypoints"""
+        return self.embed_aligned([self.align_face(frame, kps)])[0]
+    
+    def get_reference_face(self, reference_image: np.ndarray) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """Normalized embedding and face metadata of the single face in a reference image"""
+        ref_faces = self.face_app.get(reference_image)
+        if len(ref_faces) != 1:
+            raise ValueError('Reference image must contain exactly one face')
+        face = ref_faces[0]
+        metadata = {
+            'bbox': [float(v) for v in face.bbox],
+            'det_score': float(face.det_score),
+            'image_size': list(reference_image.shape[:2])
+        }
+        return face.embedding / np.linalg.norm(face.embedding), metadata
+    
+    def get_reference_embedding(self, reference_image: np.ndarray) -> np.ndarray:
+        """Compute the normalized embedding of the single face in a reference image"""
+        return self.get_reference_face(reference_image)[0]
+    
+    @property
+    def reference_cache(self) -> Optional[EmbeddingCache]:
+        """Process-wide reference embedding cache, or None when disabled"""
+        config = self.reference_cache_config
+        if not config.get('enabled'):
+            return None
+        max_entries, ttl = config['max_entries'], config['ttl_seconds']
+        return model_registry.get(
+            f"reference_cache:{self.model_key}:{max_entries}:{ttl}",
+            lambda: EmbeddingCache(max_entries, ttl)
+        )
+    
+    def reference_embedding_from_data(self, image_data: Union[str, np.ndarray],
+                                      decode: Callable[[Any], np.ndarray]) -> np.ndarray:
+        """
+        Embedding of an encoded reference image, served from the cache when
+        the same payload was seen recently
+        
+        Args:
+            image_data: Encoded reference image (base64, optionally a data URL,
+                or the uploaded bytes as a uint8 array)
+            decode: Turns ``image_data`` into a BGR image; only called on a miss
+        """
+        cache = self.reference_cache
+        if cache is None:
+            return self.get_reference_embedding(decode(image_data))
+        
+        # Hash the payload itself so a hit needs no decoding at all
+        key = content_hash(image_data.split(',', 1)[-1] if isinstance(image_data, str) else image_data)
+        entry = cache.get(key)
+        if entry is None:
+            embedding, metadata = self.get_reference_face(decode(image_data))
+            entry = {'embedding': embedding, 'face': metadata}
+            cache.put(key, entry)
+        return entry['embedding']
+    
+    def create_analyzer(self, reference_embedding: np.ndarray, duration: Optional[float] = None,
+                        max_fps: Optional[float] = None, display: bool = False,
+                        context_cache: Optional[FrameContextCache] = None,
+                        early_stop: Optional[Dict[str, Any]] = None) -> 'PersonVerificationAnalyzer':
+        """Create an incremental face matching analyzer for the fused pipeline"""
+        return PersonVerificationAnalyzer(self, reference_embedding, duration=duration,
+                                          max_fps=max_fps, display=display, context_cache=context_cache,
+                                          early_stop=early_stop)
+    
+    def verify_person(self, camera, reference_image: Optional[np.ndarray], duration: int = 2, display: bool = False,
+                      early_stop: Optional[Dict[str, Any]] = None,
+                      reference_embedding: Optional[np.ndarray] = None) -> Dict[str, Any]:
         """
         Verify if the person in camera matches the reference image
         
         Args:
-            camera: Camera object with get_frame() method
+            camera: FrameSource (device, video file, image sequence or ring buffer)
             reference_image: Reference image as numpy array
             duration: Duration to run verification in seconds
             display: Whether to show visual feedback
+            reference_embedding: Precomputed reference embedding; skips
+                ``reference_image`` entirely
             
         Returns:
             Dict containing verification results
@@ -67,73 +320,41 @@ class PersonVerificationService:
         
         try:
             # Get reference embedding
-            ref_faces = self.face_app.get(reference_image)
-            if len(ref_faces) != 1:
+            try:
+                if reference_embedding is not None:
+                    ref_emb = reference_embedding
+                else:
+                    ref_emb = self.get_reference_embedding(reference_image)
+            except ValueError as e:
                 return {
                     'success': False,
                     'confidence': 0.0,
-                    'message': 'Reference image must contain exactly one face',
+                    'message': str(e),
                     'error': 'Invalid reference image'
                 }
             
-            ref_emb = ref_faces[0].embedding / np.linalg.norm(ref_faces[0].embedding)
-            
             # Run verification for specified duration
-            import time
-            start_time = time.time()
-            verified = False
-            confidence_scores = []
-            frame_count = 0
+            analyzer = self.create_analyzer(ref_emb, duration=duration, display=display, early_stop=early_stop)
+            start_time = camera.clock()
             
-            while time.time() - start_time < duration:
+            while not analyzer.is_done(camera.clock() - start_time):
                 frame = camera.get_frame()
                 if frame is None:
+                    if camera.exhausted:
+                        break
                     continue
                 
-                frame_count += 1
-                frame_out = frame.copy()
-                
-                # Get faces from current frame
-                faces = self.face_app.get(frame)
-                
-                if len(faces) == 0:
-                    cv2.putText(frame_out, "❌ No face detected", (30, 40),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                elif len(faces) > 1:
-                    cv2.putText(frame_out, "❌ Multiple faces detected", (30, 40),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
-                else:
-                    # Compare with reference
-                    test_emb = faces[0].embedding / np.linalg.norm(faces[0].embedding)
-                    similarity = np.dot(ref_emb, test_emb)
-                    confidence_scores.append(similarity)
-                    
-                    if similarity > 0.5:  # Threshold for same person
-                        verified = True
-                        cv2.putText(frame_out, f"✅ Same person (Score: {similarity:.3f})", (30, 40),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 255, 0), 2)
-                    else:
-                        cv2.putText(frame_out, f"❌ Different person (Score: {similarity:.3f})", (30, 40),
-                                    cv2.FONT_HERSHEY_SIMPLEX, 0.9, (0, 0, 255), 2)
+                analyzer.feed_frame(frame, camera.clock() - start_time)
                 
                 if display:
-                    cv2.imshow("Person Verification", frame_out)
+                    cv2.imshow("Person Verification", analyzer.frame_out)
                     if cv2.waitKey(1) & 0xFF == ord('q'):
                         break
             
             if display:
                 cv2.destroyAllWindows()
             
-            # Calculate final confidence
-            avg_confidence = np.mean(confidence_scores) if confidence_scores else 0.0
-            
-            return {
-                'success': verified,
-                'confidence': float(avg_confidence),
-                'message': 'Person verification completed',
-                'frames_processed': frame_count,
-                'confidence_scores': confidence_scores
-            }
+            return analyzer.final_result()
             
         except Exception as e:
             logger.error(f"Person verification failed: {e}")
@@ -143,3 +364,183 @@ class PersonVerificationService:
                 'message': f'Person verification failed: {str(e)}',
                 'error': str(e)
             }
+
+
+class PersonVerificationAnalyzer(FrameAnalyzer):
+    """Per-frame comparison of the live face against a reference embedding"""
+    
+    name = 'person_verification'
+    
+    # Threshold for same person
+    SIMILARITY_THRESH = 0.5
+    
+    def __init__(self, service: PersonVerificationService, reference_embedding: np.ndarray,
+                 duration: Optional[float] = None, max_fps: Optional[float] = None, display: bool = False,
+                 context_cache: Optional[FrameContextCache] = None,
+                 early_stop: Optional[Dict[str, Any]] = None):
+        super().__init__(duration=duration, max_fps=max_fps, context_cache=context_cache,
+                         early_stop=early_stop)
+        self.service = service
+        self.ref_emb = reference_embedding
+        self.display = display
+        self.verified = False
+        self.confidence_scores = []
+        self.frame_out = None
+        # Adaptive detector input: face height from the previous detection
+        self._last_face_height = None
+        self.det_size_counts: Dict[int, int] = {}
+        # Aggregation mode: min-heap of the best (quality, frame id, crop) seen,
+        # embeddings computed lazily and kept per frame id
+        self.aggregation = service.aggregation_config if service.aggregation_config.get('enabled') else None
+        self._candidates: list = []
+        self._kept_since: Dict[int, int] = {}
+        self._embeddings: Dict[int, np.ndarray] = {}
+        self.embeddings_computed = 0
+        self._aggregate_cache = None
+        self.quality_scores = []
+    
+    def process(self, ctx: FrameContext):
+        """Match the face in one frame against the reference"""
+        frame = ctx.frame
+        frame_out = frame.copy() if self.display else None
+        
+        # Detect faces in the current frame; only a single face is embedded
+        det_size = self.service.choose_det_size(frame.shape, self._last_face_height)
+        self.det_size_counts[det_size] = self.det_size_counts.get(det_size, 0) + 1
+        bboxes, kpss = self.service.detect_faces(frame, det_size=det_size)
+        self._last_face_height = float(bboxes[0][3] - bboxes[0][1]) if len(bboxes) == 1 else None
+        
+        if len(bboxes) == 0:
+            message, color = "❌ No face detected", (0, 0, 255)
+        elif len(bboxes) > 1:
+            message, color = "❌ Multiple faces detected", (0, 0, 255)
+        elif self.aggregation is not None:
+            quality, _ = face_quality(ctx.gray, bboxes[0], kpss[0], self.aggregation)
+            self.quality_scores.append(quality)
+            if self._offer_candidate(quality, ctx.frame_id, frame, kpss[0]):
+                message, color = f"Face quality {quality:.2f} (kept)", (0, 255, 0)
+            else:
+                message, color = f"Face quality {quality:.2f}", (0, 255, 255)
+        else:
+            # Compare with reference
+            test_emb = self.service.embed_face(frame, kpss[0])
+            similarity = float(np.dot(self.ref_emb, test_emb))
+            self.confidence_scores.append(similarity)
+            
+            if similarity > self.SIMILARITY_THRESH:
+                self.verified = True
+                message, color = f"✅ Same person (Score: {similarity:.3f})", (0, 255, 0)
+            else:
+                message, color = f"❌ Different person (Score: {similarity:.3f})", (0, 0, 255)
+        
+        if self.display:
+            cv2.putText(frame_out, message, (30, 40), cv2.FONT_HERSHEY_SIMPLEX, 0.9, color, 2)
+            self.frame_out = frame_out
+    
+    def _offer_candidate(self, quality: float, frame_id: int, frame: np.ndarray, kps: np.ndarray) -> bool:
+        """Keep the frame if it is among the top-K by quality (aligns it, does not embed it)"""
+        if quality < self.aggregation.get('min_quality', 0.0):
+            return False
+        top_k = max(1, int(self.aggregation.get('top_k', 3)))
+        if len(self._candidates) >= top_k and quality <= self._candidates[0][0]:
+            return False
+        entry = (quality, frame_id, self.service.align_face(frame, kps))
+        if len(self._candidates) < top_k:
+            heapq.heappush(self._candidates, entry)
+        else:
+            _, dropped_id, _ = heapq.heapreplace(self._candidates, entry)
+            self._embeddings.pop(dropped_id, None)
+            self._kept_since.pop(dropped_id, None)
+        self._kept_since[frame_id] = self.frames_processed
+        return True
+    
+    def _aggregate(self, stable_only: bool = False) -> Optional[Tuple[float, list]]:
+        """
+        Similarity of the quality-weighted template of the kept frames
+        
+        Args:
+            stable_only: Use only frames kept for ``stable_frames`` analysed
+                frames, so running evidence does not embed candidates that are
+                about to be displaced
+        
+        Returns:
+            (template similarity, per-frame similarities of the kept frames),
+            or None before any frame qualified
+        """
+        kept = sorted(self._candidates, key=lambda c: -c[0])
+        if stable_only:
+            stable_frames = self.aggregation.get('stable_frames', 0)
+            kept = [c for c in kept if self.frames_processed - self._kept_since[c[1]] >= stable_frames]
+        if not kept:
+            return None
+        key = tuple(frame_id for _, frame_id, _ in kept)
+        if self._aggregate_cache is not None and self._aggregate_cache[0] == key:
+            return self._aggregate_cache[1]
+        
+        pending = [(frame_id, crop) for _, frame_id, crop in kept if frame_id not in self._embeddings]
+        if pending:
+            for (frame_id, _), embedding in zip(pending, self.service.embed_aligned([c for _, c in pending])):
+                self._embeddings[frame_id] = embedding
+            self.embeddings_computed += len(pending)
+        
+        weights = np.array([quality for quality, _, _ in kept], dtype=np.float32)
+        embeddings = np.stack([self._embeddings[frame_id] for _, frame_id, _ in kept])
+        template = (weights[:, None] * embeddings).sum(axis=0)
+        template /= np.linalg.norm(template)
+        
+        similarity = float(np.dot(self.ref_emb, template))
+        per_frame = [float(s) for s in embeddings @ self.ref_emb]
+        self._aggregate_cache = (key, (similarity, per_frame))
+        return similarity, per_frame
+    
+    def evidence(self) -> Optional[Tuple[bool, float]]:
+        """Matched at least once (or template match), and the mean similarity so far"""
+        if self.aggregation is not None:
+            aggregate = self._aggregate(stable_only=True)
+            if aggregate is None:
+                return None
+            return aggregate[0] > self.SIMILARITY_THRESH, aggregate[0]
+        if not self.confidence_scores:
+            return None
+        return self.verified, float(np.mean(self.confidence_scores))
+    
+    def progress(self) -> Dict[str, Any]:
+        state = super().progress()
+        if 'confidence' in state:
+            state['similarity'] = state['confidence']
+        if self.aggregation is not None:
+            state.update(frames_kept=len(self._candidates), frames_embedded=self.embeddings_computed)
+        return state
+    
+    def _aggregated_result(self) -> Dict[str, Any]:
+        aggregate = self._aggregate()
+        similarity, per_frame = aggregate if aggregate is not None else (0.0, [])
+        verified = similarity > self.SIMILARITY_THRESH
+        return {
+            'success': verified,
+            'confidence': similarity,
+            'message': 'Person verification completed' if aggregate is not None
+                       else 'Person verification failed: no frame of sufficient quality',
+            'frames_processed': self.frames_processed,
+            'frames_embedded': self.embeddings_computed,
+            'confidence_scores': per_frame,
+            'quality_scores': [round(q, 3) for q, _, _ in sorted(self._candidates, key=lambda c: -c[0])],
+            'det_sizes': {str(size): count for size, count in sorted(self.det_size_counts.items())}
+        }
+    
+    def result(self) -> Dict[str, Any]:
+        """Verdict over the frames seen so far"""
+        if self.aggregation is not None:
+            return self._aggregated_result()
+        
+        # Calculate final confidence
+        avg_confidence = np.mean(self.confidence_scores) if self.confidence_scores else 0.0
+        
+        return {
+            'success': self.verified,
+            'confidence': float(avg_confidence),
+            'message': 'Person verification completed',
+            'frames_processed': self.frames_processed,
+            'confidence_scores': self.confidence_scores,
+            'det_sizes': {str(size): count for size, count in sorted(self.det_size_counts.items())}
+        }
@@ -0,0 +1,130 @@
+"""
+Rate Scheduler - Per-component subsampling inside a frame analyzer
+
+Some per-frame work changes slowly (MiDaS depth statistics) while other
+work must stay dense (landmarks, head pose). A RateScheduler gives each
+named component its own target rate; the analyzer asks ``due()`` before
+running a component and carries the last result forward otherwise.
+
+Components marked adaptive are slowed down when the smoothed per-frame
+cost exceeds the frame budget, and sped back up towards their target once
+there is headroom again.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+DEFAULT_SCHEDULING_CONFIG = {
+    'enabled': os.environ.get('MIDAS_SUBSAMPLING', 'False').lower() == 'true',
+    # Target runs per second of stream time (None = every analysed frame)
+    'rates': {
+        'depth': 5.0,
+        'facemesh': None,
+        'pnp': None,
+    },
+    # Components whose rate may drop when frames run over budget
+    'adaptive': ['depth'],
+    # Lowest rate an adaptive component is pushed down to
+    'min_rates': {
+        'depth': 1.0,
+    },
+    # Per-frame processing budget of the analyzer (None disables adaptation)
+    'frame_budget_ms': 66.0,
+    # Multiplicative rate step when over budget / under half the budget
+    'backoff': 0.8,
+    'recovery': 1.1,
+    # Smoothing of the per-frame cost
+    'cost_alpha': 0.2,
+}
+
+
+class RateScheduler:
+    """Decide per frame which components of an analyzer run"""
+
+    def __init__(self, rates: Dict[str, Optional[float]], adaptive=(), min_rates: Optional[Dict[str, float]] = None,
+                 frame_budget_ms: Optional[float] = None, backoff: float = 0.8, recovery: float = 1.1,
+                 cost_alpha: float = 0.2):
+        """
+        Args:
+            rates: Component name -> target rate in Hz (None = every frame)
+            adaptive: Components whose rate follows the frame budget
+            min_rates: Floor for adaptive components
+            frame_budget_ms: Per-frame processing budget
+            backoff: Rate multiplier applied while over budget
+            recovery: Rate multiplier applied while under half the budget
+            cost_alpha: Weight of the newest frame in the smoothed cost
+        """
+        self.target_rates = dict(rates)
+        self.rates = dict(rates)
+        self.adaptive = set(adaptive)
+        self.min_rates = dict(min_rates or {})
+        self.frame_budget_ms = frame_budget_ms
+        self.backoff = backoff
+        self.recovery = recovery
+        self.cost_alpha = cost_alpha
+
+        self.avg_cost_ms = None
+        self.runs = {name: 0 for name in rates}
+        self.skips = {name: 0 for name in rates}
+        self.rate_changes = 0
+        self._last_run: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> Optional['RateScheduler']:
+        """Scheduler for a scheduling config, or None when subsampling is disabled"""
+        if not config.get('enabled'):
+            return None
+        return cls(
+            rates=config.get('rates', {}),
+            adaptive=config.get('adaptive', ()),
+            min_rates=config.get('min_rates'),
+            frame_budget_ms=config.get('frame_budget_ms'),
+            backoff=config.get('backoff', 0.8),
+            recovery=config.get('recovery', 1.1),
+            cost_alpha=config.get('cost_alpha', 0.2)
+        )
+
+    def due(self, name: str, timestamp: float) -> bool:
+        """Whether ``name`` should run for the frame at ``timestamp``; counts the outcome"""
+        rate = self.rates.get(name)
+        last = self._last_run.get(name)
+        if not rate or last is None or timestamp - last >= 1.0 / rate:
+            self._last_run[name] = timestamp
+            self.runs[name] = self.runs.get(name, 0) + 1
+            return True
+        self.skips[name] = self.skips.get(name, 0) + 1
+        return False
+
+    def report_cost(self, elapsed_ms: float):
+        """Feed one frame's processing time and adapt the adaptive rates"""
+        if self.avg_cost_ms is None:
+            self.avg_cost_ms = elapsed_ms
+        else:
+            self.avg_cost_ms = (1 - self.cost_alpha) * self.avg_cost_ms + self.cost_alpha * elapsed_ms
+        if not self.frame_budget_ms:
+            return
+
+        if self.avg_cost_ms > self.frame_budget_ms:
+            factor = self.backoff
+        elif self.avg_cost_ms < 0.5 * self.frame_budget_ms:
+            factor = self.recovery
+        else:
+            return
+
+        for name in self.adaptive:
+            rate, target = self.rates.get(name), self.target_rates.get(name)
+            if not rate or not target:
+                continue
+            new_rate = min(target, max(self.min_rates.get(name, 0.0), rate * factor))
+            if new_rate != rate:
+                self.rates[name] = new_rate
+                self.rate_changes += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rates': {name: (round(rate, 2) if rate else rate) for name, rate in self.rates.items()},
+            'runs': dict(self.runs),
+            'skips': dict(self.skips),
+            'rate_changes': self.rate_changes,
+            'avg_frame_cost_ms': round(self.avg_cost_ms, 2) if self.avg_cost_ms is not None else 0.0
+        }
@@ -0,0 +1,61 @@
+"""
+Streaming Stats - Constant-time statistics over a sliding window
+
+Per-frame checks that used to call ``np.var`` / ``np.mean`` on the last N
+values of a deque cost O(N) per frame. WindowedStats keeps the window in a
+preallocated ring buffer and updates the mean and the sum of squared
+deviations with a windowed Welford step, so each update is O(1) regardless
+of the window size.
+"""
+
+import numpy as np
+
+
+class WindowedStats:
+    """Mean and population variance of the last ``window`` samples, per dimension"""
+
+    def __init__(self, window: int, dims: int = 1):
+        """
+        Args:
+            window: Number of most recent samples the statistics cover
+            dims: Length of each sample (e.g. 3 for yaw, pitch, roll)
+        """
+        self.window = max(1, int(window))
+        self.dims = dims
+        self.reset()
+
+    def reset(self):
+        self._buffer = np.zeros((self.window, self.dims), dtype=np.float64)
+        self._mean = np.zeros(self.dims, dtype=np.float64)
+        self._m2 = np.zeros(self.dims, dtype=np.float64)
+        self._pos = 0
+        self.count = 0
+
+    def push(self, sample):
+        """Add one sample, evicting the oldest once the window is full"""
+        x = np.asarray(sample, dtype=np.float64).reshape(self.dims)
+        if self.count < self.window:
+            self.count += 1
+            delta = x - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (x - self._mean)
+        else:
+            old = self._buffer[self._pos]
+            new_mean = self._mean + (x - old) / self.window
+            self._m2 += (x - old) * (x - new_mean + old - self._mean)
+            self._mean = new_mean
+            # Guard against drift below zero from rounding
+            np.maximum(self._m2, 0.0, out=self._m2)
+        self._buffer[self._pos] = x
+        self._pos = (self._pos + 1) % self.window
+
+    @property
+    def mean(self) -> np.ndarray:
+        return self._mean.copy()
+
+    @property
+    def variance(self) -> np.ndarray:
+        """Population variance (``np.var`` with ddof=0) of the window"""
+        if self.count == 0:
+            return np.zeros(self.dims, dtype=np.float64)
+        return self._m2 / self.count
@@ -0,0 +1,131 @@
+"""
+Background tasks executed by the inference workers
+"""
+
+import base64
+import logging
+import os
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+from app.celery_app import celery
+from app.services.frame_sources import FrameSource, ImageSequenceFrameSource
+
+logger = logging.getLogger(__name__)
+
+# One service per worker process; models are shared through the registry
+_liveness_service = None
+
+
+def get_liveness_service():
+    """Lazily create the worker's liveness service"""
+    global _liveness_service
+    if _liveness_service is None:
+        from app.services.liveness_service import LivenessDetectionService
+        _liveness_service = LivenessDetectionService()
+    return _liveness_service
+
+
+def frame_source_from_payload(payload: Dict[str, Any]) -> Optional[FrameSource]:
+    """Build a frame source from uploaded frames, or None to use the worker's camera"""
+    frames = payload.get('frames')
+    if not frames:
+        return None
+    images = [base64.b64decode(frame.split(',', 1)[-1]) for frame in frames]
+    return ImageSequenceFrameSource(images, fps=float(payload.get('fps') or 30.0))
+
+
+def _enrolled_embedding(user_id):
+    """Load the user's enrolled face template (needs the Flask app for the database)"""
+    app = getattr(celery, 'flask_app', None)
+    if app is None:
+        raise RuntimeError("Flask app not initialised for the worker")
+    from app.services.enrollment_service import EnrollmentService
+
+    with app.app_context():
+        return EnrollmentService.load_embedding(user_id)
+
+
+def _close_session(session_id: Optional[int]):
+    """Mark the job's session as finished"""
+    if session_id is None:
+        return
+    app = getattr(celery, 'flask_app', None)
+    if app is None:
+        return
+    from app import db
+    from app.models import Session
+
+    with app.app_context():
+        session = Session.query.get(session_id)
+        if session is not None:
+            session.is_active = False
+            session.status = 'completed'
+            session.ended_at = datetime.utcnow()
+            db.session.commit()
+
+
+@celery.task(bind=True, name='liveness.run_complete')
+def run_liveness_job(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run the complete liveness sequence for one job
+
+    Args:
+        payload: ``user_id``, ``session_id``, ``reference_image``, ``mode``,
+            optionally ``frames`` (base64 images) with ``fps`` or ``video_path``
+            (an uploaded clip on storage shared with the API, deleted once
+            analysed), and ``use_enrolled_template`` to verify against the
+            stored template
+
+    Returns:
+        Dict with the owning user id and the liveness result
+    """
+    service = get_liveness_service()
+    user_id = payload.get('user_id')
+    progress = {
+        'user_id': user_id,
+        'completed_steps': 0,
+        'total_steps': len(service.STEPS),
+        'steps': {}
+    }
+
+    def on_step(step_name: str, step_result: Dict[str, Any]):
+        progress['steps'][step_name] = step_result
+        progress['completed_steps'] = len(progress['steps'])
+        self.update_state(state='PROGRESS', meta=progress)
+
+    self.update_state(state='PROGRESS', meta=progress)
+    video_path = payload.get('video_path')
+    frame_source = None if video_path else frame_source_from_payload(payload)
+    try:
+        reference_embedding = _enrolled_embedding(user_id) if payload.get('use_enrolled_template') else None
+        if video_path:
+            result = service.run_video_liveness_detection(
+                video_path,
+                payload.get('reference_image'),
+                mode=payload.get('mode'),
+                on_step=on_step,
+                reference_embedding=reference_embedding
+            )
+        else:
+            result = service.run_complete_liveness_detection(
+                payload.get('reference_image'),
+                frame_source=frame_source,
+                mode=payload.get('mode'),
+                on_step=on_step,
+                reference_embedding=reference_embedding
+            )
+    finally:
+        if frame_source is not None:
+            frame_source.release()
+        if video_path:
+            try:
+                os.remove(video_path)
+            except OSError as e:
+                logger.warning(f"Failed to delete uploaded video {video_path}: {e}")
+        try:
+            _close_session(payload.get('session_id'))
+        except Exception as e:
+            logger.warning(f"Failed to close session for liveness job {self.request.id}: {e}")
+
+    return {'user_id': user_id, 'result': result}
@@ -0,0 +1,149 @@
+"""
+Upload utilities - Binary image ingestion for the API endpoints
+
+Image endpoints accept the same request in three encodings:
+
+* ``application/json`` with base64 image fields (the original format)
+* ``multipart/form-data`` with the images as file parts and the other
+  fields as form values
+* ``application/octet-stream`` with the raw image as the body and the other
+  fields in the query string
+
+Binary images are read from the request stream straight into one
+preallocated NumPy buffer and handed to the services still encoded, so
+each image is decoded exactly once, by the service that uses it. Videos
+are streamed in chunks to a temporary file instead, since OpenCV decodes
+from a path.
+"""
+
+import os
+import shutil
+import tempfile
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from flask import current_app, request
+
+ImagePayload = Union[str, np.ndarray]
+
+OCTET_STREAM = 'application/octet-stream'
+
+
+def read_into_buffer(stream, length: Optional[int] = None, chunk_size: int = 1 << 20) -> np.ndarray:
+    """
+    Read a stream into a uint8 array
+
+    With a known length the bytes land directly in a preallocated buffer
+    (one copy); otherwise chunks are joined once at the end.
+    """
+    if not length:
+        chunks = iter(lambda: stream.read(chunk_size), b'')
+        return np.frombuffer(b''.join(chunks), dtype=np.uint8)
+
+    buffer = np.empty(length, dtype=np.uint8)
+    view = memoryview(buffer)
+    filled = 0
+    readinto = getattr(stream, 'readinto', None)
+    while filled < length:
+        if readinto is not None:
+            n = readinto(view[filled:filled + chunk_size])
+        else:
+            chunk = stream.read(min(chunk_size, length - filled))
+            n = len(chunk)
+            view[filled:filled + n] = chunk
+        if not n:
+            break
+        filled += n
+    return buffer[:filled]
+
+
+def _file_length(file_storage) -> Optional[int]:
+    """Size of an uploaded part (multipart parts rarely declare one)"""
+    if file_storage.content_length:
+        return file_storage.content_length
+    stream = file_storage.stream
+    try:
+        position = stream.tell()
+        stream.seek(0, 2)
+        length = stream.tell() - position
+        stream.seek(position)
+        return length
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def _read_file(file_storage) -> np.ndarray:
+    return read_into_buffer(file_storage.stream, _file_length(file_storage))
+
+
+def request_fields() -> Dict[str, Any]:
+    """Non-image fields: the JSON body, the form values or the query string"""
+    if request.mimetype == 'multipart/form-data':
+        return request.form.to_dict()
+    if request.mimetype == OCTET_STREAM:
+        return request.args.to_dict()
+    return request.get_json(silent=True) or {}
+
+
+def request_image(name: str, fields: Optional[Dict[str, Any]] = None) -> Optional[ImagePayload]:
+    """
+    One image of the request: a file part called ``name``, the whole
+    octet-stream body, or the base64 field ``name`` of a JSON body
+
+    Returns:
+        Encoded image bytes as a uint8 array, base64 text, or None
+    """
+    if request.mimetype == OCTET_STREAM:
+        buffer = read_into_buffer(request.stream, request.content_length)
+        return buffer if buffer.size else None
+    if request.mimetype == 'multipart/form-data':
+        file_storage = request.files.get(name)
+        if file_storage is not None:
+            return _read_file(file_storage)
+        return request.form.get(name) or None
+    return (fields if fields is not None else request_fields()).get(name) or None
+
+
+def request_images(name: str, fields: Optional[Dict[str, Any]] = None) -> List[ImagePayload]:
+    """Every image of a repeated field (file parts or a base64 list)"""
+    if request.mimetype == 'multipart/form-data':
+        return [_read_file(f) for f in request.files.getlist(name)]
+    values = (fields if fields is not None else request_fields()).get(name) or []
+    return values if isinstance(values, list) else [values]
+
+
+def save_upload(name: str, suffix: str = '.mp4', chunk_size: int = 1 << 20) -> Optional[str]:
+    """
+    Stream a file part called ``name`` (or the octet-stream body) to a
+    temporary file in UPLOAD_FOLDER without holding it in memory
+
+    Returns:
+        Path of the file (the caller deletes it), or None if nothing was sent
+    """
+    if request.mimetype == OCTET_STREAM:
+        stream = request.stream
+    elif request.mimetype == 'multipart/form-data' and name in request.files:
+        file_storage = request.files[name]
+        stream = file_storage.stream
+        extension = os.path.splitext(file_storage.filename or '')[1]
+        suffix = extension if extension[1:].isalnum() else suffix
+    else:
+        return None
+
+    directory = current_app.config.get('UPLOAD_FOLDER') or None
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix='upload_', dir=directory)
+    with os.fdopen(fd, 'wb') as out:
+        shutil.copyfileobj(stream, out, chunk_size)
+    if os.path.getsize(path) == 0:
+        os.remove(path)
+        return None
+    return path
+
+
+def as_bool(value: Any) -> bool:
+    """Boolean from JSON or from form/query text ('true', '1', 'yes', 'on')"""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes', 'on')
+    return bool(value)
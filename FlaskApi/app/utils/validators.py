@@ -82,21 +82,45 @@ def sanitize_input(text: str) -> str:
     sanitized = re.sub(r'[<>"\']', '', text)
     return sanitized.strip()
 
-def validate_image_data(image_data: str) -> bool:
-    """Validate base64 image data"""
-    if not image_data:
+# Leading bytes of the image formats OpenCV decodes for the API
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'BM', 'bmp'),
+)
+
+def sniff_image_format(head: bytes) -> Optional[str]:
+    """Image format from the first bytes of an encoded image"""
+    head = bytes(head[:12])
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, name in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return name
+    return None
+
+def validate_image_data(image_data) -> bool:
+    """
+    Validate base64 text (optionally a data URL) or raw bytes of an image
+    
+    Only the first bytes are decoded and checked against known image
+    signatures; the payload is decoded once, later, where it is used.
+    """
+    if image_data is None or len(image_data) == 0:
         return False
     
+    if not isinstance(image_data, str):
+        return sniff_image_format(memoryview(image_data).cast('B')[:12]) is not None
+    
     try:
-        # Check if it's valid base64
         import base64
         
-        # Remove data URL prefix if present
-        if ',' in image_data:
-            image_data = image_data.split(',')[1]
+        # Remove data URL prefix if present, and the line breaks of MIME-wrapped base64
+        payload = ''.join(image_data.split(',', 1)[-1].split())
+        if len(payload) % 4 != 0:
+            return False
         
-        # Try to decode
-        base64.b64decode(image_data)
-        return True
+        # 16 characters decode to the 12 bytes the signatures need
+        return sniff_image_format(base64.b64decode(payload[:16], validate=True)) is not None
     except Exception:
         return False
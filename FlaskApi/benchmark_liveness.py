@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Camera-free benchmark of the liveness services on fixed video fixtures
+
+    python benchmark_liveness.py fixtures [--output benchmarks/fixtures] [--recorded DIR] [--seed 1234]
+    python benchmark_liveness.py run [--services blink_detection,midas_liveness] [--output results.json]
+                                     [--baseline benchmarks/baseline.json]
+    python benchmark_liveness.py compare benchmarks/baseline.json results.json [--tolerance 0.1]
+                                         [--allow-missing]
+
+``run`` drives each service through a VideoFileFrameSource in a fresh
+process and writes per-fixture throughput, p50/p95 frame latency, per-stage
+means and the peak RSS as JSON. ``compare`` (or ``run --baseline``) exits
+with status 1 when a metric regressed beyond the tolerance, or when a
+service or fixture of the baseline failed or was not run (unless
+``--allow-missing``). Pin the thread
+count (``--threads``, OMP_NUM_THREADS) and keep the host idle so runs are
+comparable.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from app.services.benchmarking import (
+    DEFAULT_BENCHMARK_CONFIG, SERVICES, compare_reports, generate_fixtures, load_fixtures, run_benchmarks
+)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_FIXTURE_DIR = os.path.join(BASE_DIR, 'benchmarks', 'fixtures')
+DEFAULT_REFERENCE_DIR = os.path.join(BASE_DIR, 'reference_images')
+
+
+def print_comparison(comparison):
+    for change in comparison['regressions'] + comparison['improvements']:
+        where = change['service'] + (f"/{change['fixture']}" if change['fixture'] else '')
+        print(f"  {change['status']:<11} {where:<45} {change['metric']:<16} "
+              f"{change['baseline']} -> {change['current']} ({change['change']:+.1%})")
+    if comparison['skipped']:
+        print(f"[WARNING] Not compared (failed in the baseline): {', '.join(comparison['skipped'])}")
+    if comparison['environment_mismatch']:
+        print(f"[WARNING] Environment differs from the baseline: {', '.join(comparison['environment_mismatch'])}")
+    if comparison['fixture_mismatch']:
+        print(f"[WARNING] Fixtures differ from the baseline: {', '.join(comparison['fixture_mismatch'])}")
+
+
+def compare(baseline_path, report, tolerance, rss_tolerance, allow_missing=False):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    comparison = compare_reports(baseline, report, tolerance, rss_tolerance)
+    print_comparison(comparison)
+    failed = False
+    if comparison['missing']:
+        level = 'WARNING' if allow_missing else 'ERROR'
+        print(f"[{level}] Failed or not run (in the baseline): {', '.join(comparison['missing'])}")
+        failed = not allow_missing
+    if comparison['regressions']:
+        print(f"[ERROR] {len(comparison['regressions'])} of {comparison['compared']} metrics regressed "
+              f"beyond {comparison['tolerance']:.0%}")
+        failed = True
+    if failed:
+        return 1
+    print(f"[SUCCESS] No regressions across {comparison['compared']} metrics")
+    return 0
+
+
+def cmd_fixtures(args):
+    print(f"[RUNNING] Generating fixtures in {args.output}...")
+    config = {'seed': args.seed, 'seconds': args.seconds, 'fps': args.fps}
+    manifest = generate_fixtures(args.output, args.references, args.recorded, config)
+    for fixture in manifest['fixtures']:
+        print(f"  {fixture['name']:<30} {fixture['kind']:<15} {fixture['frames']} frames")
+    print(f"[SUCCESS] Wrote {len(manifest['fixtures'])} fixtures")
+    return 0
+
+
+def cmd_run(args):
+    services = args.services.split(',') if args.services else list(SERVICES)
+    unknown = [s for s in services if s not in SERVICES]
+    if unknown:
+        print(f"[ERROR] Unknown services: {', '.join(unknown)} (choose from {', '.join(SERVICES)})")
+        return 2
+    try:
+        fixtures = load_fixtures(args.fixtures, args.fixture_names.split(',') if args.fixture_names else None)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] {e}. Run 'python benchmark_liveness.py fixtures' first.")
+        return 2
+
+    def on_service(name, report):
+        if 'error' in report:
+            print(f"[ERROR] {name}: {report['error']}")
+            return
+        for fixture, result in report['fixtures'].items():
+            if 'error' in result:
+                print(f"[ERROR] {name}/{fixture}: {result['error']}")
+                continue
+            latency = result['latency_ms']
+            print(f"  {name:<20} {fixture:<25} {result['throughput_fps']:>7.1f} fps  "
+                  f"p50 {latency['p50']:>7.2f} ms  p95 {latency['p95']:>7.2f} ms")
+        print(f"  {name:<20} peak RSS {report['peak_rss_mb']} MB, load {report['load_seconds']} s")
+
+    if args.threads:
+        # Inherited by the per-service processes before torch/ONNX Runtime start
+        os.environ.setdefault('OMP_NUM_THREADS', str(args.threads))
+
+    print(f"[RUNNING] Benchmarking {', '.join(services)} on {len(fixtures)} fixtures...")
+    options = {'warmup_frames': args.warmup, 'max_frames': args.max_frames,
+               'threads': args.threads, 'reference_dir': args.references}
+    report = run_benchmarks(fixtures, services, options, on_service=on_service)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"[SUCCESS] Results written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.baseline:
+        return compare(args.baseline, report, args.tolerance, args.rss_tolerance, args.allow_missing)
+    return 0
+
+
+def cmd_compare(args):
+    with open(args.current) as f:
+        report = json.load(f)
+    return compare(args.baseline, report, args.tolerance, args.rss_tolerance, args.allow_missing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the liveness services on video fixtures')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fixtures = subparsers.add_parser('fixtures', help='Generate the fixture videos')
+    fixtures.add_argument('--output', default=DEFAULT_FIXTURE_DIR)
+    fixtures.add_argument('--references', default=DEFAULT_REFERENCE_DIR, help='Photos to animate into clips')
+    fixtures.add_argument('--recorded', help='Directory of recorded clips to include')
+    fixtures.add_argument('--seed', type=int, default=DEFAULT_BENCHMARK_CONFIG['seed'])
+    fixtures.add_argument('--seconds', type=float, default=DEFAULT_BENCHMARK_CONFIG['seconds'])
+    fixtures.add_argument('--fps', type=float, default=DEFAULT_BENCHMARK_CONFIG['fps'])
+    fixtures.set_defaults(func=cmd_fixtures)
+
+    tolerances = argparse.ArgumentParser(add_help=False)
+    tolerances.add_argument('--tolerance', type=float, default=DEFAULT_BENCHMARK_CONFIG['tolerance'],
+                            help='Relative latency/throughput change counted as a regression')
+    tolerances.add_argument('--rss-tolerance', type=float, default=DEFAULT_BENCHMARK_CONFIG['rss_tolerance'])
+    tolerances.add_argument('--allow-missing', action='store_true',
+                            help='Only warn when a baseline service or fixture failed or was not run')
+
+    run = subparsers.add_parser('run', parents=[tolerances], help='Benchmark the services')
+    run.add_argument('--fixtures', default=DEFAULT_FIXTURE_DIR)
+    run.add_argument('--fixture-names', help='Comma-separated subset of fixtures')
+    run.add_argument('--services', help=f"Comma-separated subset of {', '.join(SERVICES)}")
+    run.add_argument('--references', default=DEFAULT_REFERENCE_DIR,
+                     help='Fallback reference photos for person verification')
+    run.add_argument('--warmup', type=int, default=DEFAULT_BENCHMARK_CONFIG['warmup_frames'])
+    run.add_argument('--max-frames', type=int, help='Timed frames per fixture (default: whole clip)')
+    run.add_argument('--threads', type=int, help='OpenCV thread count')
+    run.add_argument('--output', help='JSON results file (default: print)')
+    run.add_argument('--baseline', help='Compare against this results file')
+    run.set_defaults(func=cmd_run)
+
+    comparison = subparsers.add_parser('compare', parents=[tolerances], help='Compare two results files')
+    comparison.add_argument('baseline')
+    comparison.add_argument('current')
+    comparison.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
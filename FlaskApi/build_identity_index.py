@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Rebuild the 1:N identity index from the KYC-approved face templates
+
+    python build_identity_index.py [--mode auto|exact|ivf] [--nlist 1024] [--benchmark 100]
+
+Writes <IDENTITY_INDEX_PATH>.vectors.npy / .meta.npz. Workers memory-map
+the file on first use, so run this after bulk enrollments or imports and
+before restarting the API and inference workers.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import numpy as np
+
+from app import create_app
+from app.services.enrollment_service import EnrollmentService
+
+
+def benchmark(index, queries, k, approximate):
+    """Mean/p95 search latency in ms and recall of approximate vs exact search"""
+    latencies, recalls = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results = index.search(query, k=k, approximate=approximate)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if approximate:
+            exact = {i for i, _ in index.search(query, k=k)}
+            recalls.append(len(exact & {i for i, _ in results}) / max(1, len(exact)))
+    report = {
+        'mean_ms': float(np.mean(latencies)),
+        'p95_ms': float(np.percentile(latencies, 95))
+    }
+    if approximate:
+        report['recall_at_k'] = float(np.mean(recalls))
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rebuild the identity index from face templates')
+    parser.add_argument('--path', help='Index file prefix (default: IDENTITY_INDEX_PATH)')
+    parser.add_argument('--mode', choices=['auto', 'exact', 'ivf'], help='Search mode to build for')
+    parser.add_argument('--nlist', type=int, help='IVF clusters (default: sqrt of the gallery size)')
+    parser.add_argument('--nprobe', type=int, help='IVF clusters scored per query')
+    parser.add_argument('--benchmark', type=int, default=0, help='Time this many searches against the built index')
+    parser.add_argument('--k', type=int, default=5)
+    args = parser.parse_args()
+
+    app = create_app()
+    with app.app_context():
+        service = EnrollmentService()
+        config = service.identity_index_config
+        for key in ('path', 'mode', 'nprobe'):
+            if getattr(args, key):
+                config[key] = getattr(args, key)
+
+        print("[RUNNING] Building identity index from face templates...")
+        start = time.perf_counter()
+        index = service.build_identity_index()
+        if args.nlist and len(index):
+            index.train(nlist=args.nlist)
+        index.save(config['path'])
+        print(f"[SUCCESS] Indexed {len(index)} identities in {time.perf_counter() - start:.1f}s -> {config['path']}")
+
+        if args.benchmark and len(index):
+            rng = np.random.default_rng(0)
+            queries = rng.standard_normal((args.benchmark, index.dim)).astype(np.float32)
+            report = {'stats': index.stats(), 'exact': benchmark(index, queries, args.k, approximate=False)}
+            if index.trained:
+                report['ivf'] = benchmark(index, queries, args.k, approximate=True)
+            print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
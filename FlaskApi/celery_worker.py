@@ -0,0 +1,11 @@
+#!/usr/bin/env python3
+"""
+Celery worker entry point for liveness inference jobs
+
+    celery -A celery_worker.celery worker -Q inference --concurrency 2
+"""
+
+from app import create_app
+from app.celery_app import celery
+
+app = create_app()
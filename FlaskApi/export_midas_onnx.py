@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Export MiDaS_small to ONNX and check it against the torch model
+
+    python export_midas_onnx.py [--output models/midas_small.onnx] [--images reference_images]
+
+Workers started with MIDAS_BACKEND=onnx then load the stored file with
+ONNX Runtime instead of pulling the model through torch.hub.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+import cv2
+
+from app.services.depth_backends import (
+    DEFAULT_ONNX_PATH, OnnxDepthBackend, TorchDepthBackend,
+    check_parity, export_midas_onnx, load_torch_midas, synthetic_parity_frames
+)
+
+
+def load_frames(image_dir):
+    """BGR frames used for the parity check"""
+    paths = sorted(glob.glob(os.path.join(image_dir, '*.jp*g')) + glob.glob(os.path.join(image_dir, '*.png')))
+    frames = [cv2.imread(path) for path in paths]
+    return [frame for frame in frames if frame is not None]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export MiDaS_small to ONNX')
+    parser.add_argument('--output', default=DEFAULT_ONNX_PATH, help='ONNX file to write')
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'reference_images'),
+                        help='Directory of images for the parity check')
+    parser.add_argument('--opset', type=int, default=12, help='ONNX opset version')
+    parser.add_argument('--tolerance', type=float, default=1e-2,
+                        help='Allowed mean error relative to the depth range')
+    parser.add_argument('--intra-op-threads', type=int, default=0)
+    parser.add_argument('--inter-op-threads', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"[RUNNING] Exporting MiDaS_small to {args.output}...")
+    export_midas_onnx(args.output, opset=args.opset)
+
+    frames = load_frames(args.images)
+    if not frames:
+        print(f"[WARNING] No images found in {args.images}; checking parity on synthetic frames")
+        frames = synthetic_parity_frames()
+
+    model, transform = load_torch_midas('cpu')
+    reference = TorchDepthBackend(model, transform, 'cpu')
+    candidate = OnnxDepthBackend(args.output, args.intra_op_threads, args.inter_op_threads)
+
+    parity = check_parity(reference, candidate, frames, rtol=args.tolerance)
+    print(json.dumps(parity, indent=2))
+
+    if not parity['within_tolerance']:
+        print("[ERROR] ONNX output differs from torch beyond tolerance")
+        return 1
+    print("[SUCCESS] ONNX export matches torch output")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Quantize MiDaS_small to INT8 and measure what it costs
+
+    python quantize_midas_onnx.py --fixtures fixtures/liveness [--mode static] [--report report.json]
+
+Writes models/midas_small_int8.onnx (dynamic or statically calibrated INT8),
+then replays the recorded fixtures through the 2D/3D liveness analyzer with
+the float and the INT8 model side by side and reports:
+
+- per-frame latency of the liveness step for each model
+- the shift in depth_std_face
+- how often the per-frame liveness_decision and the final verdict change
+
+Fixtures are video files and/or directories of frames (one clip per
+directory). Select the quantized model in production with MIDAS_BACKEND=onnx_int8.
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.services.depth_backends import DEFAULT_INT8_ONNX_PATH, DEFAULT_ONNX_PATH, export_midas_onnx, quantize_midas_onnx
+from app.services.frame_context import FrameContextCache
+from app.services.frame_sources import ImageSequenceFrameSource, VideoFileFrameSource
+from app.services.midas_liveness_service import MidasLivenessService
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def _image_paths(directory):
+    return sorted(p for p in glob.glob(os.path.join(directory, '*')) if p.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def load_fixtures(fixture_dir, max_frames):
+    """Map fixture name -> (frames, fps)"""
+    fixtures = {}
+    loose_images = _image_paths(fixture_dir)
+    if loose_images:
+        fixtures[os.path.basename(os.path.normpath(fixture_dir))] = ImageSequenceFrameSource(loose_images)
+
+    for path in sorted(glob.glob(os.path.join(fixture_dir, '*'))):
+        name = os.path.basename(path)
+        if os.path.isdir(path) and _image_paths(path):
+            fixtures[name] = ImageSequenceFrameSource(_image_paths(path))
+        elif path.lower().endswith(VIDEO_EXTENSIONS):
+            fixtures[name] = VideoFileFrameSource(path)
+
+    loaded = {}
+    for name, source in fixtures.items():
+        frames = []
+        with source:
+            while len(frames) < max_frames:
+                frame = source.get_frame()
+                if frame is None:
+                    if source.exhausted:
+                        break
+                    continue
+                frames.append(frame)
+            fps = getattr(source, 'fps', 30.0)
+        if frames:
+            loaded[name] = (frames, fps)
+    return loaded
+
+
+def _percentile(values, q):
+    return float(np.percentile(values, q)) if values else 0.0
+
+
+def _latency_summary(values):
+    return {
+        'mean_ms': float(np.mean(values)) if values else 0.0,
+        'p50_ms': _percentile(values, 50),
+        'p95_ms': _percentile(values, 95)
+    }
+
+
+def evaluate(reference, candidate, fixtures):
+    """Replay fixtures through both models and compare per-frame measurements"""
+    ref_latency, cand_latency = [], []
+    std_abs_shift, std_rel_shift = [], []
+    agree = live_to_spoof = spoof_to_live = frames_compared = 0
+    verdicts = {}
+
+    for name, (frames, fps) in fixtures.items():
+        # One context per frame so FaceMesh runs once and both models see the same landmarks
+        cache = FrameContextCache(face_mesh=reference.face_mesh_pool)
+        ref_analyzer = reference.create_analyzer(context_cache=cache)
+        cand_analyzer = candidate.create_analyzer(context_cache=cache)
+
+        for i, frame in enumerate(frames):
+            ctx = cache.context(frame, timestamp=i / fps)
+            ctx.get('facemesh_points')
+            ctx.get('gray')
+
+            start = time.perf_counter()
+            ref_analyzer.feed(ctx)
+            ref_latency.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            cand_analyzer.feed(ctx)
+            cand_latency.append((time.perf_counter() - start) * 1000)
+
+            ref_m, cand_m = ref_analyzer.last_measurement, cand_analyzer.last_measurement
+            frames_compared += 1
+            if ref_m['live'] == cand_m['live']:
+                agree += 1
+            elif ref_m['live']:
+                live_to_spoof += 1
+            else:
+                spoof_to_live += 1
+
+            if ref_m['depth_std_face'] > 0 and cand_m['depth_std_face'] > 0:
+                shift = cand_m['depth_std_face'] - ref_m['depth_std_face']
+                std_abs_shift.append(abs(shift))
+                std_rel_shift.append(abs(shift) / ref_m['depth_std_face'])
+
+        cache.release_models()
+        ref_result, cand_result = ref_analyzer.result(), cand_analyzer.result()
+        verdicts[name] = {
+            'frames': len(frames),
+            'reference_live': ref_result['success'],
+            'candidate_live': cand_result['success'],
+            'reference_confidence': ref_result['confidence'],
+            'candidate_confidence': cand_result['confidence']
+        }
+
+    ref_summary, cand_summary = _latency_summary(ref_latency), _latency_summary(cand_latency)
+    return {
+        'frames': frames_compared,
+        'latency': {
+            'reference': ref_summary,
+            'candidate': cand_summary,
+            'speedup': (ref_summary['mean_ms'] / cand_summary['mean_ms']) if cand_summary['mean_ms'] else 0.0
+        },
+        'depth_std_face_shift': {
+            'frames_with_face': len(std_abs_shift),
+            'mean_abs': float(np.mean(std_abs_shift)) if std_abs_shift else 0.0,
+            'max_abs': float(np.max(std_abs_shift)) if std_abs_shift else 0.0,
+            'mean_relative': float(np.mean(std_rel_shift)) if std_rel_shift else 0.0
+        },
+        'frame_decisions': {
+            'agreement': agree / frames_compared if frames_compared else 0.0,
+            'live_to_spoof': live_to_spoof,
+            'spoof_to_live': spoof_to_live
+        },
+        'verdict_agreement': (
+            sum(v['reference_live'] == v['candidate_live'] for v in verdicts.values()) / len(verdicts)
+            if verdicts else 0.0
+        ),
+        'fixtures': verdicts
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Quantize MiDaS_small to INT8 and evaluate it')
+    parser.add_argument('--fixtures', required=True, help='Directory of recorded clips (videos or frame directories)')
+    parser.add_argument('--float-model', default=DEFAULT_ONNX_PATH, help='Float ONNX export (created if missing)')
+    parser.add_argument('--output', default=DEFAULT_INT8_ONNX_PATH, help='INT8 ONNX file to write')
+    parser.add_argument('--mode', choices=['dynamic', 'static'], default='dynamic',
+                        help='dynamic: weights only; static: weights and activations calibrated on fixtures')
+    parser.add_argument('--calibration-frames', type=int, default=100,
+                        help='Frames sampled across fixtures for static calibration')
+    parser.add_argument('--max-frames', type=int, default=300, help='Frames read per fixture')
+    parser.add_argument('--reference', choices=['onnx', 'torch'], default='onnx',
+                        help='Float model to compare against')
+    parser.add_argument('--skip-quantize', action='store_true', help='Evaluate an existing INT8 file')
+    parser.add_argument('--report', help='Write the JSON report to this file')
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures, args.max_frames)
+    if not fixtures:
+        print(f"[ERROR] No fixtures found in {args.fixtures}")
+        return 1
+    print(f"[INFO] Loaded {len(fixtures)} fixtures, {sum(len(f) for f, _ in fixtures.values())} frames")
+
+    if not os.path.exists(args.float_model):
+        print(f"[RUNNING] Exporting float model to {args.float_model}...")
+        export_midas_onnx(args.float_model)
+
+    if not args.skip_quantize:
+        all_frames = [frame for frames, _ in fixtures.values() for frame in frames]
+        step = max(1, len(all_frames) // max(1, args.calibration_frames))
+        calibration = all_frames[::step][:args.calibration_frames]
+        print(f"[RUNNING] {args.mode} INT8 quantization -> {args.output}...")
+        quantize_midas_onnx(args.float_model, args.output, mode=args.mode, calibration_frames=calibration)
+
+    if args.reference == 'torch':
+        reference = MidasLivenessService(backend='torch')
+    else:
+        reference = MidasLivenessService(backend='onnx', onnx_path=args.float_model)
+    candidate = MidasLivenessService(backend='onnx_int8', onnx_path=args.output)
+    if not (reference.is_model_loaded() and candidate.is_model_loaded()):
+        print("[ERROR] Failed to load the float or INT8 depth model")
+        return 1
+
+    report = evaluate(reference, candidate, fixtures)
+    report['mode'] = args.mode
+    report['reference'] = args.reference
+    report['model_size_mb'] = {
+        'float': os.path.getsize(args.float_model) / (1024 * 1024),
+        'int8': os.path.getsize(args.output) / (1024 * 1024)
+    }
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(text)
+        print(f"[SUCCESS] Report written to {args.report}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
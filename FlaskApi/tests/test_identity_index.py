@@ -0,0 +1,107 @@
+"""
+Identity index: exact and IVF search, removal, and save/load round-trips
+"""
+
+import numpy as np
+
+from app.services.identity_index import IdentityIndex
+
+
+def _gallery(count=200, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(count, dim)).astype(np.float32)
+    return np.arange(1000, 1000 + count), vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _index(count=200, dim=16, block_size=32):
+    ids, vectors = _gallery(count, dim)
+    index = IdentityIndex(dim=dim, block_size=block_size, nprobe=4, dtype=np.float32)
+    index.add(ids, vectors)
+    return index, ids, vectors
+
+
+def test_exact_search_matches_brute_force_across_blocks():
+    index, ids, vectors = _index()
+    query = vectors[17] + 0.1 * vectors[42]
+
+    results = index.search(query, k=5)
+
+    scores = vectors @ (query / np.linalg.norm(query))
+    expected = ids[np.argsort(-scores)[:5]].tolist()
+    assert [identity_id for identity_id, _ in results] == expected
+    assert results[0][1] >= results[-1][1]
+
+
+def test_search_excludes_ids_and_still_returns_k():
+    index, ids, vectors = _index()
+
+    results = index.search(vectors[3], k=3, exclude=[ids[3]])
+
+    assert len(results) == 3
+    assert ids[3] not in [identity_id for identity_id, _ in results]
+
+
+def test_ivf_search_finds_an_enrolled_vector():
+    index, ids, vectors = _index()
+    index.train(nlist=8, seed=1)
+
+    results = index.search(vectors[10], k=1, approximate=True, nprobe=8)
+
+    assert index.trained
+    assert results[0][0] == ids[10]
+    assert np.isclose(results[0][1], 1.0, atol=1e-5)
+
+
+def test_remove_moves_last_row_and_keeps_ivf_lists_consistent():
+    index, ids, vectors = _index(count=50)
+    index.train(nlist=4, seed=0)
+
+    assert index.remove(ids[5])
+    assert not index.remove(ids[5])
+
+    assert len(index) == 49
+    assert ids[5] not in index
+    assert ids[-1] in index
+    assert index.search(vectors[-1], k=1, approximate=True, nprobe=4)[0][0] == ids[-1]
+    assert sorted(row for rows in index._lists for row in rows) == list(range(49))
+
+
+def test_add_replaces_an_existing_identity():
+    index, ids, vectors = _index(count=20)
+
+    index.add([ids[0]], vectors[1:2])
+
+    assert len(index) == 20
+    assert {identity_id for identity_id, _ in index.search(vectors[1], k=2)} == {ids[0], ids[1]}
+
+
+def test_save_load_round_trip(tmp_path):
+    index, ids, vectors = _index(count=64)
+    index.train(nlist=4, seed=0)
+    index.version = '2026-01-01T00:00:00'
+    path = str(tmp_path / 'identity_index')
+
+    index.save(path)
+    loaded = IdentityIndex.load(path)
+
+    assert IdentityIndex.exists(path)
+    assert len(loaded) == 64
+    assert loaded.version == '2026-01-01T00:00:00'
+    assert loaded.trained
+    assert loaded.stats()['memory_mapped']
+    for query in (vectors[0], vectors[33]):
+        assert loaded.search(query, k=3) == index.search(query, k=3)
+        assert loaded.search(query, k=3, approximate=True) == index.search(query, k=3, approximate=True)
+
+
+def test_loaded_index_accepts_changes(tmp_path):
+    index, ids, vectors = _index(count=16)
+    path = str(tmp_path / 'identity_index')
+    index.save(path)
+
+    loaded = IdentityIndex.load(path)
+    loaded.remove(ids[0])
+    loaded.add([1], vectors[0:1])
+
+    assert len(loaded) == 16
+    assert loaded.search(vectors[0], k=1)[0][0] == 1
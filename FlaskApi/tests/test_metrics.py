@@ -0,0 +1,97 @@
+"""
+Metrics registry: Prometheus text exposition of counters, gauges and histograms
+"""
+
+import pytest
+
+from app.services.metrics import MetricsRegistry, StageTimer
+
+
+def _registry():
+    return MetricsRegistry({'enabled': True})
+
+
+def test_counter_and_gauge_rendering():
+    registry = _registry()
+    frames = registry.counter('frames_total', 'Frames read', ['source'])
+    load = registry.gauge('model_load_seconds', 'Load time', ['model'])
+
+    frames.labels('camera').inc()
+    frames.labels('camera').inc(2)
+    frames.labels('upload').inc()
+    load.labels('midas').set(1.5)
+
+    text = registry.render()
+
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert lines[:2] == ['# HELP frames_total Frames read', '# TYPE frames_total counter']
+    assert 'frames_total{source="camera"} 3.0' in lines
+    assert 'frames_total{source="upload"} 1.0' in lines
+    assert '# TYPE model_load_seconds gauge' in lines
+    assert 'model_load_seconds{model="midas"} 1.5' in lines
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = _registry()
+    latency = registry.histogram('stage_seconds', 'Stage latency', ['stage'], buckets=(0.1, 0.01, 1.0))
+
+    for value in (0.005, 0.01, 0.05, 0.5, 3.0):
+        latency.labels('depth').observe(value)
+
+    lines = registry.render().splitlines()
+
+    assert '# TYPE stage_seconds histogram' in lines
+    # Bounds are sorted, and a value equal to a bound falls in that bucket
+    assert [line for line in lines if line.startswith('stage_seconds_bucket')] == [
+        'stage_seconds_bucket{stage="depth",le="0.01"} 2',
+        'stage_seconds_bucket{stage="depth",le="0.1"} 3',
+        'stage_seconds_bucket{stage="depth",le="1.0"} 4',
+        'stage_seconds_bucket{stage="depth",le="+Inf"} 5',
+    ]
+    assert 'stage_seconds_count{stage="depth"} 5' in lines
+    total = float(next(line for line in lines if line.startswith('stage_seconds_sum')).split()[-1])
+    assert total == pytest.approx(3.565)
+    assert latency.summary()['depth'] == {'count': 5, 'mean': pytest.approx(0.713)}
+
+
+def test_unlabelled_metrics_and_label_escaping():
+    registry = _registry()
+    registry.counter('requests_total', 'Requests').inc()
+    registry.gauge('note', 'Label escaping', ['text']).labels('a "b"\nc\\d').set(1)
+
+    lines = registry.render().splitlines()
+
+    assert 'requests_total 1.0' in lines
+    assert 'note{text="a \\"b\\"\\nc\\\\d"} 1' in lines
+
+
+def test_wrong_label_count_is_rejected():
+    registry = _registry()
+    counter = registry.counter('frames_total', 'Frames read', ['source'])
+
+    with pytest.raises(ValueError):
+        counter.labels('camera', 'extra')
+
+
+def test_register_returns_existing_metric_and_reset_clears_series():
+    registry = _registry()
+    first = registry.counter('frames_total', 'Frames read', ['source'])
+    first.labels('camera').inc()
+
+    assert registry.counter('frames_total', 'Frames read', ['source']) is first
+
+    registry.reset()
+    assert registry.render() == '# HELP frames_total Frames read\n# TYPE frames_total counter\n'
+
+
+def test_stage_timer_observes_once_and_disabled_timer_is_a_no_op():
+    registry = _registry()
+    latency = registry.histogram('stage_seconds', 'Stage latency', ['stage'])
+
+    with StageTimer(latency.labels('pnp')):
+        pass
+    with StageTimer(None):
+        pass
+
+    assert latency.summary()['pnp']['count'] == 1
@@ -0,0 +1,44 @@
+"""
+MiDaS liveness decision: depth and PnP alone must not pass a motionless face
+"""
+
+from app.services.midas_liveness_service import MidasLivenessService
+from app.services.streaming_stats import WindowedStats
+
+
+def _decision_service():
+    # liveness_decision needs no models; skip loading MiDaS and FaceMesh
+    return MidasLivenessService.__new__(MidasLivenessService)
+
+
+def _motion_var(poses, window=10):
+    stats = WindowedStats(window, dims=3)
+    for pose in poses:
+        stats.push(pose)
+    return float(stats.variance.sum())
+
+
+def test_constant_pose_is_rejected_even_when_depth_and_pnp_pass():
+    motion_var = _motion_var([(5.0, -3.0, 1.0)] * 10)
+    assert motion_var == 0.0
+
+    is_live, cond_depth, cond_pnp, _ = _decision_service().liveness_decision(
+        depth_std_face=10.0, reproj_err=1.0, yaw=5.0, pitch=-3.0, roll=1.0,
+        depth_roi=None, face_size=200, depth_thresh=3.0, motion_thresh=0.2, motion_var=motion_var
+    )
+
+    assert cond_depth and cond_pnp
+    assert not is_live
+
+
+def test_natural_head_motion_passes():
+    poses = [(5.0 + (i % 4), -3.0 + (i % 3), 1.0) for i in range(10)]
+
+    is_live, _, _, confidence = _decision_service().liveness_decision(
+        depth_std_face=10.0, reproj_err=1.0, yaw=5.0, pitch=-3.0, roll=1.0,
+        depth_roi=None, face_size=200, depth_thresh=3.0, motion_thresh=0.2,
+        motion_var=_motion_var(poses)
+    )
+
+    assert is_live
+    assert confidence > 0.7
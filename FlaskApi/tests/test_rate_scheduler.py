@@ -0,0 +1,77 @@
+"""
+Rate scheduler: per-component subsampling, backoff over budget, recovery under it
+"""
+
+from app.services.rate_scheduler import DEFAULT_SCHEDULING_CONFIG, RateScheduler
+
+
+def _scheduler(**kwargs):
+    options = dict(rates={'depth': 8.0, 'pnp': None}, adaptive=['depth'], min_rates={'depth': 2.0},
+                   frame_budget_ms=50.0, backoff=0.5, recovery=2.0, cost_alpha=1.0)
+    options.update(kwargs)
+    return RateScheduler(**options)
+
+
+def test_due_subsamples_rated_components_only():
+    scheduler = _scheduler()
+    depth_runs = pnp_runs = 0
+    # 32 frames at 32 fps: one second of stream time
+    for frame in range(32):
+        timestamp = frame / 32.0
+        depth_runs += scheduler.due('depth', timestamp)
+        pnp_runs += scheduler.due('pnp', timestamp)
+
+    assert pnp_runs == 32
+    assert depth_runs == 8
+    assert scheduler.stats()['skips']['depth'] == 24
+
+
+def test_backoff_stops_at_min_rate():
+    scheduler = _scheduler()
+
+    for _ in range(10):
+        scheduler.report_cost(80.0)
+
+    assert scheduler.rates['depth'] == 2.0
+    assert scheduler.rates['pnp'] is None
+    assert scheduler.rate_changes == 2
+
+
+def test_recovery_returns_to_target_rate():
+    scheduler = _scheduler()
+    scheduler.report_cost(80.0)
+    scheduler.report_cost(80.0)
+    assert scheduler.rates['depth'] == 2.0
+
+    # Within budget but above half of it: rates hold
+    scheduler.report_cost(40.0)
+    assert scheduler.rates['depth'] == 2.0
+
+    for _ in range(5):
+        scheduler.report_cost(10.0)
+    assert scheduler.rates['depth'] == 8.0
+
+
+def test_cost_is_smoothed_before_adapting():
+    scheduler = _scheduler(cost_alpha=0.2)
+    scheduler.report_cost(40.0)
+    # One slow frame moves the average to 40 * 0.8 + 100 * 0.2 = 52 (> budget)
+    scheduler.report_cost(100.0)
+    assert scheduler.avg_cost_ms == 52.0
+    assert scheduler.rates['depth'] == 4.0
+
+
+def test_no_budget_means_no_adaptation():
+    scheduler = _scheduler(frame_budget_ms=None)
+    scheduler.report_cost(1000.0)
+
+    assert scheduler.rates['depth'] == 8.0
+    assert scheduler.stats()['avg_frame_cost_ms'] == 1000.0
+
+
+def test_from_config():
+    assert RateScheduler.from_config(dict(DEFAULT_SCHEDULING_CONFIG, enabled=False)) is None
+
+    scheduler = RateScheduler.from_config(dict(DEFAULT_SCHEDULING_CONFIG, enabled=True))
+    assert scheduler.rates['depth'] == DEFAULT_SCHEDULING_CONFIG['rates']['depth']
+    assert scheduler.adaptive == {'depth'}
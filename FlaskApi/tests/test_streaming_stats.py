@@ -0,0 +1,53 @@
+"""
+Windowed Welford statistics must match np.mean / np.var over the same window
+"""
+
+import numpy as np
+
+from app.services.streaming_stats import WindowedStats
+
+
+def test_matches_numpy_while_filling_and_sliding():
+    rng = np.random.default_rng(0)
+    samples = rng.normal(loc=20.0, scale=5.0, size=(200, 3))
+    stats = WindowedStats(window=15, dims=3)
+
+    for i, sample in enumerate(samples):
+        stats.push(sample)
+        window = samples[max(0, i - 14):i + 1]
+        assert stats.count == len(window)
+        np.testing.assert_allclose(stats.mean, window.mean(axis=0), rtol=1e-9, atol=1e-9)
+        np.testing.assert_allclose(stats.variance, np.var(window, axis=0), rtol=1e-7, atol=1e-9)
+
+
+def test_scalar_samples_and_large_offset():
+    values = 1e6 + np.sin(np.arange(500) / 7.0)
+    stats = WindowedStats(window=30)
+
+    for value in values:
+        stats.push(value)
+
+    np.testing.assert_allclose(stats.variance, [np.var(values[-30:])], rtol=1e-5)
+
+
+def test_constant_window_has_zero_variance():
+    stats = WindowedStats(window=10, dims=2)
+    for _ in range(25):
+        stats.push((0.1, -3.7))
+
+    assert stats.variance.min() >= 0.0
+    np.testing.assert_allclose(stats.variance, 0.0, atol=1e-12)
+
+
+def test_reset_and_empty():
+    stats = WindowedStats(window=5, dims=2)
+    assert stats.variance.tolist() == [0.0, 0.0]
+
+    for value in range(8):
+        stats.push((value, 2 * value))
+    stats.reset()
+    stats.push((1.0, 1.0))
+
+    assert stats.count == 1
+    assert stats.mean.tolist() == [1.0, 1.0]
+    assert stats.variance.tolist() == [0.0, 0.0]
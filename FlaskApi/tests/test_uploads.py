@@ -0,0 +1,118 @@
+"""
+Upload ingestion: octet-stream bodies, multipart parts and streamed videos
+"""
+
+import base64
+import io
+import os
+
+import numpy as np
+from flask import Flask
+
+from app.utils.uploads import as_bool, read_into_buffer, request_fields, request_image, request_images, save_upload
+from app.utils.validators import validate_image_data
+
+JPEG = b'\xff\xd8\xff\xe0' + bytes(range(256)) * 40
+
+
+class _ChunkedStream(io.RawIOBase):
+    """Stream that returns at most ``limit`` bytes per read, like a socket"""
+
+    def __init__(self, data: bytes, limit: int):
+        self._data = io.BytesIO(data)
+        self._limit = limit
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        chunk = self._data.read(min(len(buffer), self._limit))
+        buffer[:len(chunk)] = chunk
+        return len(chunk)
+
+
+def _app(tmp_path=None):
+    app = Flask(__name__)
+    app.config['UPLOAD_FOLDER'] = str(tmp_path) if tmp_path else None
+    return app
+
+
+def test_read_into_buffer_with_and_without_length():
+    for length in (len(JPEG), None):
+        buffer = read_into_buffer(_ChunkedStream(JPEG, 1000), length, chunk_size=4096)
+        assert buffer.dtype == np.uint8
+        assert buffer.tobytes() == JPEG
+
+
+def test_read_into_buffer_stops_at_a_short_body():
+    buffer = read_into_buffer(io.BytesIO(JPEG[:100]), length=len(JPEG))
+    assert buffer.tobytes() == JPEG[:100]
+
+
+def test_octet_stream_body_and_query_fields():
+    with _app().test_request_context('/?mode=fused&use_enrolled_template=true', method='POST', data=JPEG,
+                                     content_type='application/octet-stream'):
+        image = request_image('reference_image')
+        fields = request_fields()
+
+    assert image.tobytes() == JPEG
+    assert fields == {'mode': 'fused', 'use_enrolled_template': 'true'}
+    assert as_bool(fields['use_enrolled_template'])
+
+
+def test_empty_octet_stream_body_is_no_image():
+    with _app().test_request_context('/', method='POST', data=b'', content_type='application/octet-stream'):
+        assert request_image('reference_image') is None
+
+
+def test_multipart_parts_and_form_fields():
+    data = {
+        'reference_image': (io.BytesIO(JPEG), 'ref.jpg'),
+        'frames': [(io.BytesIO(JPEG[:50]), 'a.jpg'), (io.BytesIO(JPEG[50:90]), 'b.jpg')],
+        'mode': 'sequential',
+    }
+    with _app().test_request_context('/', method='POST', data=data, content_type='multipart/form-data'):
+        image = request_image('reference_image')
+        frames = request_images('frames')
+        fields = request_fields()
+
+    assert image.tobytes() == JPEG
+    assert [frame.tobytes() for frame in frames] == [JPEG[:50], JPEG[50:90]]
+    assert fields == {'mode': 'sequential'}
+
+
+def test_json_base64_fields():
+    body = {'reference_image': 'aGVsbG8=', 'frames': ['YQ==', 'Yg==']}
+    with _app().test_request_context('/', method='POST', json=body):
+        assert request_image('reference_image') == 'aGVsbG8='
+        assert request_images('frames') == ['YQ==', 'Yg==']
+
+
+def test_save_upload_streams_to_upload_folder(tmp_path):
+    data = {'video': (io.BytesIO(JPEG), 'clip.webm')}
+    with _app(tmp_path).test_request_context('/', method='POST', data=data, content_type='multipart/form-data'):
+        path = save_upload('video')
+
+    try:
+        assert os.path.dirname(path) == str(tmp_path)
+        assert path.endswith('.webm')
+        with open(path, 'rb') as f:
+            assert f.read() == JPEG
+    finally:
+        os.remove(path)
+
+
+def test_save_upload_without_a_video(tmp_path):
+    with _app(tmp_path).test_request_context('/', method='POST', data=b'', content_type='application/octet-stream'):
+        assert save_upload('video') is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_validate_image_data_encodings():
+    assert validate_image_data(np.frombuffer(JPEG, dtype=np.uint8))
+    assert validate_image_data(base64.b64encode(JPEG).decode())
+    assert validate_image_data('data:image/jpeg;base64,' + base64.b64encode(JPEG).decode())
+    # MIME-wrapped base64 has a line break every 76 characters
+    assert validate_image_data(base64.encodebytes(JPEG).decode())
+    assert not validate_image_data(base64.b64encode(b'GIF89a' + JPEG).decode())
+    assert not validate_image_data(base64.b64encode(JPEG).decode()[:-1])